@@ -14,6 +14,8 @@ import sys
 import os
 import math
 import struct
+from Warehouse_Messaging import *
+from Warehouse_Queue import *
 
 # This program requires LEGO EV3 MicroPython v2.0 or higher.
 # Click "Open user guide" on the EV3 extension tab for more information.
@@ -67,6 +69,7 @@ client_chain = BluetoothMailboxClient()
 
 conv_status_to_chain_mbox   = TextMailbox('conveyor update to chain' , client_chain)        #Receiving the bluetooth commands from the master EV3 brick on this channel
 chain_status_to_conv_mbox   = TextMailbox('chain update to conveyor' , client_chain)        #Sending   the bluetooth commands to   the master EV3 brick on this channel
+master_link                 = new_link("master", chain_status_to_conv_mbox, conv_status_to_chain_mbox)  #Acknowledged messages to/from the master EV3 brick, each message is delivered once
 
 
 ##########~~~~~~~~~~CREATING AND STARTING A TIMER~~~~~~~~~~##########   [Not used]
@@ -85,7 +88,7 @@ box_rol_mid         = False
 box_rol_inp         = False                                                                 #Box status of the input  corner transfer [True (box present) / False (no box)] (location 104)
 box_scis_inp        = "None"                                                                #Box status of the scissorlift        [None / Delivered / Bring to input chain] (location 106)
 conveyor_status     = "Conveyors off"                                                       #Status of the conveyors mode [Off / Automatic] Moving pallets between conveyors locations 101,102,103,104,105,106
-comm_list           = []                                                                    #List with all commands that still need to be send to the master conveyor brick
+comm_list           = new_queue("master")                                                   #Queue with all commands that still need to be send to the master conveyor brick
 pallet_taken_out    = 0                                                                     #Amount of pallets taken out of the high bay racks during the runtime of this program
 pallet_taken_in     = 0                                                                     #Amount of pallets taken in to  the high bay racks during the runtime of this program
 inp_sens_err        = False                                                                 #Variable to see if the input  chain conveyor sensor has triggered an error / has been reset
@@ -119,16 +122,13 @@ ev3.light.off()
 
 ##########~~~~~~~~~~DEFINE SUB-ROUTINES~~~~~~~~~~##########
 ##########~~~~~~~~~~BLUETOOTH SENDING COMMUNICATION COMMANDS~~~~~~~~~~##########
-def communication_control():                                                                #The master EV3 brick will receive with this function all Bluetooth commands
+def communication_control():                                                                #The master EV3 brick will receive with this function all Bluetooth commands, and this brick receives the commands from the master
     global comm_list                                                                        #TODO is this global needed? BT lists are not global but work in master
     wait(1000)                                                                              #Give the master 1second time to start up the bluetooth receiving function
     while True:                                                                             #Start a forever loop
-        wait(300)                                                                           #Allow the receiver some time to read the previous message first
-        if len(comm_list) > 0:                                                              #Check if there is a command in the master conveyor communication list
-            print("outgoing message: %s."%comm_list[0])                                     #Print this feedback line when debugging
-            chain_status_to_conv_mbox.send(comm_list[0])                                    #The message is send by bluetooth communication to the master conveyor brick
-            wait(50)                                                                        #TODO is this needed?
-            del comm_list[0]                                                                #If the message is send, delete it from the communication list
+        wait(link_poll_time)                                                                #Time between checking the mailboxes
+        link_send_list(master_link, comm_list)                                              #Hand the waiting messages to the link, each one is delivered once and in order
+        link_poll(master_link)                                                              #Receive, acknowledge and (re)send messages
 
 
 ##########~~~~~~~~~~DEFINE SUB-ROUTINES [FUNCTIONS] FOR THE OPERATION OF THE WAREHOUSE~~~~~~~~~~##########
@@ -193,7 +193,7 @@ def move_box_chain(pos):
         chain_outp.run_angle(max_speed_chain_conv * remote_speed_adjust, -80, then=Stop.COAST, wait=True)   #Send the chain motor run to the target command, wait for finishing. This returns the box to the center after alignment
         check_free_chain_outp("Free")                                                       #Check if the box has left the start position
         box_cha_outp = False                                                                #Remove the box present at the old location (location 101)
-        comm_list.append("Chain out empty")                                                 #The message is added to the bluetooth communication waiting list for the master conveyor brick 
+        queue_put(comm_list, "Chain out empty")                                             #The message is added to the bluetooth communication waiting list for the master conveyor brick 
         check_emergency_stop()                                                              #Check if a movement is allowed to start
         while lift_outp.angle() < lifting_height - 50:                                      #While the corner transfer is not up
             lift_outp.run_target(max_speed_lifting * remote_speed_adjust, lifting_height, then=Stop.COAST, wait=False)  #Send the corner lifting motor run to the target command, don't wait for finishing
@@ -203,7 +203,7 @@ def move_box_chain(pos):
                     check_emergency_stop()                                                  #Check if the movement is allowed to restart
                     break                                                                   #Close this loop, so motors will restart again
         box_rol_outp = True                                                                 #Set the box present at the new location (location 102)
-        comm_list.append("Roll out full")                                                   #The message is added to the bluetooth communication waiting list for the master conveyor brick
+        queue_put(comm_list, "Roll out full")                                               #The message is added to the bluetooth communication waiting list for the master conveyor brick
     elif pos == "corner to input":                                                          #Check what chain conveyor locations need to start transferring
         while lift_inp.angle() > 50:                                                        #While the corner transfer is up
             lift_inp.run_target(max_speed_lifting * remote_speed_adjust, 0, then=Stop.COAST, wait=False)    #Send the corner lifting motor run to the target command, don't wait for finishing
@@ -225,7 +225,7 @@ def move_box_chain(pos):
                     break                                                                   #Close this loop, so motors will restart again
         check_free_chain_inp("Full")                                                        #Check if the box has arrived at the end position
         box_cha_inp = True                                                                  #Set the box present at the new location (location 105)
-        comm_list.append("Chain in full from corner")                                       #The message is added to the bluetooth communication waiting list for the master conveyor brick
+        queue_put(comm_list, "Chain in full from corner")                                   #The message is added to the bluetooth communication waiting list for the master conveyor brick
         check_emergency_stop()                                                              #Check if a movement is allowed to start
         while lift_inp.angle() < lifting_height - 50:                                       #While the corner transfer is not up
             lift_inp.run_target(max_speed_lifting * remote_speed_adjust, lifting_height, then=Stop.COAST, wait=False)   #Send the corner lifting motor run to the target command, don't wait for finishing
@@ -235,7 +235,7 @@ def move_box_chain(pos):
                     check_emergency_stop()                                                  #Check if the movement is allowed to restart
                     break                                                                   #Close this loop, so motors will restart again
         box_rol_inp = False                                                                 #Remove the box present at the old location (location 104)
-        comm_list.append("Roll in empty")                                                   #The message is added to the bluetooth communication waiting list for the master conveyor brick
+        queue_put(comm_list, "Roll in empty")                                               #The message is added to the bluetooth communication waiting list for the master conveyor brick
     elif pos == "move to scissorlift for 6DoF":                                             #Check what chain conveyor locations need to start transferring
         while lift_inp.angle() > 50:                                                        #While the corner transfer is up
             lift_inp.run_target(max_speed_lifting * remote_speed_adjust, 0, then=Stop.COAST, wait=False)    #Send the corner lifting motor run to the target command, don't wait for finishing
@@ -258,7 +258,7 @@ def move_box_chain(pos):
                     check_emergency_stop()                                                  #Check if the movement is allowed to restart
                     break                                                                   #Close this loop, so motors will restart again
         box_scis_inp = "Delivered"                                                          #Set the box present at the new location (location 106)
-        comm_list.append("Scissor full")                                                    #The message is added to the bluetooth communication waiting list for the master conveyor brick
+        queue_put(comm_list, "Scissor full")                                                #The message is added to the bluetooth communication waiting list for the master conveyor brick
         check_emergency_stop()                                                              #Check if a movement is allowed to start
         while lift_inp.angle() < lifting_height - 50:                                       #While the corner transfer is not up
             lift_inp.run_target(max_speed_lifting * remote_speed_adjust, lifting_height, then=Stop.COAST, wait=False)   #Send the corner lifting motor run to the target command, don't wait for finishing
@@ -268,7 +268,7 @@ def move_box_chain(pos):
                     check_emergency_stop()                                                  #Check if the movement is allowed to restart
                     break                                                                   #Close this loop, so motors will restart again
         box_rol_inp = False                                                                 #Remove the box present at the old location (location 104)
-        comm_list.append("Roll in empty")                                                   #The message is added to the bluetooth communication waiting list for the master conveyor brick
+        queue_put(comm_list, "Roll in empty")                                               #The message is added to the bluetooth communication waiting list for the master conveyor brick
     elif pos == "move from scissorlift":                                                    #Check what chain conveyor locations need to start transferring
         while lift_inp.angle() > 50:                                                        #While the corner transfer is up
             lift_inp.run_target(max_speed_lifting * remote_speed_adjust, 0, then=Stop.COAST, wait=False)    #Send the corner lifting motor run to the target command, don't wait for finishing
@@ -291,7 +291,7 @@ def move_box_chain(pos):
         check_free_chain_inp("Full")                                                        #Check if the box has arrived at the end position
         box_cha_inp = True                                                                  #Set the box present at the new location (location 105)
         box_scis_inp = "None"                                                               #Remove the box present at the old location (location 106)
-        comm_list.append("Chain in full from scissor")                                      #The message is added to the bluetooth communication waiting list for the master conveyor brick
+        queue_put(comm_list, "Chain in full from scissor")                                  #The message is added to the bluetooth communication waiting list for the master conveyor brick
         check_emergency_stop()                                                              #Check if a movement is allowed to start
         while lift_inp.angle() < lifting_height - 50:                                       #While the corner transfer is not up
             lift_inp.run_target(max_speed_lifting * remote_speed_adjust, lifting_height, then=Stop.COAST, wait=False)   #Send the corner lifting motor run to the target command, don't wait for finishing
@@ -301,7 +301,7 @@ def move_box_chain(pos):
                     check_emergency_stop()                                                  #Check if the movement is allowed to restart
                     break                                                                   #Close this loop, so motors will restart again
         box_rol_inp = False                                                                 #Remove the box present at the old location (location 104)
-        comm_list.append("Roll in empty")                                                   #The message is added to the bluetooth communication waiting list for the master conveyor brick
+        queue_put(comm_list, "Roll in empty")                                               #The message is added to the bluetooth communication waiting list for the master conveyor brick
 
 
 def draw_counters():                                                                        #This function writes information on the EV3 screen
@@ -322,8 +322,8 @@ def check_free_chain_inp(position):
             counter += 1                                                                    #Every loop add 1 to the counter (sometimes these sensors give a false value on first read)
             if counter > 5:                                                                 #After more than 5 loops
                 if inp_sens_err == False and chain_inp_sens.distance() < 200:               #Check if the error is not set True yet and the sensor does see something within 20cm still
-                    comm_list.append("Reset")                                               #The message is added to the bluetooth communication waiting list for the master conveyor brick deleting previous message to be able to resend the same
-                    comm_list.append("Inp not free error")                                  #The message is added to the bluetooth communication waiting list for the master conveyor brick
+                    queue_put(comm_list, "Reset")                                           #The message is added to the bluetooth communication waiting list for the master conveyor brick deleting previous message to be able to resend the same
+                    queue_put(comm_list, "Inp not free error")                              #The message is added to the bluetooth communication waiting list for the master conveyor brick
                     inp_sens_err = True                                                     #Set the error to be True
                 #ev3.speaker.say("Input conveyor not free")                                 #This makes the EV3 brick talk [Not used anymore, slows the program to much]
             wait(50)
@@ -332,8 +332,8 @@ def check_free_chain_inp(position):
             counter += 1                                                                    #Every loop add 1 to the counter (sometimes these sensors give a false value on first read)
             if counter > 5:                                                                 #After more than 5 loops
                 if inp_sens_err == False and chain_inp_sens.distance() > 70:                #Check if the error is not set True yet and the sensor does not see something within 7cm still
-                    comm_list.append("Reset")                                               #The message is added to the bluetooth communication waiting list for the master conveyor brick deleting previous message to be able to resend the same
-                    comm_list.append("Inp not full error")                                  #The message is added to the bluetooth communication waiting list for the master conveyor brick
+                    queue_put(comm_list, "Reset")                                           #The message is added to the bluetooth communication waiting list for the master conveyor brick deleting previous message to be able to resend the same
+                    queue_put(comm_list, "Inp not full error")                              #The message is added to the bluetooth communication waiting list for the master conveyor brick
                     inp_sens_err = True                                                     #Set the error to be True
                 #ev3.speaker.say("Input conveyor not full")                                 #This makes the EV3 brick talk [Not used anymore, slows the program to much]
             wait(50)
@@ -348,8 +348,8 @@ def check_free_chain_outp(position):
             counter += 1                                                                    #Every loop add 1 to the counter (sometimes these sensors give a false value on first read)
             if counter > 5:                                                                 #After more than 5 loops
                 if outp_sens_err == False and chain_outp_sens.distance() < 200:             #Check if the error is not set True yet and the sensor does see something within 20cm still
-                    comm_list.append("Reset")                                               #The message is added to the bluetooth communication waiting list for the master conveyor brick deleting previous message to be able to resend the same
-                    comm_list.append("Outp not free error")                                 #The message is added to the bluetooth communication waiting list for the master conveyor brick
+                    queue_put(comm_list, "Reset")                                           #The message is added to the bluetooth communication waiting list for the master conveyor brick deleting previous message to be able to resend the same
+                    queue_put(comm_list, "Outp not free error")                             #The message is added to the bluetooth communication waiting list for the master conveyor brick
                     outp_sens_err = True                                                    #Set the error to be True
                 #ev3.speaker.say("Output conveyor not free")                                #This makes the EV3 brick talk [Not used anymore, slows the program to much]
             wait(50)
@@ -358,12 +358,12 @@ def check_free_chain_outp(position):
             counter += 1                                                                    #Every loop add 1 to the counter (sometimes these sensors give a false value on first read)
             if counter > 5:                                                                 #After more than 5 loops
                 if outp_sens_err == False and chain_outp_sens.distance() > 70:              #Check if the error is not set True yet and the sensor does not see something within 7cm still
-                    comm_list.append("Reset")                                               #The message is added to the bluetooth communication waiting list for the master conveyor brick deleting previous message to be able to resend the same
-                    comm_list.append("Outp not full error")                                 #The message is added to the bluetooth communication waiting list for the master conveyor brick
+                    queue_put(comm_list, "Reset")                                           #The message is added to the bluetooth communication waiting list for the master conveyor brick deleting previous message to be able to resend the same
+                    queue_put(comm_list, "Outp not full error")                             #The message is added to the bluetooth communication waiting list for the master conveyor brick
                     outp_sens_err = True                                                    #Set the error to be True
                 #ev3.speaker.say("Output conveyor not full")                                #This makes the EV3 brick talk [Not used anymore, slows the program to much]
             wait(50)
-        comm_list.append("Input received")                                                  #The message is added to the bluetooth communication waiting list for the master conveyor brick
+        queue_put(comm_list, "Input received")                                              #The message is added to the bluetooth communication waiting list for the master conveyor brick
 
 
 ##########~~~~~~~~~~CREATING MULTITHREADS~~~~~~~~~~##########
@@ -396,11 +396,10 @@ lift_inp.run_target(max_speed_lifting, lifting_height, then=Stop.COAST, wait=Tru
 sub_corner_transfer_output.start()                                                          #This starts the loop thread that controls the output chain conveyor. Non-blocking
 sub_corner_transfer_input.start()                                                           #This starts the loop thread that controls the input  chain conveyor. Non-blocking
 sub_communication_control.start()                                                           #This starts the loop thread that sends all the bluetooth communication to the Master EV3 brick. Non-blocking
-comm_list.append("Homing finished")                                                         #The message is added to the bluetooth communication waiting list for the master conveyor brick
+queue_put(comm_list, "Homing finished")                                                     #The message is added to the bluetooth communication waiting list for the master conveyor brick
 
 while True:                                                                                 #Start a forever loop
-    conv_status_to_chain_mbox.wait_new()                                                    #Wait for a new message to be received by bluetooth from the Master EV3 brick
-    updated_pos = conv_status_to_chain_mbox.read()                                          #Read the last message received by bluetooth from the chain conveyor brick
+    updated_pos = link_wait(master_link)                                                    #Wait for the next message received by bluetooth from the Master EV3 brick
     print("incoming message: %s."%updated_pos)                                              #Print this feedback line when debugging
     if   updated_pos == "Chain out full":                                                   #Compare the received message
         box_cha_outp = True                                                                 #Set the box present at this location (location 105)
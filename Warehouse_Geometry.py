@@ -0,0 +1,91 @@
+# Shared by all warehouse programs (EV3 bricks and ESP32), upload it next to the program that imports it.
+# MIT License: Copyright (c) 2022 Mr Jos
+
+#####################################################################
+#####################################################################
+##########~~~~~PROGRAM WRITTEN BY JOZUA VAN RAVENHORST~~~~~##########
+##########~~~~~~~~~~WAREHOUSE XL: RACK GEOMETRY~~~~~~~~~~~##########
+##########~~~~~~~~~~~~~YOUTUBE CHANNEL: MR JOS~~~~~~~~~~~~~##########
+#####################################################################
+#####################################################################
+
+
+##########~~~~~~~~~~RACK GEOMETRY CONFIGURATION~~~~~~~~~~##########
+rack_length             =   5                                                               #Amount of racks  on 1 side (length)
+rack_floors             =   6                                                               #Amount of floors on 1 side (height)
+rack_sides              =   2                                                               #Amount of sides next to the crane aisle (1 = left / front rack, 2 = right / back rack)
+total_storage_positions =   rack_length * rack_floors * rack_sides                          #Amount of total storage positions in the highbay calculated automatically
+slots_per_rack          =   rack_floors * rack_sides                                        #Amount of storage positions in 1 rack number (both sides)
+
+
+##########~~~~~~~~~~SLOT ADDRESSING (LOCATION 0,1,2,...,59 <-> RACK / FLOOR / SIDE)~~~~~~~~~~##########
+def slot_rack(slot):                                                                        #Rack number the stacker crane drives to for a location (1,2,...,rack_length)
+    return slot // slots_per_rack + 1
+
+
+def slot_floor(slot):                                                                       #Floor number the stacker crane lifts to for a location (1,2,...,rack_floors)
+    return slot % rack_floors + 1
+
+
+def slot_side(slot):                                                                        #Side the telescopic fork extends to for a location (1 = left, 2 = right)
+    return slot // rack_floors % rack_sides + 1
+
+
+def slot_address(slot):                                                                     #Rack, floor and side for a location, in the order the stacker crane drive function uses them
+    return slot_rack(slot), slot_floor(slot), slot_side(slot)
+
+
+def address_slot(rack, floor, side):                                                        #Location number for a rack, floor and side (reverse of slot_address)
+    return (rack - 1) * slots_per_rack + (side - 1) * rack_floors + floor - 1
+
+
+##########~~~~~~~~~~LED STRIP AND TOUCHSCREEN MAPPING~~~~~~~~~~##########
+def slot_led_index(slot):                                                                   #LED on the strip for a location. Lamps run in a loop from bottom to top, and back down. Left lamp = front rack, middle lamp = backside rack
+    pillar      = slot_rack(slot) // 2                                                      #2 Racks per pillar number
+    pillar_side = slot_rack(slot) % 2                                                       #Lamp left of pillar at 0, right side at 1 (no left lamp at the first pillar)
+    level       = slot_floor(slot) - 1                                                      #Level 0 at the bottom
+    return (pillar * rack_floors * 2 * 3) - 3 + (3 * pillar_side) + (- level * 3 + pillar_side * 2 * level * 3) + (slot_side(slot) - 1)
+
+
+def slot_grid_index(slot):                                                                  #Cell in the touchscreen "store to" grid for a location (grid is filled starting at the highest location)
+    return total_storage_positions - 1 - slot
+
+
+##########~~~~~~~~~~STACKER CRANE TRAVEL CONFIGURATION~~~~~~~~~~##########
+crane_rack_coord        =   [210, 806, 1297, 1796, 2296, 2795]                              #Driving motor angles from the homing point to [0] = Chain conveyor pos, [1-5] = Rack numbers starting from front
+crane_lift_coord        =   [31, 108, 711, 1302, 1898, 2485, 3020]                          #Typical ascending lifting motor angles [0] = Conveyors 101,105, [1-6] = Rack levels, replaced by the calibrated values after homing
+crane_rack_pitch        =   500                                                             #Driving motor angle between 2 racks, used to add the positions for racks that are not in the measured list
+crane_floor_pitch       =   595                                                             #Lifting motor angle between 2 floors, used to add the positions for floors that are not in the measured list
+crane_speed_drive       =   1000                                                            #Maximal speed (deg/sec) that the driving motor is allowed to rotate at
+crane_speed_lift        =   1000                                                            #Maximal speed (deg/sec) that the lifting motor is allowed to rotate at
+crane_accel_drive       =   400                                                             #Acceleration (deg/sec²) of the driving motor
+crane_accel_lift        =   500                                                             #Acceleration (deg/sec²) of the lifting motor
+while len(crane_rack_coord) <= rack_length: crane_rack_coord.append(crane_rack_coord[-1] + crane_rack_pitch)    #Extending the lists when the geometry has more racks / floors than measured
+while len(crane_lift_coord) <= rack_floors: crane_lift_coord.append(crane_lift_coord[-1] + crane_floor_pitch)
+
+
+def motor_move_time(distance, speed, accel):                                                #Time (ms) a motor needs to rotate a distance (deg) with a trapezoid speed profile
+    distance = abs(distance)
+    if distance >= speed * speed / accel: return (distance / speed + speed / accel) * 1000  #Reaching full speed
+    return 2 * (distance / accel) ** 0.5 * 1000                                             #Short move, only accelerating and braking
+
+
+def slot_travel_time(slot, lift_coord=crane_lift_coord):                                    #Time (ms) for the stacker crane to go from the chain conveyors to a location and back, driving and lifting at the same time
+    one_way = max(motor_move_time(crane_rack_coord[slot_rack(slot)] - crane_rack_coord[0], crane_speed_drive, crane_accel_drive),
+                  motor_move_time(lift_coord[slot_floor(slot)] - lift_coord[0], crane_speed_lift, crane_accel_lift))
+    return 2 * one_way
+
+
+def position_rack(position):                                                                #Rack number for a stacker crane position, position -1 is the chain conveyors (rack 0)
+    if position < 0: return 0
+    return slot_rack(position)
+
+
+def position_floor(position):                                                               #Floor number for a stacker crane position, position -1 is the chain conveyors (floor 0)
+    if position < 0: return 0
+    return slot_floor(position)
+
+
+def slot_move_time(slot_from, slot_to, lift_coord=crane_lift_coord):                        #Time (ms) for the stacker crane to go from one location to another (-1 = chain conveyors), driving and lifting at the same time
+    return max(motor_move_time(crane_rack_coord[position_rack(slot_to)] - crane_rack_coord[position_rack(slot_from)], crane_speed_drive, crane_accel_drive),
+               motor_move_time(lift_coord[position_floor(slot_to)] - lift_coord[position_floor(slot_from)], crane_speed_lift, crane_accel_lift))
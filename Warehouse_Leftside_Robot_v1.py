@@ -14,6 +14,9 @@ import sys
 import os
 import math
 import struct
+from Warehouse_Robot_Paths import *
+from Warehouse_Messaging import *
+from Warehouse_Queue import *
 
 # This program requires LEGO EV3 MicroPython v2.0 or higher.
 # Click "Open user guide" on the EV3 extension tab for more information.
@@ -112,6 +115,7 @@ roll_head_bt_sp         = NumericMailbox('roll head speed'      , server)
 roll_head_feedb         = NumericMailbox('roll head feedback'   , server)                   #Mailbox with feedback from current theta6 angle
 
 feedback_commands_bt    = TextMailbox   ('feedback from 6dof'   , server)                   #Mailbox that is being forwarded by the left side robot EV3 brick, from the Master Conveyor EV3 brick and returns
+right_link              = new_link("right robot", feedback_commands_bt, feedback_commands_bt)   #Acknowledged messages over the forwarding mailbox, each message is delivered once
 
 
 ##########~~~~~~~~~~CREATING AND STARTING A TIMER, FOR INVERSE KINEMATIC SMOOTH CONTROL~~~~~~~~~~##########
@@ -143,6 +147,8 @@ esp_adj             =   [0, 0, 0, 0, 0, 0]
 program_start       =   True
 old_positions       =   [0, 0, 0]
 actuation_list      =   []
+job_batch           =   []
+next_zone_go        =   False
 
 
 ##########~~~~~~~~~~BRICK STARTUP SETTINGS~~~~~~~~~~##########
@@ -176,12 +182,18 @@ def check_emergency_stop():
         while emergency_stop == True: wait(250)                                             #If there is still an emergency stop, start this loop until the emergency stop has been reset
 
 
+def communication_control():                                                                #This function sends the feedback and receives the commands from the Master Conveyor EV3 brick (forwarded by the right side robot EV3 brick)
+    while True:                                                                             #Start a forever loop
+        wait(link_poll_time)                                                                #Time between checking the mailboxes
+        link_poll(right_link)                                                               #Receive, acknowledge and (re)send messages
+
+
 def manual_esp_homing():                                                                    #This function controls the manual input from the ESP32 touchscreen to make the robot move before homing
     homing_yaw_base_cur_angle = 0                                                           #Defining a local variable
     
     yaw_base_bt_sp.send(200)                                                                #The message is send by bluetooth communication to the slave robot brick, with the speed for joint 1
     while True:                                                                             #Start a forever loop
-        new_task = feedback_commands_bt.wait_new()                                          #Wait for a new command to be received by bluetooth
+        new_task = link_wait(right_link)                                                    #Wait for a new command to be received by bluetooth
         print(new_task)                                                                     #Print this feedback line when debugging
         if   new_task == "Stop motors":                                                     #Compare the received message
             pitch_base.hold()                                                               #Lock joint 2 in position
@@ -195,13 +207,13 @@ def manual_esp_homing():
                 homing_yaw_base_cur_angle -= 10                                             #Add -10 to the local variable
                 yaw_base_bt_num.send(homing_yaw_base_cur_angle)                             #Send the angle by bluetooth to move joint 1
                 wait(50)                                                                    #Wait 50ms (20Hz, running 10 degrees each pulse at 200°/s makes it smooth)
-                if feedback_commands_bt.read() == "Stop motors": break                      #If the motor has to stop moving, break out of this loop
+                if queue_peek(right_link["inbox"]) == "Stop motors": break                  #If "Stop motors" is received, the motor has to stop moving, break out of this loop (the message stays in the inbox for the main loop)
         elif new_task == "J1 CCW":                                                          #Compare the received message
             while True:                                                                     #Start a forever loop
                 homing_yaw_base_cur_angle += 10                                             #Add 10 to the local variable
                 yaw_base_bt_num.send(homing_yaw_base_cur_angle)                             #Send the angle by bluetooth to move joint 1
                 wait(50)                                                                    #Wait 50ms (20Hz, running 10 degrees each pulse at 200°/s makes it smooth)
-                if feedback_commands_bt.read() == "Stop motors": break                      #If the motor has to stop moving, break out of this loop
+                if queue_peek(right_link["inbox"]) == "Stop motors": break                  #If "Stop motors" is received, the motor has to stop moving, break out of this loop (the message stays in the inbox for the main loop)
         elif new_task == "J2 CW":  pitch_base.run(600 * th2_switch)                         #Compare the received message, start the motor for joint 2 clockwise at a constant speed
         elif new_task == "J2 CCW": pitch_base.run(-600 * th2_switch)                        #Compare the received message, start the motor for joint 2 counter-clockwise at a constant speed
         elif new_task == "J3 CW":  pitch_arm.run(-600 * th3_switch)                         #Compare the received message, start the motor for joint 3 clockwise at a constant speed
@@ -488,6 +500,7 @@ def change_stepspeed():
 sub_find_position = Thread(target=find_position)                                            #This creates a thread, made from a previously defined function. No arguments can be given
 sub_move_all_motors = Thread(target=move_all_motors)
 sub_change_stepspeed = Thread(target=change_stepspeed)
+sub_communication_control = Thread(target=communication_control)
 
 
 #sub_find_position.start()                                                                  #This starts the thread for finding realtime XYZ position in the background (NOT USED)
@@ -496,6 +509,7 @@ sub_change_stepspeed.start()
 ##########~~~~~~~~~~WAIT UNTIL (1) BLUETOOTH DEVICE IS CONNECTED~~~~~~~~~~##########
 ##########ALWAYS START THIS SERVER-BRICK FIRST. THEN START THE SLAVE-BRICKS, OR THEY WILL TIMEOUT IF THEY CAN NOT CONNECT TO THIS BRICK BY BLUETOOTH (THIS PROGRAM NEEDS TO BE RUNNING##########
 server.wait_for_connection(1)                                                               #Waiting for the amount of bluetooth devices connected
+sub_communication_control.start()                                                           #This starts the loop thread that sends and receives the bluetooth commands with the Master Conveyor EV3 brick. Non-blocking
 wait(500)
 
 
@@ -634,9 +648,9 @@ wait(500)
 #THETAS [1: +Counter-clockwise from top; 2: +lean backwards; 3: +tip forward; 4: +clockwise from rear; 5: +tip down to zero-point arm; 6: +clockwise from rear]
 
 next_coordinate_linear( 200, -100,  280,   -5,   -10,    0, 1000)                           #Going to safe start position after homing
-feedback_commands_bt.send("Homing finished")
+link_send(right_link, "Homing finished")
 wait(1500)
-feedback_commands_bt.send("Ready")
+link_send(right_link, "Ready")
 
 def moving_scissor_and_zones():
     global job                                                                              #Using this global variable in this local function (if not defined to be global, it will make a local variable)
@@ -647,6 +661,8 @@ def moving_scissor_and_zones():
     elif 100 < job < 200:                                                                   #Pickup on the floor and dropoff at scissor standard height
         pickup_loc(job - 100)
         scissor_loc("dropoff")
+    elif job == 200:                                                                        #Pickup on the floor and dropoff at scissor standard height for several zones after each other
+        batch_zones_to_scissor()
 
 
 def scissor_loc(mode):
@@ -656,108 +672,50 @@ def scissor_loc(mode):
         next_coordinate_linear( 190, -345,  290,  -10,   -12,    0,  900)       #1000       #next_coordinate_linear( 200, -345,  290,  -10,   -12,    0,  900)
         next_coordinate_linear( 320, -345,  290,  -10,   -12,    0,  300)       # 600
         next_coordinate_linear( 320, -345,  400,  -10,   -12,    0,  900)       # 800
-        feedback_commands_bt.send("Picked up")
+        link_send(right_link, "Picked up")
     elif mode == "dropoff":
         next_coordinate_linear( 310, -340,  400,  -10,   -12,    0,  900)       #1000       #next_coordinate_linear( 320, -340,  400,  -10,   -12,    0,  900)
         while scissor_up == False: wait(200)
         next_coordinate_linear( 310, -340,  290,   -5,   -12,    0,  400)       # 800       #next_coordinate_linear( 320, -340,  290,   -5,   -12,    0,  400)
         next_coordinate_linear( 180, -340,  290,  -10,   -12,    0,  300)                   #next_coordinate_linear( 190, -340,  290,  -10,   -12,    0,  300)
-        feedback_commands_bt.send("Ready")
+        link_send(right_link, "Ready")
 
     
 def dropoff_loc(pos):
     global job                                                                              #Using this global variable in this local function (if not defined to be global, it will make a local variable)
 
     print("started to go to dropoff", pos)
-    if   pos == 1:
-        next_coordinate_linear( 335,   40,  400,    0,   -10,    0,  900)                   #TODO Roll and Pitch have some issues with the XL robot, need to find why still
-        next_coordinate_linear( 335,   40,   70,   -5,   -10,    0,  800)
-        next_coordinate_linear( 200,   40,   70,   -5,    -4,    0,  300)
-        next_coordinate_linear( 200,   40,  290,    0,    -5,    0,  900)       # 800
-    elif pos == 2:
-        next_coordinate_linear( 335,  175,  400,    0,   -10,   -5,  900)
-        next_coordinate_linear( 335,  175,   80,    0,   -10,   -5,  800)
-        next_coordinate_linear( 200,  175,   80,    0,    -4,   -5,  300)
-        next_coordinate_linear( 200,  175,  290,    0,    -5,   -5,  900)       # 800
-    elif pos == 3:
-        next_coordinate_linear( 300,  290,  400,    0,   -10,   -5,  900)
-        next_coordinate_linear( 300,  290,  400,    0,   -10,   40,  400)
-        next_coordinate_linear( 300,  290,   80,    0,   -10,   40,  800)
-        next_coordinate_linear( 200,  190,   80,    0,    -4,   40,  300)
-        next_coordinate_linear( 200,  190,  290,    0,    -5,   40,  900)       # 800
-        next_coordinate_linear( 200,  190,  290,    0,    -5,   -5,  900)
-    elif pos == 4:
-        next_coordinate_linear( 150,  290,  400,    0,   -10,   -5,  900)
-        next_coordinate_linear( 150,  290,  400,  -20,   -25,  130,  400)
-        next_coordinate_linear( 150,  290,   90,  -30,   -25,  135,  800)
-        next_coordinate_linear( 225,  170,   90,  -35,   -30,  135,  300)
-        next_coordinate_linear( 225,  170,  290,  -20,    -5,  135,  900)       # 800
-        next_coordinate_linear( 225,  170,  290,    0,    -5,   -5, 1200)
-    elif pos == 5:
-        next_coordinate_linear(-100, -320,  400,    5,   -12, -179,  900)
-        next_coordinate_linear(-100, -320,   80,   10,   -12, -185,  800)
-        next_coordinate_linear(  35, -320,   80,   10,   -12, -185,  300)
-        next_coordinate_linear(  35, -320,  290,   15,   -12, -179,  900)       # 800
-        next_coordinate_linear(  35, -320,  290,  -10,   -12,    0, 1200)
-        next_coordinate_linear( 200, -345,  290,  -10,   -12,    0,  900)
-    elif pos == 6:
-        next_coordinate_linear(-120, -185,  400,    5,   -12, -179,  900)
-        next_coordinate_linear(-120, -185,   75,   10,   -12, -189,  800)
-        next_coordinate_linear(  15, -185,   70,   10,   -12, -187,  300)
-        next_coordinate_linear(  15, -185,  290,   10,   -12, -179,  900)       # 800
-        next_coordinate_linear(  15, -185,  290,  -10,   -12,    0, 1200)
-        next_coordinate_linear( 200, -345,  290,  -10,   -12,    0,  900)
+    for waypoint in zone_dropoff_path[109 + pos]: next_coordinate_linear(*waypoint)         #Drive the taught path for this floor zone (pos 1 = location 110), the waypoints are in Warehouse_Robot_Paths
     job = 0
-    feedback_commands_bt.send("Ready")
+    link_send(right_link, "Ready")
     
 
 def pickup_loc(pos):
     global job                                                                              #Using this global variable in this local function (if not defined to be global, it will make a local variable)
     
-    if   pos == 1:
-        next_coordinate_linear( 200,   40,  290,    0,    -5,    0,  900)       #0  -5   0
-        next_coordinate_linear( 200,   40,   60,   -5,    -2,    0,  900)       #0  -4   0      70  800
-        next_coordinate_linear( 335,   40,   60,   -5,    -5,    0,  300)       #0 -10   0      70
-        next_coordinate_linear( 335,   40,  400,    0,   -10,    0,  900)       #800
-    elif pos == 2:
-        next_coordinate_linear( 200,  175,  290,    0,    -5,   -5,  900)
-        next_coordinate_linear( 200,  175,   70,    0,    -4,   -5,  900)       #               80  800
-        next_coordinate_linear( 335,  175,   70,    0,   -10,   -5,  300)       #               80
-        next_coordinate_linear( 335,  175,  400,    0,   -10,   -5,  900)       #800
-    elif pos == 3:
-        next_coordinate_linear( 200,  190,  290,    0,    -5,   -5,  900)
-        next_coordinate_linear( 200,  190,  290,    0,    -5,   40, 1200)
-        next_coordinate_linear( 200,  190,   65,    0,    -5,   40,  900)       #0  -2  40      80  800
-        next_coordinate_linear( 300,  290,   65,    0,    -4,   40,  300)       #0 -10  40      80
-        next_coordinate_linear( 300,  290,  400,    0,   -10,   40,  900)       #800
-        next_coordinate_linear( 300,  290,  400,    0,   -10,   -5,  400)
-    elif pos == 4:
-        next_coordinate_linear( 225,  170,  290,    0,    -5,   -5,  900)
-        next_coordinate_linear( 225,  170,  290,  -25,    -5,  135, 1200)
-        next_coordinate_linear( 225,  170,  105,  -20,   -25,  135,  900)       #-20  -25  135  90  800
-        next_coordinate_linear( 150,  290,  105,  -20,   -25,  135,  300)       #-20  -25  135  90
-        next_coordinate_linear( 150,  290,  400,  -20,   -25,  130,  900)       #800
-        next_coordinate_linear( 150,  290,  400,    0,   -10,   -5,  400)
-    elif pos == 5:
-        next_coordinate_linear( 200, -345,  290,  -10,   -12,    0,  900)
-        next_coordinate_linear(  35, -320,  290,  -10,   -12,    0,  900)
-        next_coordinate_linear(  35, -320,  290,   15,   -12, -179, 1200)
-        next_coordinate_linear(  35, -320,   80,   10,   -12, -185,  900)       #15  -12  -185  80  800
-        next_coordinate_linear(-100, -320,   80,   10,   -12, -185,  300)       #15  -12  -185  80
-        next_coordinate_linear(-100, -320,  400,   10,   -12, -179,  900)       #800
-    elif pos == 6:
-        next_coordinate_linear( 200, -345,  290,  -10,   -12,    0,  900)
-        next_coordinate_linear(  15, -185,  290,  -10,   -12,    0,  900)
-        next_coordinate_linear(  15, -185,  290,   15,   -12, -179, 1200)
-        next_coordinate_linear(  15, -185,   75,   10,   -12, -187,  900)       #15  -12  -185  80  800
-        next_coordinate_linear(-120, -185,   70,   10,   -12, -189,  300)       #15  -12  -185  80
-        next_coordinate_linear(-120, -185,  400,   10,   -12, -179,  900)       #800
+    for waypoint in zone_pickup_path[109 + pos]: next_coordinate_linear(*waypoint)          #Drive the taught path for this floor zone (pos 1 = location 110), the waypoints are in Warehouse_Robot_Paths
+    job = 0
+    link_send(right_link, "Picked up")
+
+
+def batch_zones_to_scissor():                                                               #Taking the boxes of several floor zones to the scissor, driving from the scissor directly to the next zone without the home pose
+    global job                                                                              #Using these global variables in this local function (if not defined to be global, it will make a local variable)
+    global job_batch
+    global next_zone_go
+
+    for i in range(len(job_batch)):
+        for waypoint in batch_pickup_path(old_positions + old_orientation, job_batch[i]): next_coordinate_linear(*waypoint) #The moves at the travel height are combined, no stop to turn in place before and after the zone
+        if i > 0:
+            while next_zone_go == False: wait(100)                                          #Wait with the next box until the master has lowered the scissor with the previous box, the master waits for "Picked up" again after it
+            next_zone_go = False
+        link_send(right_link, "Picked up")
+        scissor_loc("dropoff")                                                              #Sends "Ready" after every box, the master lowers the scissor and raises it again for the next box
+    job_batch = []
     job = 0
-    feedback_commands_bt.send("Picked up")
 
 
 while True:                                                                                 #Start a forever loop
-    new_task = feedback_commands_bt.wait_new()                                              #Wait for a new incoming bluetooth command on this channel TODO try to use %s for shorter code
+    new_task = link_wait(right_link)                                                        #Wait for a new incoming bluetooth command on this channel TODO try to use %s for shorter code
     print(new_task)                                                                         #Print this feedback line when debugging
     if   new_task == "Scissor standard to zone 110": job = 1                                #Set the job to 1 (Moving from scissor to storage place 1)
     elif new_task == "Scissor standard to zone 111": job = 2                                #Set the job to 2 (Moving from scissor to storage place 2)
@@ -771,6 +729,10 @@ while True:
     elif new_task == "Zone 113 to scissor standard": job = 104                              #Set the job to 104 (Moving storage place 4 to the scissor)
     elif new_task == "Zone 114 to scissor standard": job = 105                              #Set the job to 105 (Moving storage place 5 to the scissor)
     elif new_task == "Zone 115 to scissor standard": job = 106                              #Set the job to 106 (Moving storage place 6 to the scissor)
+    elif "Zones to scissor standard: " in new_task:                                         #Several floor zones in 1 command "Zones to scissor standard: 112,110,111", in the order the master wants them
+        job_batch = [int(x) for x in new_task.split(": ")[1].split(",")]                    #Save the floor zone locations in the global variable
+        job = 200                                                                           #Set the job to 200 (Moving all storage places in the batch to the scissor)
+    elif new_task == "Next zone go":                 next_zone_go   = True                  #The master has finished the previous box of the batch, the next box can be taken to the scissor
     elif new_task == "Emergency stop pushed":        emergency_stop = True                  #Set the Emergency state
     elif new_task == "Emergency stop reset":         emergency_stop = False                 #Reset the Emergency state
     elif new_task == "Scissor is up":                scissor_up     = True                  #Set the global variable scissor position up as False (scissor is down)
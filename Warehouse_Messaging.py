@@ -0,0 +1,138 @@
+# Shared by all EV3 programs, upload it next to the program that imports it.
+# MIT License: Copyright (c) 2022 Mr Jos
+from pybricks.tools import wait, StopWatch
+from random import randint
+from _thread import allocate_lock
+from Warehouse_Queue import *
+
+#####################################################################
+#####################################################################
+##########~~~~~PROGRAM WRITTEN BY JOZUA VAN RAVENHORST~~~~~##########
+##########~~~~~~~~WAREHOUSE XL: BLUETOOTH MESSAGES~~~~~~~~~##########
+##########~~~~~~~~~~~~~YOUTUBE CHANNEL: MR JOS~~~~~~~~~~~~~##########
+#####################################################################
+#####################################################################
+
+
+##########~~~~~~~~~~BLUETOOTH MESSAGE LAYER CONFIGURATION~~~~~~~~~~##########
+#Messages are send as frames "session,frame,sequence,ack session,acknowledge,text" on the TextMailbox of that direction
+#   session     = random number for this program run, so a restarted brick is not seen as sending old messages
+#   frame       = counts every send, a TextMailbox only keeps the last text so each frame has to look different
+#   sequence    = number of the first message in the frame (1,2,...,999,1,...), 0 = frame without a message (only an acknowledge)
+#   ack session = session of the other side that the acknowledge belongs to, an acknowledge for an earlier program run is not used
+#   acknowledge = sequence number of the last message received in order from the other side (all messages before it are received too)
+#   text        = all messages that are not acknowledged yet (maximum link_window), separated by a new line, the next ones have the next sequence numbers
+#A TextMailbox only keeps the last frame, so every frame carries the complete window. The receiver uses each sequence number only once
+link_retry_time         =   250                                                             #Time (ms) without an acknowledge before sending the same messages again
+link_poll_time          =   10                                                              #Time (ms) between checking the mailboxes
+link_max_sequence       =   999                                                             #Highest sequence number, then it starts at 1 again
+link_window             =   4                                                               #Maximum amount of messages on their way at the same time, without an acknowledge yet
+link_report_time        =   60000                                                           #Time (ms) between printing the queue and latency counters of a link
+link_debug              =   False                                                           #True = print every outgoing message and the counters of each link every link_report_time
+#State messages only tell the newest value of a setting, a newer value replaces an older one that is still waiting. All other messages are events, they are all delivered in order
+link_state_groups       =   [["Scissor is up", "Scissor is down"], ["Robot used", "Robot not used"], ["Conveyors off", "Conveyors automatic"]]   #Messages that are values of the same state
+link_state_prefixes     =   ["Speed adjustment: ", "Height adjustment: ", "Adjust J1: ", "Adjust J2: ", "Adjust J3: ", "Adjust J4: ", "Adjust J5: ", "Adjust J6: "]   #Messages "prefix + value" of a setting
+
+
+def new_link(name, send_mbox, recv_mbox, pace=link_poll_time):                              #Returns a message link to 1 other brick, over the mailbox for sending and the mailbox for receiving (can be the same mailbox). Pace = time (ms) between 2 link_poll
+    return {"name": name, "send": send_mbox, "recv": recv_mbox, "pace": pace, "session": randint(1, 9999), "frame": 0, "sequence": 0, "out": [], "unacked": [], "timer": StopWatch(),
+            "clock": StopWatch(), "last_frame": None, "peer_session": 0, "peer_sequence": 0, "ack_due": False, "inbox": new_queue("%s inbox"%name), "lock": allocate_lock(),
+            "depth_max": 0, "delivered": 0, "latency_total": 0, "latency_max": 0, "last_report": 0, "replaced": 0}
+
+
+def message_state(text):                                                                    #Returns the state a message is a value of, or None if the message is an event
+    for group in link_state_groups:
+        if text in group: return group[0]
+    for prefix in link_state_prefixes:
+        if text.startswith(prefix): return prefix
+    return None
+
+
+def link_send(link, text):                                                                  #Adding a message to the waiting list of the link, it is delivered once and in order. Any thread can call it
+    state = message_state(text)
+    with link["lock"]:                                                                      #The link thread takes messages from the waiting list at the same time
+        if state != None:                                                                   #A state message replaces an older value of the same state that is still waiting, if there is no event waiting after it
+            for i in range(len(link["out"]) - 1, -1, -1):
+                waiting_state = message_state(link["out"][i][0])
+                if waiting_state == None: break                                             #An event after the older value, it has to be received with the older value still set
+                if waiting_state == state:
+                    del link["out"][i]
+                    link["replaced"] += 1
+                    break
+        link["out"].append([text, link["clock"].time()])                                    #Remember when the message was added, for the latency counter
+        link["depth_max"] = max(link["depth_max"], len(link["out"]) + len(link["unacked"]))
+
+
+def link_send_list(link, comm_list):                                                        #Moving all messages from a communication waiting queue of the program to the link
+    text = queue_get(comm_list)
+    while text != None:
+        link_send(link, text)
+        text = queue_get(comm_list)
+
+
+def link_frame(link):                                                                       #Sending 1 frame with all messages that are not acknowledged yet, every frame also acknowledges the last received message
+    link["frame"] = link["frame"] % 9999 + 1
+    if link["unacked"] == []: sequence = 0
+    else: sequence = link["unacked"][0][0]
+    link["send"].send("%s,%s,%s,%s,%s,%s"%(link["session"], link["frame"], sequence, link["peer_session"], link["peer_sequence"], "\n".join([x[1] for x in link["unacked"]])))
+    link["ack_due"] = False
+    link["timer"].reset()
+
+
+def link_acknowledged(link, ack):                                                           #Removing all messages up to the acknowledged sequence number from the window, and counting their latency
+    sequences = [x[0] for x in link["unacked"]]
+    if not(ack in sequences): return                                                        #An acknowledge for messages that were already removed
+    for x in range(sequences.index(ack) + 1):
+        latency = link["clock"].time() - link["unacked"][0][2]
+        link["delivered"]     += 1
+        link["latency_total"] += latency
+        link["latency_max"]    = max(link["latency_max"], latency)
+        del link["unacked"][0]
+
+
+def link_poll(link):                                                                        #1 pass of receiving and sending for a link, call it in a loop every link pace
+    frame = link["recv"].read()
+    if frame != None and frame != link["last_frame"]:                                       #A new frame from the other brick
+        link["last_frame"] = frame
+        try:
+            session, frame_nr, sequence, ack_session, ack, text = frame.split(",", 5)
+            sequence = int(sequence)
+            if int(session) != link["peer_session"]:                                        #The other brick has (re)started, accept its messages from the start
+                link["peer_session"]  = int(session)
+                link["peer_sequence"] = max(sequence - 1, 0)
+            if int(ack_session) == link["session"]: link_acknowledged(link, int(ack))       #Only an acknowledge of messages from this program run, not of a brick that was restarted
+            if sequence != 0:
+                for message in text.split("\n"):
+                    if sequence == link["peer_sequence"] % link_max_sequence + 1:           #The next message in order, earlier ones were already received (send again because the acknowledge got lost)
+                        if queue_put(link["inbox"], message, 0) == False: break             #Inbox full: not acknowledged, so the other brick sends it again later (this thread never waits on a program that is not reading)
+                        link["peer_sequence"] = sequence
+                    sequence = sequence % link_max_sequence + 1
+                link["ack_due"] = True
+        except: print("Unreadable message from %s brick: %s."%(link["name"], frame))        #Print this feedback line when debugging
+    new_messages = False
+    with link["lock"]:
+        while len(link["unacked"]) < link_window and len(link["out"]) > 0:                  #Fill the window with the next messages
+            link["sequence"] = link["sequence"] % link_max_sequence + 1
+            link["unacked"].append([link["sequence"], link["out"][0][0], link["out"][0][1]])
+            if link_debug == True: print("outgoing message to %s brick: %s."%(link["name"], link["out"][0][0])) #Print this feedback line when debugging
+            del link["out"][0]
+            new_messages = True
+    if new_messages == True or link["ack_due"] == True or (link["unacked"] != [] and link["timer"].time() > link_retry_time):    #Send new messages, an acknowledge, or send again without an acknowledge in time
+        link_frame(link)
+    if link_debug == True and link["clock"].time() - link["last_report"] > link_report_time: #Print the counters of this link every minute when debugging
+        link["last_report"] = link["clock"].time()
+        print(link_stats(link), "/", queue_stats(link["inbox"]))
+
+
+def link_stats(link):                                                                       #Returns a text with the queue depth and latency counters of a link
+    if link["delivered"] == 0: latency_avg = 0
+    else: latency_avg = link["latency_total"] // link["delivered"]
+    return "%s link: %s waiting, %s on their way (max %s), %s delivered, %s replaced, latency avg %sms max %sms"%(link["name"], len(link["out"]), len(link["unacked"]), link["depth_max"], link["delivered"], link["replaced"], latency_avg, link["latency_max"])
+
+
+def link_read(link):                                                                        #Returns the next received message, or None if there is no new message
+    return queue_get(link["inbox"])
+
+
+def link_wait(link):                                                                        #Waits for the next received message and returns it, a thread of the program needs to be calling link_poll
+    return queue_get(link["inbox"], -1)
@@ -0,0 +1,75 @@
+# Shared by the EV3 programs (no pybricks imports), upload it next to the program that imports it. Warehouse_Messaging needs it too.
+# MIT License: Copyright (c) 2022 Mr Jos
+from _thread import allocate_lock
+from utime import ticks_ms, ticks_diff, sleep_ms
+
+#####################################################################
+#####################################################################
+##########~~~~~PROGRAM WRITTEN BY JOZUA VAN RAVENHORST~~~~~##########
+##########~~~~~~~~~~~WAREHOUSE XL: MESSAGE QUEUES~~~~~~~~~~##########
+##########~~~~~~~~~~~~~YOUTUBE CHANNEL: MR JOS~~~~~~~~~~~~~##########
+#####################################################################
+#####################################################################
+
+
+##########~~~~~~~~~~MESSAGE QUEUE CONFIGURATION~~~~~~~~~~##########
+#A queue is a ring buffer with a fixed size, adding or taking a message never moves the other messages in the buffer
+#Every put and get is done while holding the lock of the queue, so 2 threads can never take the same message or overwrite each other
+queue_poll_time         =   10                                                              #Time (ms) between checks while a put or get is waiting
+queue_default_size      =   64                                                              #Amount of messages a queue can hold if no size is given
+
+
+def new_queue(name, size=queue_default_size, overflow="Block"):                             #Returns an empty queue. Overflow = what a put does on a full queue [Block (wait for room, nothing is lost) / Drop oldest / Reject]
+    return {"name": name, "buffer": [None] * size, "size": size, "head": 0, "count": 0, "lock": allocate_lock(), "overflow": overflow, "high_water": 0, "dropped": 0}
+
+
+def queue_put(queue, item, timeout=-1):                                                     #Adding a message at the end of the queue, returns True if it is added. Timeout (ms) for a full Block queue, -1 = wait as long as needed
+    start = ticks_ms()
+    while True:
+        with queue["lock"]:
+            if queue["count"] == queue["size"]:                                             #The queue is full, use the overflow policy
+                if queue["overflow"] == "Drop oldest":
+                    queue["buffer"][queue["head"]] = None
+                    queue["head"]   = (queue["head"] + 1) % queue["size"]
+                    queue["count"] -= 1
+                    queue["dropped"] += 1
+                elif queue["overflow"] == "Reject":
+                    queue["dropped"] += 1
+                    return False
+            if queue["count"] < queue["size"]:
+                queue["buffer"][(queue["head"] + queue["count"]) % queue["size"]] = item
+                queue["count"]     += 1
+                queue["high_water"] = max(queue["high_water"], queue["count"])
+                return True
+        if timeout >= 0 and ticks_diff(ticks_ms(), start) >= timeout:                       #Block queue still full after the timeout
+            print("Queue %s is full, message not added: %s"%(queue["name"], item))          #Print this feedback line when debugging
+            return False
+        sleep_ms(queue_poll_time)
+
+
+def queue_get(queue, timeout=0):                                                            #Taking the first message from the queue, returns None if it stays empty. Timeout (ms) to wait for a message, 0 = no waiting, -1 = wait as long as needed
+    start = ticks_ms()
+    while True:
+        with queue["lock"]:
+            if queue["count"] > 0:
+                item = queue["buffer"][queue["head"]]
+                queue["buffer"][queue["head"]] = None                                       #Not keeping a reference to a message that is taken
+                queue["head"]   = (queue["head"] + 1) % queue["size"]
+                queue["count"] -= 1
+                return item
+        if timeout >= 0 and ticks_diff(ticks_ms(), start) >= timeout: return None
+        sleep_ms(queue_poll_time)
+
+
+def queue_peek(queue):                                                                      #Returns the first message without taking it from the queue, None if it is empty
+    with queue["lock"]:
+        if queue["count"] == 0: return None
+        return queue["buffer"][queue["head"]]
+
+
+def queue_len(queue):                                                                       #Amount of messages in the queue
+    return queue["count"]
+
+
+def queue_stats(queue):                                                                     #Returns a text with the fill level, high-water mark and dropped messages of a queue
+    return "%s queue: %s/%s, max %s, %s dropped"%(queue["name"], queue["count"], queue["size"], queue["high_water"], queue["dropped"])
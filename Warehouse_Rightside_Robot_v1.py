@@ -13,6 +13,7 @@ from math import fmod
 import sys
 import os
 import math
+from Warehouse_Messaging import *
 
 # This program requires LEGO EV3 MicroPython v2.0 or higher.
 # Click "Open user guide" on the EV3 extension tab for more information.
@@ -68,6 +69,9 @@ feedback_commands_bt        = TextMailbox   ('feedback from 6dof',       client_
 conv_status_to_robot_mbox   = TextMailbox   ('conveyor update to robot', client_robot)      #Receiving the bluetooth commands from the master Conveyor EV3 brick on this channel
 robot_status_to_conv_mbox   = TextMailbox   ('robot update to conveyor', client_robot)      #Sending   the bluetooth commands to   the master Conveyor EV3 brick on this channel
 
+conv_link                   = new_link("conveyor", robot_status_to_conv_mbox, conv_status_to_robot_mbox)   #Acknowledged messages to/from the master Conveyor EV3 brick, each message is delivered once
+left_link                   = new_link("left robot", feedback_commands_bt, feedback_commands_bt)           #Acknowledged messages to/from the master Robot EV3 brick, each message is delivered once
+
 
 ##########~~~~~~~~~~CREATING AND STARTING A TIMER~~~~~~~~~~##########   [Not used]
 #timer_movement = StopWatch()                                                               #Creating a timer
@@ -78,8 +82,6 @@ robot_status_to_conv_mbox   = TextMailbox   ('robot update to conveyor', client_
 
 
 ##########~~~~~~~~~~BUILDING GLOBAL VARIABLES~~~~~~~~~~##########
-old_task        =   "no task"                                                               #Used to save the last task that was received from the master Conveyor brick
-old_feedback    =   "no feedback"                                                           #Used to save the last task that was received from the master Robot brick
 light_mode      =   "startup"                                                               #Used to see in what mode the robot is, and accordingly set/flash the power function lights
 
 
@@ -133,28 +135,25 @@ def move_roll_head():
 
 
 def control_check():
-    global old_task                                                                         #Using these global variables in this local function (if not defined to be global, it will make a local variable)
-    global old_feedback
-    global light_mode
+    global light_mode                                                                       #Using this global variable in this local function (if not defined to be global, it will make a local variable)
 
     if yaw_base.control.done() == True and roll_head.control.done() == True:                #Check if both motors have finished their movement and reached the set motor angles
         commands_bt_text.send("No movement")                                                #If finished, send to the Master Robot EV3 brick that there is no more movement
     else: commands_bt_text.send("Moving")                                                   #If not finished, send to the Master Robot EV3 brick that there is still movement
-    wait(100)                                                                               #Allow the receiver some time to read the previous message first
-    new_task = conv_status_to_robot_mbox.read()                                             #Read the last message received by bluetooth from the Master Conveyor EV3 brick on this channel
-    if new_task != old_task:                                                                #Compare the received message, if it is a new message
-        feedback_commands_bt.send(new_task)                                                 #Send the new message to the Master Robot EV3 brick
-        if new_task != "emergency stop pushed" and new_task != "emergency stop reset": light_mode = "moving"    #Change the lights mode
-        old_task = new_task                                                                 #Set the new message as old message
-        print(new_task)                                                                     #Print this feedback line when debugging
-        wait(50)                                                                            #Allow the receiver some time to read the previous message first
-    new_feedback = feedback_commands_bt.read()                                              #Read the last message received by bluetooth from the Master Robot EV3 brick on this channel
-    if new_feedback != old_feedback:                                                        #Compare the received message, if it is a new message
-        print(new_feedback)                                                                 #Print this feedback line when debugging
-        if new_feedback == "ready": light_mode = "off"                                      #Change the lights mode
-        robot_status_to_conv_mbox.send(new_feedback)                                        #Send the new message to the Master Conveyor EV3 brick
-        old_feedback = new_feedback                                                         #Set the new message as old message
-        wait(50)                                                                            #Allow the receiver some time to read the previous message first
+    for x in range(100 // link_poll_time):                                                  #Allow the receiver some time to read the previous message first (100ms), meanwhile pass on the messages between both master bricks
+        wait(link_poll_time)
+        link_poll(conv_link)                                                                #Receive, acknowledge and (re)send messages with the Master Conveyor EV3 brick
+        link_poll(left_link)                                                                #Receive, acknowledge and (re)send messages with the Master Robot EV3 brick
+        new_task = link_read(conv_link)                                                     #Read the next message received by bluetooth from the Master Conveyor EV3 brick
+        if new_task != None:                                                                #If there is a new message
+            link_send(left_link, new_task)                                                  #Send the new message to the Master Robot EV3 brick
+            if new_task != "emergency stop pushed" and new_task != "emergency stop reset": light_mode = "moving"    #Change the lights mode
+            print(new_task)                                                                 #Print this feedback line when debugging
+        new_feedback = link_read(left_link)                                                 #Read the next message received by bluetooth from the Master Robot EV3 brick
+        if new_feedback != None:                                                            #If there is a new message
+            print(new_feedback)                                                             #Print this feedback line when debugging
+            if new_feedback == "ready": light_mode = "off"                                  #Change the lights mode
+            link_send(conv_link, new_feedback)                                              #Send the new message to the Master Conveyor EV3 brick
 
 
 ##########~~~~~~~~~~DEFINE SUB-ROUTINES~~~~~~~~~~##########
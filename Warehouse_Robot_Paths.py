@@ -0,0 +1,148 @@
+# Shared by the master EV3 and the leftside 6DOF robot, upload it next to the program that imports it.
+# MIT License: Copyright (c) 2022 Mr Jos
+import math
+
+#####################################################################
+#####################################################################
+##########~~~~~PROGRAM WRITTEN BY JOZUA VAN RAVENHORST~~~~~##########
+##########~~~~~~~~~~WAREHOUSE XL: 6DOF ROBOT PATHS~~~~~~~~~~##########
+##########~~~~~~~~~~~~~YOUTUBE CHANNEL: MR JOS~~~~~~~~~~~~~##########
+#####################################################################
+#####################################################################
+
+
+##########~~~~~~~~~~FLOOR ZONE WAYPOINTS [X, Y, Z, ROLL, PITCH, YAW, SPEED] (SAME ARGUMENTS AS next_coordinate_linear)~~~~~~~~~~##########
+#After re-teaching a path, only change it here. The robot drives these lists, and the master rebuilds the zone cost table from them at startup
+scissor_pickup_exit     =   [ 320, -345,  400,  -10,   -12,    0,  300]                     #Last  position of scissor_loc("pickup"),  where every path to a floor zone starts
+scissor_pickup_entry    =   [ 190, -345,  290,  -10,   -12,    0,  900]                     #First position of scissor_loc("pickup"),  the robot goes here after a floor zone dropoff
+scissor_dropoff_exit    =   [ 180, -340,  290,  -10,   -12,    0,  300]                     #Last  position of scissor_loc("dropoff"), where every path to pickup at a floor zone starts
+scissor_dropoff_entry   =   [ 310, -340,  400,  -10,   -12,    0,  900]                     #First position of scissor_loc("dropoff"), the robot goes here after a floor zone pickup
+
+zone_dropoff_path = {
+    110: [[ 335,   40,  400,    0,   -10,    0,  900],                                      #TODO Roll and Pitch have some issues with the XL robot, need to find why still
+          [ 335,   40,   70,   -5,   -10,    0,  800],
+          [ 200,   40,   70,   -5,    -4,    0,  300],
+          [ 200,   40,  290,    0,    -5,    0,  900]],                                     # 800
+    111: [[ 335,  175,  400,    0,   -10,   -5,  900],
+          [ 335,  175,   80,    0,   -10,   -5,  800],
+          [ 200,  175,   80,    0,    -4,   -5,  300],
+          [ 200,  175,  290,    0,    -5,   -5,  900]],                                     # 800
+    112: [[ 300,  290,  400,    0,   -10,   -5,  900],
+          [ 300,  290,  400,    0,   -10,   40,  400],
+          [ 300,  290,   80,    0,   -10,   40,  800],
+          [ 200,  190,   80,    0,    -4,   40,  300],
+          [ 200,  190,  290,    0,    -5,   40,  900],                                      # 800
+          [ 200,  190,  290,    0,    -5,   -5,  900]],
+    113: [[ 150,  290,  400,    0,   -10,   -5,  900],
+          [ 150,  290,  400,  -20,   -25,  130,  400],
+          [ 150,  290,   90,  -30,   -25,  135,  800],
+          [ 225,  170,   90,  -35,   -30,  135,  300],
+          [ 225,  170,  290,  -20,    -5,  135,  900],                                      # 800
+          [ 225,  170,  290,    0,    -5,   -5, 1200]],
+    114: [[-100, -320,  400,    5,   -12, -179,  900],
+          [-100, -320,   80,   10,   -12, -185,  800],
+          [  35, -320,   80,   10,   -12, -185,  300],
+          [  35, -320,  290,   15,   -12, -179,  900],                                      # 800
+          [  35, -320,  290,  -10,   -12,    0, 1200],
+          [ 200, -345,  290,  -10,   -12,    0,  900]],
+    115: [[-120, -185,  400,    5,   -12, -179,  900],
+          [-120, -185,   75,   10,   -12, -189,  800],
+          [  15, -185,   70,   10,   -12, -187,  300],
+          [  15, -185,  290,   10,   -12, -179,  900],                                      # 800
+          [  15, -185,  290,  -10,   -12,    0, 1200],
+          [ 200, -345,  290,  -10,   -12,    0,  900]]}
+
+zone_pickup_path = {
+    110: [[ 200,   40,  290,    0,    -5,    0,  900],                                      #0  -5   0
+          [ 200,   40,   60,   -5,    -2,    0,  900],                                      #0  -4   0      70  800
+          [ 335,   40,   60,   -5,    -5,    0,  300],                                      #0 -10   0      70
+          [ 335,   40,  400,    0,   -10,    0,  900]],                                     #800
+    111: [[ 200,  175,  290,    0,    -5,   -5,  900],
+          [ 200,  175,   70,    0,    -4,   -5,  900],                                      #               80  800
+          [ 335,  175,   70,    0,   -10,   -5,  300],                                      #               80
+          [ 335,  175,  400,    0,   -10,   -5,  900]],                                     #800
+    112: [[ 200,  190,  290,    0,    -5,   -5,  900],
+          [ 200,  190,  290,    0,    -5,   40, 1200],
+          [ 200,  190,   65,    0,    -5,   40,  900],                                      #0  -2  40      80  800
+          [ 300,  290,   65,    0,    -4,   40,  300],                                      #0 -10  40      80
+          [ 300,  290,  400,    0,   -10,   40,  900],                                      #800
+          [ 300,  290,  400,    0,   -10,   -5,  400]],
+    113: [[ 225,  170,  290,    0,    -5,   -5,  900],
+          [ 225,  170,  290,  -25,    -5,  135, 1200],
+          [ 225,  170,  105,  -20,   -25,  135,  900],                                      #-20  -25  135  90  800
+          [ 150,  290,  105,  -20,   -25,  135,  300],                                      #-20  -25  135  90
+          [ 150,  290,  400,  -20,   -25,  130,  900],                                      #800
+          [ 150,  290,  400,    0,   -10,   -5,  400]],
+    114: [[ 200, -345,  290,  -10,   -12,    0,  900],
+          [  35, -320,  290,  -10,   -12,    0,  900],
+          [  35, -320,  290,   15,   -12, -179, 1200],
+          [  35, -320,   80,   10,   -12, -185,  900],                                      #15  -12  -185  80  800
+          [-100, -320,   80,   10,   -12, -185,  300],                                      #15  -12  -185  80
+          [-100, -320,  400,   10,   -12, -179,  900]],                                     #800
+    115: [[ 200, -345,  290,  -10,   -12,    0,  900],
+          [  15, -185,  290,  -10,   -12,    0,  900],
+          [  15, -185,  290,   15,   -12, -179, 1200],
+          [  15, -185,   75,   10,   -12, -187,  900],                                      #15  -12  -185  80  800
+          [-120, -185,   70,   10,   -12, -189,  300],                                      #15  -12  -185  80
+          [-120, -185,  400,   10,   -12, -179,  900]]}                                     #800
+
+
+##########~~~~~~~~~~PATH COST (SAME STEP CALCULATION AS next_coordinate_linear)~~~~~~~~~~##########
+path_stepspeed          =   70                                                              #Stepspeed of the robot program at startup, every inverse kinematic step takes about the same time
+path_length_weight      =   0.01                                                            #Cost of 1 mm forkboard travel in steps, the steps are the duration and the length only decides between zones with about the same amount of steps
+path_travel_height      =   290                                                             #Height (mm) above every floor zone and the scissorlift, waypoints after each other at or above it are driven as 1 move when paths are combined
+
+
+def path_steps(start, waypoints):                                                           #Amount of inverse kinematic steps for a waypoint list starting at a position, this is the duration of the path
+    steps    = 0
+    position = start
+    for point in waypoints:
+        step         = math.ceil(point[6] / path_stepspeed)
+        max_distance = max([math.fabs(point[i] - position[i]) for i in range(3)] + [math.fabs(point[i] - position[i]) / 2 for i in range(3, 6)])   #Orientation counts as half distance displacement, like in the robot
+        steps       += math.ceil(max_distance / step)
+        position     = point
+    return steps
+
+
+def path_length(start, waypoints):                                                          #Distance (mm) the forkboard travels for a waypoint list starting at a position
+    length   = 0
+    position = start
+    for point in waypoints:
+        length  += math.sqrt(sum([(point[i] - position[i]) ** 2 for i in range(3)]))
+        position = point
+    return length
+
+
+def merge_travel_moves(waypoints):                                                          #Waypoint list where the waypoints between 2 others at the travel height are left out, the robot moves and turns in 1 linear move instead of stopping at each
+    merged = [waypoints[0]]
+    for i in range(1, len(waypoints) - 1):
+        if merged[-1][2] >= path_travel_height and waypoints[i][2] >= path_travel_height and waypoints[i + 1][2] >= path_travel_height:
+            waypoints[i + 1] = waypoints[i + 1][:6] + [min(waypoints[i][6], waypoints[i + 1][6])] #The combined move uses the slowest speed of the 2 moves
+            continue
+        merged.append(waypoints[i])
+    merged.append(waypoints[-1])
+    return merged
+
+
+def batch_pickup_path(start, zone):                                                         #Pickup path for a floor zone in a batch, from where the robot is (scissor dropoff) directly to the zone and back to scissor_dropoff_entry (not included, scissor_loc drives it)
+    return merge_travel_moves([start] + zone_pickup_path[zone] + [scissor_dropoff_entry])[1:-1]
+
+
+def zone_path_parts(zone):                                                                  #[Steps, mm] for bringing a box from the scissorlift to a floor zone and taking it back later
+    dropoff = zone_dropoff_path[zone] + [scissor_pickup_entry]                              #The robot drives back to the scissorlift after each dropoff and pickup
+    pickup  = zone_pickup_path[zone]  + [scissor_dropoff_entry]
+    return [path_steps(scissor_pickup_exit, dropoff) + path_steps(scissor_dropoff_exit, pickup), int(path_length(scissor_pickup_exit, dropoff) + path_length(scissor_dropoff_exit, pickup))]
+
+
+def zone_path_cost(zone):                                                                   #1 cost for a floor zone, steps + weighted mm, lower is faster
+    steps, length = zone_path_parts(zone)
+    return steps + length * path_length_weight
+
+
+def build_zone_costs():                                                                     #Cost table for all floor zones {zone: cost}, rebuild it after re-teaching a path
+    return {zone: zone_path_cost(zone) for zone in zone_dropoff_path}
+
+
+if __name__ == "__main__":                                                                  #Running this file on its own prints the cost table, cheapest zone first
+    zone_costs = build_zone_costs()
+    for zone in sorted(zone_costs, key=lambda x: zone_costs[x]): print(zone, "cost:", zone_costs[zone], "[steps, mm]:", zone_path_parts(zone))
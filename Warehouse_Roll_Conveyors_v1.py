@@ -8,7 +8,8 @@ from pybricks.robotics import DriveBase
 from pybricks.media.ev3dev import SoundFile, Image, ImageFile, Font
 from pybricks.messaging import BluetoothMailboxServer, BluetoothMailboxClient, LogicMailbox, NumericMailbox, TextMailbox
 from threading import Thread
-from random import choice
+from _thread import allocate_lock
+from random import choice, randint
 from math import fmod
 import sys
 import os
@@ -18,6 +19,10 @@ import struct
 from pybricks.iodevices import UARTDevice
 from utime import ticks_ms
 from uartremote import *
+from Warehouse_Geometry import *
+from Warehouse_Robot_Paths import *
+from Warehouse_Messaging import *
+from Warehouse_Queue import *
 
 # This program requires LEGO EV3 MicroPython v2.0 or higher.
 # Click "Open user guide" on the EV3 extension tab for more information.
@@ -88,6 +93,10 @@ crane_status_to_conv_mbox   =   TextMailbox     ('crane update to conveyor' , se
 conv_status_to_robot_mbox   =   TextMailbox     ('conveyor update to robot' , server_roll)  #Sending   the bluetooth commands to   the robot EV3 brick on this channel
 robot_status_to_conv_mbox   =   TextMailbox     ('robot update to conveyor' , server_roll)  #Receiving the bluetooth commands from the robot EV3 brick on this channel
 
+chain_link                  =   new_link("chain", conv_status_to_chain_mbox, chain_status_to_conv_mbox)    #Acknowledged messages to/from the chain EV3 brick, each message is delivered once
+crane_link                  =   new_link("crane", conv_status_to_crane_mbox, crane_status_to_conv_mbox)    #Acknowledged messages to/from the crane EV3 brick, each message is delivered once
+robot_link                  =   new_link("robot", conv_status_to_robot_mbox, robot_status_to_conv_mbox)    #Acknowledged messages to/from the robot EV3 brick, each message is delivered once
+
 
 ##########~~~~~~~~~~CREATING AND STARTING A TIMER~~~~~~~~~~##########
 #timer_movement = StopWatch()                                                               #Creating a timer
@@ -96,33 +105,33 @@ robot_status_to_conv_mbox   =   TextMailbox     ('robot update to conveyor' , se
 #timer_movement.resume()                                                                    #Resuming a timer
 #timer_movement.reset()                                                                     #Putting  a timer back at 0, if not stopped it will just keep running but start from 0 again.
 timer_floors    = StopWatch()                                                               #TODO check if this timer is still used
+timer_outside_wms = StopWatch()                                                             #Timer since the last time the outside WMS was saved to the offline file
+timer_pick_counts = StopWatch()                                                             #Timer since the last time the pick counts were saved to the offline file
+timer_jobs      = StopWatch()                                                               #Clock for the enqueue time and waiting time of all jobs in the job queues
+timer_crane_idle = StopWatch()                                                              #Time since the stacker crane finished its last order
+timer_crane_order = StopWatch()                                                             #Time since the stacker crane order was started, to measure the effect of parking
+timer_uart      = StopWatch()                                                               #Clock for the start time of the requests to the ESP32
 
 
 ##########~~~~~~~~~~BUILDING GLOBAL VARIABLES~~~~~~~~~~##########
-rack_length             =   5                                                               #Amount of racks  on 1 side (length)
-rack_floors             =   6                                                               #Amount of floors on 1 side (height)
-total_storage_positions =   rack_length * rack_floors * 2                                   #Amount of total storage positions in the highbay calculated automatically
+#rack_length, rack_floors and total_storage_positions are defined in the shared Warehouse_Geometry module
 floor_storage_space     =   5                                                               #Amount of total storage positions on the floor near the robot arm
-
-storage_locations       =   []                                                              #Var used to choose a random free storage position for next job
-for x in range(total_storage_positions): storage_locations.append(x)                        #Filling the var with the position number for every location [0,1,2,...]
+robot_batch_size        =   3                                                               #Maximum amount of floor takeouts handed to the robot in 1 command, the robot drives them without the home pose in between (1 = no batches)
 
 emergency_stop          =   True                                                            #Variable to see if the emergency stop has been pushed / reset
-take_out_list           =   []                                                              #List containing all jobs to bring pallets out of the highbay
-bring_here_list         =   []                                                              #List containing all jobs to bring pallets to a certain place in the highbay
-floor_takeout_list      =   []                                                              #List containing all jobs to bring pallets back to the scissorlift by the 6DoF
-comm_list_chain         =   []                                                              #List with all commands that still need to be send to the chain conveyor brick
-comm_list_crane         =   []                                                              #List with all commands that still need to be send to the crane conveyor brick
-comm_list_robot         =   []                                                              #List with all commands that still need to be send to the robot conveyor brick
-comm_list_uart          =   []                                                              #List with all commands that still need to be send to the ESP32 by UART
+comm_list_chain         =   new_queue("chain")                                              #Queue with all commands that still need to be send to the chain conveyor brick
+comm_list_crane         =   new_queue("crane")                                              #Queue with all commands that still need to be send to the crane conveyor brick
+comm_list_robot         =   new_queue("robot")                                              #Queue with all commands that still need to be send to the robot conveyor brick
+comm_list_uart          =   new_queue("uart", 256)                                          #Queue with all commands that still need to be send to the ESP32 by UART, also fits a full WMS resync (it is filled by the UART thread itself)
 inbound                 =   0                                                               #Amount of tasks taking in  by 6DoF
 outbound                =   0                                                               #Amount of tasks taking out by 6DoF
+robot_batch             =   []                                                              #Floor locations handed to the robot that it has not picked up yet, in the order the robot drives them
 
 hb_crane_input          =   "Off"                                                           #Status of the input  mode    [Off / Manual / Automatic] Taking a pallet from location 105 to 100
 hb_crane_output         =   "Off"                                                           #Status of the output mode    [Off / Manual / Automatic] Taking a pallet from location 100 to 101
 conveyors               =   "Off"                                                           #Status of the conveyors mode [Off / Automatic         ] Moving pallets between conveyors locations 101,102,103,104,105,106
 robot_used              =   False                                                           #Status of the robot mode     [Off(False) / On(True)   ] Moving pallets between location 106 and 107
-crane_status            =   "Homing"                                                        #Status of the stacker crane  [Homing / Ready / Picked up / Dropped off]
+crane_status            =   "Homing"                                                        #Status of the stacker crane  [Homing / Ready / Parking / Picked up / Dropped off]
 robot_status            =   "Homing"                                                        #Status of the robot arm      [Homing / Ready / Picked up / Performing task]
 chain_status            =   "Homing"                                                        #Status of the chains brick   [Homing / Ready] 
 mode_chosen             =   False                                                           #Used as wait variable whilst the amount of bluetooth connections is unknown [For mode selection]
@@ -130,14 +139,97 @@ mode_chosen             =   False
 man_adj_scissor_max     =   0                                                               #Adjusting the top_pos for the scissorlift (-10 <= value <= 10),  adjusted by manual control on the touchscreen
 connections             =   3                                                               #Adjusting the amount of bluetooth connections (0 <= value <= 3), adjusted by manual control on the touchscreen
 
+wms_sequence            =   0                                                               #Every WMS change gets the next number, the ESP32 can ask for all changes after the number it already has
+wms_epoch               =   randint(1, 1000000)                                             #Random number for this program run, the sequence starts at 0 again after a restart so a number from the ESP32 is only used if it has the same epoch
+wms_log_lock            =   allocate_lock()                                                 #The WMS is changed by several threads, only 1 at a time takes the next sequence number
+wms_sequence_send       =   0                                                               #The last WMS change number that has been send to the ESP32
+wms_change_log          =   []                                                              #List with the last WMS changes [[sequence, location, state, name], ...]
+wms_change_log_size     =   50                                                              #Amount of WMS changes kept in the log, if the ESP32 needs older ones it gets the full WMS
+wms_bulk_frame_size     =   180                                                             #Maximum length of 1 UART message with many WMS locations in it (startup), UartRemote can not send very long messages
+wms_resync_needed       =   False                                                           #Set when a WMS message to the ESP32 failed, all changes after the last confirmed number are send again when it answers
+uart_requests           =   []                                                              #Requests for the ESP32 that still have to be send (again), in order
+uart_request_id         =   0                                                               #Number of the last request for the ESP32, only used in the debug feedback
+uart_retry_budget       =   5                                                               #Maximum amount of tries for 1 request before it fails
+uart_call_timeout       =   3000                                                            #Time (ms) after the request was made before it fails, also if it has tries left
+uart_offline_wait       =   1000                                                            #Time (ms) between tries when the ESP32 is not answering (slow or rebooting)
+uart_online             =   True                                                            #False when the last request to the ESP32 got no answer
+outside_wms_dirty       =   False                                                           #Set when a location outside the racks has changed and still needs to be saved in the offline file
+outside_wms_flush       =   False                                                           #Set to save the outside WMS directly, without waiting for the interval
+outside_wms_interval    =   2000                                                            #Minimum time (ms) between 2 saves of the outside WMS to the offline file, changes in between are saved together
+rack_full_error         =   False                                                           #Used to send the rack full error only once to the touchscreen
+putaway_policy          =   "Velocity"                                                      #How automatic input chooses a free rack location [Velocity / Closest first / Balanced fill / Random]
+reslot_enabled          =   True                                                            #Moving boxes to locations with a shorter cycle time while the stacker crane has nothing to do
+reslot_idle_time        =   10000                                                           #Time (ms) the stacker crane needs to be idle before a box is moved
+reslot_min_gain         =   2000                                                            #Minimal gain [retrievals * cycle time saved (ms)] before a box is moved, a move itself also takes time
+prepos_enabled          =   True                                                            #Parking the stacker crane at the most likely next pickup position while it has nothing to do
+prepos_idle_time        =   1000                                                            #Time (ms) the stacker crane needs to be idle before it is parked
+crane_position          =   -1                                                              #Last position the stacker crane was sent to (-1 = chain conveyors, 0-59 = rack location, -2 = unknown after an aborted parking drive)
+crane_parked            =   False                                                           #Set when the stacker crane has been parked since the last order, the next order is measured as a parked one
+prepos_order_time       =   [0, 0]                                                          #Measured time (ms) of all orders since startup [not parked, parked]
+prepos_orders           =   [0, 0]                                                          #Amount of orders since startup [not parked, parked]
+prepos_report_every     =   20                                                              #The average order times are printed once every this amount of orders
+
 machines         = ["Crane", "Output chain conveyor", "Output corner transfer", "Middle roll conveyor", "Input corner transfer", "Input chain conveyor", "Scissor table", "Robot arm", "Pick&Place 1", "Pick&Place 2", "Pick&Place 3", "Pick&Place 4", "Pick&Place 5"]  #Storage locations names
 positions        = [100,     101,                     102,                      103,                    104,                     105,                    106,             107,          110,           111,            112,            113,            114]             #Storage locations numbers
-outside_dict     = {}                                                                       #Dictionary that will hold every location's information [Location # / Machine name / Box(True/False) / Box name / Request pending(True/False)]
-for i in range(len(positions)): outside_dict.update({"location%s"%positions[i] : {"position" : positions[i], "machine" : machines[i], "box" : False, "name" : "No box present", "request" : False}})
-
-outside_dict["location106"]["liftposition"] = "homing"                                      #Adding to the scissorlift dictionary the key for the current lifting position    
-outside_dict["location106"]["liftheight"]   = scissorlift_top_pos                           #Adding to the scissorlift dictionary the key for the top position lifting height (Includes the manual adjustment)
-for i in range(floor_storage_space): outside_dict["location10%s"%i]["dropofftime"] = 99999  #Adding to each floor location dictionary the time key when it was put down on the floor (seconds) TODO see if this is used
+outside_size            =   positions[-1] + 1                                               #The location lists below are indexed directly with the location number (100,101,...,114), the rack numbers are not used
+outside_machine         =   [""]               * outside_size                               #Machine name for every location
+outside_box             =   [False]            * outside_size                               #Box present (True/False) for every location
+outside_name            =   ["No box present"] * outside_size                               #Box name for every location
+outside_request         =   [False]            * outside_size                               #Request pending (True/False) for every location
+outside_dropofftime     =   [99999]            * outside_size                               #Time when a box was put down on a floor location (seconds) TODO see if this is used
+outside_liftposition    =   [""]               * outside_size                               #Current lifting position, only used for the scissorlift (location 106) and the robot arm (location 107)
+outside_liftheight      =   [0]                * outside_size                               #Top position lifting height, only used for the scissorlift (location 106)
+for i in range(len(positions)): outside_machine[positions[i]] = machines[i]
+
+outside_liftposition[106] = "homing"                                                        #The scissorlift starts in the homing position
+outside_liftheight[106]   = scissorlift_top_pos                                             #The top position lifting height for the scissorlift (Includes the manual adjustment)
+
+def move_outside_box(pos_from, pos_to):                                                     #Transfer a box (name and present status) from 1 location outside the racks to another
+    outside_name[pos_to]   = outside_name[pos_from]
+    outside_box[pos_to]    = True
+    outside_name[pos_from] = "No box present"
+    outside_box[pos_from]  = False
+    log_wms_change(pos_to, outside_name[pos_to])                                            #Add the changes to the log for the ESP32
+    log_wms_change(pos_from, "No box present")
+    raise_event("outside")
+
+def shift_outside_boxes(line):                                                              #Moving every box on a line of locations 1 place further in 1 step [102, 103, 104]: 103 -> 104 and 102 -> 103, the last location needs to be empty
+    for x in range(len(line) - 1, 0, -1):                                                   #Start at the end of the line, so no box is overwritten
+        outside_name[line[x]] = outside_name[line[x - 1]]
+        outside_box[line[x]]  = outside_box[line[x - 1]]
+    outside_name[line[0]] = "No box present"
+    outside_box[line[0]]  = False
+    for x in line: log_wms_change(x, outside_name[x])                                       #Add the changes to the log for the ESP32
+    raise_event("outside")                                                                  #1 event for the complete line, the other threads never act on half of the transfer
+
+def set_outside_box(pos, name, box=None):                                                   #Put a box with this name on a location outside the racks, "No box present" removes the box. Box = present status if it is not the same as the name (a conveyor that is still turning)
+    if box == None: box = name != "No box present"
+    outside_name[pos] = name
+    outside_box[pos]  = box
+    log_wms_change(pos, name)                                                               #Add the change to the log for the ESP32
+    raise_event("outside")
+
+
+##########~~~~~~~~~~EVENTS, RAISED BY EVERY STATE CHANGE SO THE AUTOMATIC LOOPS CAN SLEEP UNTIL THERE IS SOMETHING NEW~~~~~~~~~~##########
+#   Every event name has a counter that goes up when it is raised. A loop reads the counters before it checks its conditions, and afterwards sleeps until
+#   one of the counters has changed (or a timeout for things without an event, like sensors and timers). A change during the checks is never missed.
+#   The sleeping loop checks the counters every event_poll_time, a blocking lock can not be used: the lock of this MicroPython can not wait with a timeout.
+event_counters       = {"outside": 0, "rack": 0, "jobs": 0, "mode": 0, "chain": 0, "crane": 0, "robot": 0} #outside = boxes/scissorlift outside the rack, rack = boxes in the rack, jobs = job queues, mode = touchscreen modes/emergency stop, chain/crane/robot = bluetooth messages
+event_poll_time      = 10                                                                   #Time (ms) between 2 checks of the counters while sleeping
+event_lock           = allocate_lock()                                                      #The counters are raised by many threads, 'counter += 1' is a read and a write that 2 threads could do at the same time
+crane_auto_events    = ["outside", "rack", "jobs", "mode", "crane"]                         #Events that can give the stacker crane a new job
+conveyor_auto_events = ["outside", "jobs", "mode", "chain", "robot"]                        #Events that can give the roll conveyors, scissorlift or robot a new job
+
+def raise_event(name):                                                                      #Telling all sleeping loops that something has changed
+    with event_lock: event_counters[name] += 1
+
+def event_state(names):                                                                     #Returns 1 number that changes when any of these events is raised
+    return sum([event_counters[x] for x in names])
+
+def wait_event(names, seen, timeout):                                                       #Sleeping until one of these events is raised after 'seen' was read, or the timeout (ms) has passed. Returns the new event state
+    timer_event = StopWatch()
+    while event_state(names) == seen and timer_event.time() < timeout: wait(event_poll_time)
+    return event_state(names)
 
 
 ##########~~~~~~~~~~BRICK STARTUP SETTINGS~~~~~~~~~~##########
@@ -156,15 +248,210 @@ ev3.light.off()
 
 ##########~~~~~~~~~~CREATING A FILE THAT IS SAVED OFFLINE~~~~~~~~~~##########
 #os.remove("wms_hb_boxstatus.txt")                                                          #Removing the wms file for whatever reason you might need to delete it  [KEEP # for normal operation!]
+#os.remove("wms_hb_slots.bin")                                                              #Removing the binary wms table, the text files of an older version are used again       [KEEP # for normal operation!]
+
+#   Every WMS file is a snapshot, the first line is "#generation,checksum" and then 1 name per line.
+#   A new snapshot is first written to a .tmp file, the old one is kept as .bak and then the .tmp file is renamed.
+#   If the brick loses power while writing, at least 1 of the 3 files is still complete, on startup the newest complete one is used.
+snapshot_generation = {}                                                                    #Dictionary with the last saved generation number for each snapshot file {"wms_hb_boxstatus.txt" : 12}
+
+def snapshot_checksum(lines):                                                               #Calculating a checksum over all names in the snapshot, to find files that were only half written
+    checksum = 0
+    for line in lines:
+        for char in line.encode(): checksum = (checksum * 31 + char) & 0xFFFFFFFF           #Every character changes the checksum, the result is kept at 32 bits
+        checksum = (checksum * 31 + 10) & 0xFFFFFFFF                                        #Also the end of every line (a name can be empty)
+    return checksum
+
+def read_snapshot(filename):                                                                #Reading 1 snapshot file, returns [generation, list of names] or [-1, []] if the file is missing or not complete
+    try:
+        with open(filename) as retrieve_snapshot:
+            lines = retrieve_snapshot.read().splitlines()
+    except: return [-1, []]                                                                 #File doesn't exist (first start ever)
+    if len(lines) == 0 or lines[0][:1] != "#":                                              #Old file from before the snapshots had a header, accept it as generation 0
+        return [0, lines]
+    try:
+        generation, checksum = lines[0][1:].split(",")
+        if int(checksum) != snapshot_checksum(lines[1:]): return [-1, []]                   #The file was not completely written, don't use it
+        return [int(generation), lines[1:]]
+    except: return [-1, []]
+
+def load_snapshot(filename):                                                                #Loading the newest complete snapshot of the file, the .tmp or the .bak file
+    newest = [-1, []]
+    for current_file in [filename, filename + ".tmp", filename + ".bak"]:
+        snapshot = read_snapshot(current_file)
+        if snapshot[0] > newest[0]: newest = snapshot
+    snapshot_generation[filename] = max(newest[0], 0)
+    print("Loaded", filename, "generation", newest[0])                                      #Print this feedback line when debugging
+    return newest[1]
+
+def save_snapshot(filename, lines):                                                         #Saving a complete new snapshot of the file, without ever overwriting the last complete one
+    snapshot_generation[filename] = snapshot_generation.get(filename, 0) + 1                #Every save gets a higher generation number
+    with open(filename + ".tmp", "w") as backup_snapshot:                                   #Open the .tmp file in 'Write' mode
+        backup_snapshot.write("#%s,%s\n"%(snapshot_generation[filename], snapshot_checksum(lines)))  #Header line with the generation and the checksum
+        for current_state in lines:                                                         #Each value (name of the location) is added on a new line in the .txt file
+            backup_snapshot.write(current_state + "\n")
+        backup_snapshot.flush()
+    try: os.remove(filename + ".bak")                                                       #Delete the oldest snapshot
+    except: pass
+    try: os.rename(filename, filename + ".bak")                                             #Keep the last snapshot as backup
+    except: pass                                                                            #File doesn't exist (first start ever)
+    os.rename(filename + ".tmp", filename)                                                  #The new snapshot becomes the real file
+
+def remove_snapshot(filename):                                                              #Deleting every version of a snapshot file (Complete new start)
+    for current_file in [filename, filename + ".tmp", filename + ".bak"]:
+        try: os.remove(current_file)
+        except: pass
+
+
+##########~~~~~~~~~~BINARY WMS TABLE, 1 FIXED SIZE RECORD PER LOCATION THAT CAN BE CHANGED WITHOUT REWRITING THE FILE~~~~~~~~~~##########
+#   wms_hb_slots.bin  = 8 bytes header [b"WMS3", amount of rack locations, amount of outside locations] + 2 copies of a 10 bytes record for every location
+#                       [occupancy, name id, request flag, dropoff time, generation, checksum], first all rack locations (0,1,2,...) then the outside locations in the order of 'positions'
+#   wms_hb_names.txt  = Every box name ever used, 1 per line "id,checksum,name". The id is in the line itself, a half written line is skipped without changing the other ids
+#   A change overwrites only the copy with the older generation, if the brick loses power during the write the other copy is still complete and is used at startup.
+#   The binary table replaces the text snapshots and the journal for the WMS (they are only read once when there is no usable table, to make the table from them)
+wms_record_format   = "<BHBiB"                                                              #Struct format for 1 copy of a location record without the checksum byte (9 bytes)
+wms_record_size     = struct.calcsize(wms_record_format) + 1                                #Size of 1 copy with the checksum byte (10 bytes)
+wms_header_format   = "<4sHH"                                                               #Struct format for the header (8 bytes)
+wms_header_size     = struct.calcsize(wms_header_format)
+wms_file_lock       = allocate_lock()                                                       #The crane thread and the outside WMS writer both change the files, only 1 at a time
+wms_table_dirty     = False                                                                 #Set when a record or name could not be written, the writer thread makes the complete files again
+wms_record_gen      = [0] * (total_storage_positions + len(positions))                      #Generation of the newest copy of every location record
+wms_saved_states    = [None] * (total_storage_positions + len(positions))                   #Last saved [occupancy, name, request flag, dropoff time] of every location, unchanged locations are not written again
+
+def wms_name_line(name_id, name):                                                           #1 line of the name file with its checksum, a line that was only half written at a power loss ("5,1234,Gea") has no valid checksum
+    return "%s,%s,%s\n"%(name_id, snapshot_checksum(["%s,%s"%(name_id, name)]), name)
+
+def save_wms_names():                                                                       #Writing the complete name file, with a .tmp file so there is always a complete file
+    with open("wms_hb_names.txt.tmp", "w") as backup_names:
+        for x in wms_names: backup_names.write(wms_name_line(x, wms_names[x]))
+    os.rename("wms_hb_names.txt.tmp", "wms_hb_names.txt")
+
+wms_names    = {0: "No box present"}                                                        #Dictionary with the name for every name id {0 : "No box present", 1 : "Gear 12T LBG", ...}
+names_repair = False                                                                        #Set if the name file needs to be written again (missing, half written line)
+try:
+    with open("wms_hb_names.txt") as retrieve_names:                                        #Reading all known box names with their id
+        name_data = retrieve_names.read()
+    if name_data[-1:] != "\n": names_repair = True                                          #The last line was only half written, a new name would be added behind it on the same line
+    for name_record in name_data.splitlines():
+        try:
+            name_id, name_checksum, name = name_record.split(",", 2)                        #Split only on the first 2 commas, a name can have a comma in it
+            name_valid = int(name_checksum) == snapshot_checksum(["%s,%s"%(name_id, name)])
+        except: name_valid = False
+        if name_valid == True: wms_names[int(name_id)] = name
+        else:
+            print("Skipped half written name line;", name_record)                           #Print this feedback line when debugging
+            names_repair = True
+except: names_repair = True                                                                 #File doesn't exist (first start ever)
+if names_repair == True: save_wms_names()                                                   #Only the complete names are kept
+wms_name_ids  = {}                                                                          #Dictionary to find the name id for a name {"No box present" : 0, "Gear 12T LBG" : 1, ...}
+for x in wms_names: wms_name_ids[wms_names[x]] = x
+wms_name_next = max(wms_names) + 1                                                          #Id for the next new name
+
+def wms_name_id(name):                                                                      #Returns the name id for a name, a new name is added to the end of the name file
+    global wms_name_next                                                                    #Using these global variables in this local function (if not defined to be global, it will make a local variable)
+    global wms_table_dirty
+
+    with wms_file_lock:                                                                     #2 threads adding a new name at the same time would get the same id
+        if name not in wms_name_ids:
+            wms_names[wms_name_next]  = name
+            wms_name_ids[name]        = wms_name_next
+            wms_name_next            += 1
+            try:
+                with open("wms_hb_names.txt", "a") as backup_names: backup_names.write(wms_name_line(wms_name_ids[name], name)) #First save the new name, only then use the id
+            except: wms_table_dirty = True                                                  #The writer thread makes the complete name file again
+        return wms_name_ids[name]
+
+def wms_location_state(index):                                                              #Returns [occupancy, name, request flag, dropoff time] of a location in the binary table (index 0,1,2,... rack, then outside locations)
+    if index < total_storage_positions:
+        location = index
+        name     = wms_online_list[index]
+        dropoff  = 0                                                                        #Only the floor locations have a dropoff time
+    else:
+        location = positions[index - total_storage_positions]
+        name     = outside_name[location]
+        dropoff  = outside_dropofftime[location]
+    return [int(name != "No box present"), name, int(location_requested(location)), dropoff]
+
+def wms_record(state, generation):                                                          #Packing 1 copy of a location record, the checksum byte is the sum of all other bytes
+    record = struct.pack(wms_record_format, state[0], wms_name_id(state[1]), state[2], state[3], generation)
+    return record + bytes([(sum(record) + 0x5A) & 0xFF])                                    #0x5A so a record of only zeros (never written) is not valid
+
+def unpack_wms_record(table_data, offset):                                                  #Returns [generation, occupancy, name, request flag, dropoff time] of 1 copy, or None if the copy is not valid (half written)
+    record = table_data[offset:offset + wms_record_size - 1]
+    if (sum(record) + 0x5A) & 0xFF != table_data[offset + wms_record_size - 1]: return None
+    occupancy, name_id, request, dropoff, generation = struct.unpack(wms_record_format, record)
+    if name_id not in wms_names: return None                                                #Unknown name, this copy can not be trusted
+    if occupancy == 0: return [generation, 0, "No box present", request, dropoff]
+    return [generation, 1, wms_names[name_id], request, dropoff]
+
+def load_wms_table():                                                                       #Reading all location records with 1 read, returns a list with [occupancy, name, request flag, dropoff time] of every location or [] if the file is not usable
+    global wms_table_dirty                                                                  #Using this global variable in this local function (if not defined to be global, it will make a local variable)
+
+    try:
+        with open("wms_hb_slots.bin", "rb") as retrieve_table:
+            table_data = retrieve_table.read()
+    except: return []                                                                       #File doesn't exist (first start ever)
+    if len(table_data) < wms_header_size: return []
+    magic, rack_count, outside_count = struct.unpack_from(wms_header_format, table_data, 0)
+    if magic != b"WMS3" or rack_count != total_storage_positions or outside_count != len(positions): return [] #Older table or other size of racks/conveyors, the text files will be used
+    if len(table_data) != wms_header_size + (rack_count + outside_count) * 2 * wms_record_size: return [] #File was not completely made
+    table = []
+    for x in range(rack_count + outside_count):
+        copy_a = unpack_wms_record(table_data, wms_header_size + x * 2 * wms_record_size)
+        copy_b = unpack_wms_record(table_data, wms_header_size + (x * 2 + 1) * wms_record_size)
+        if copy_a == None or (copy_b != None and (copy_b[0] - copy_a[0]) & 0xFF < 128): copy_a = copy_b #Use the copy with the newest generation (the generation counts to 255 and starts at 0 again)
+        if copy_a == None:                                                                  #Both copies are broken, should never happen as only 1 copy is written at a time
+            print("Binary WMS table location", x, "not readable, set as empty")             #Print this feedback line when debugging
+            copy_a = [0, 0, "No box present", 0, 0]
+            wms_table_dirty = True
+        wms_record_gen[x] = copy_a[0]
+        table.append(copy_a[1:])
+    return table
+
+def save_wms_table():                                                                       #Writing the complete name file and binary table (no usable table at startup, or a write that failed), with a .tmp file so there is always a complete file
+    global wms_table_dirty                                                                  #Using this global variable in this local function (if not defined to be global, it will make a local variable)
+
+    wms_table_dirty = False                                                                 #Reset before writing, a change during writing will be saved again
+    records = []
+    for x in range(total_storage_positions + len(positions)):                               #Pack first, a new name is saved before the record uses its id. Both copies get the current state
+        wms_saved_states[x] = wms_location_state(x)
+        records.append(wms_record(wms_saved_states[x], (wms_record_gen[x] + 1) & 0xFF))
+        records.append(wms_record(wms_saved_states[x], (wms_record_gen[x] + 2) & 0xFF))
+        wms_record_gen[x] = (wms_record_gen[x] + 2) & 0xFF
+    with wms_file_lock:
+        save_wms_names()
+        with open("wms_hb_slots.bin.tmp", "wb") as backup_table:
+            backup_table.write(struct.pack(wms_header_format, b"WMS3", total_storage_positions, len(positions)))
+            for x in range(total_storage_positions + len(positions)):                       #Every copy on its place: the copy with an even generation first
+                backup_table.write(records[x * 2 + (wms_record_gen[x] + 1) % 2])
+                backup_table.write(records[x * 2 + wms_record_gen[x] % 2])
+        os.rename("wms_hb_slots.bin.tmp", "wms_hb_slots.bin")
+
+def write_wms_record(index):                                                                #Saving the current state of 1 location in the binary table (index 0,1,2,... rack, then outside locations), only the older copy of the record is written
+    global wms_table_dirty                                                                  #Using this global variable in this local function (if not defined to be global, it will make a local variable)
+
+    state = wms_location_state(index)
+    if state == wms_saved_states[index]: return                                             #Nothing has changed for this location
+    generation = (wms_record_gen[index] + 1) & 0xFF
+    record = wms_record(state, generation)                                                  #Pack first, a new name is saved before the record uses its id
+    with wms_file_lock:
+        try:
+            with open("wms_hb_slots.bin", "r+b") as backup_table:                           #Open the binary file in 'Read and Write' mode, the rest of the file stays as it is
+                backup_table.seek(wms_header_size + (index * 2 + generation % 2) * wms_record_size) #The copy with the even/odd generation, this is always the older copy
+                backup_table.write(record)
+            wms_record_gen[index]   = generation
+            wms_saved_states[index] = state
+        except:
+            print("Binary WMS table not writable, location", index, "will be saved by making the complete table again") #Print this feedback line when debugging
+            wms_table_dirty = True                                                          #The writer thread makes the complete table again
+
+wms_table = load_wms_table()                                                                #Reading the binary table at startup, if it is not usable the text files are used
 
 
 ##########~~~~~~~~~~RACK BOXES, SAVING IN AN OFFLINE FILE TO REMEMBER ON STARTUP LOCATIONS~~~~~~~~~~##########
-create_file = open("wms_hb_boxstatus.txt", "a")                                             #Create new file on first start ever (file doesn't exist yet), if it does exist already just open it
-create_file.write("")                                                                       #Add an empty string to have something in it
-create_file.close()                                                                         #Close the .txt file.
-
-with open("wms_hb_boxstatus.txt") as retrieve_wms:                                          #Reading from offline file, storing them in an online list
-    wms_online_list = retrieve_wms.read().splitlines()                                      #Each line in the .txt file is added in the online list [line1, line2, line3,...]
+if wms_table != []:                                                                         #Binary table is usable, take the rack names from it
+    wms_online_list = [x[1] for x in wms_table[:total_storage_positions]]
+else: wms_online_list = load_snapshot("wms_hb_boxstatus.txt")                               #Reading from the offline file of an older version, storing them in an online list [line1, line2, line3,...]
 
 for x in range(total_storage_positions - len(wms_online_list)):                             #Adding extra positions at first start ever or expanding racks
     wms_online_list.append("No box present")                                                #Setting the new extra locations as free rack positions
@@ -172,34 +459,277 @@ for x in range(total_storage_positions - len(wms_online_list)):
 for x in range(len(wms_online_list) - total_storage_positions):                             #Deleting extra positions when downsizing the racks TODO is a for loop needed? Can't do just 1 line?
     del wms_online_list[total_storage_positions:]
 
-def save_offline_wms():                                                                     #Defining the function that stores values from the online list to the offline .txt file
-    with open("wms_hb_boxstatus.txt", "w") as backup_wms:                                   #Open the .txt file in 'Write' mode
-        for current_state in wms_online_list:                                               #Each value (name of the location) is added on a new line in the .txt file
-            backup_wms.write(current_state + "\n")                                          #When no box is present the name is "No box present", this means that line 1 is always location 0, even when empty
+if wms_table == []:                                                                         #No usable binary table, replaying the journal of an older version on top of its snapshot, oldest change first
+    try:
+        with open("wms_hb_journal.txt") as retrieve_journal:
+            for journal_record in retrieve_journal.read().splitlines():                     #Each line in the journal is 1 changed rack location with its checksum at the end "12,Gear 12T LBG,3822190414"
+                try:
+                    journal_change, journal_checksum = journal_record.rsplit(",", 1)        #The checksum is behind the last comma, a name can have a comma in it
+                    journal_loc, journal_name = journal_change.split(",", 1)                #Split only on the first comma, the location number is in front of the name
+                    if int(journal_checksum) != snapshot_checksum([journal_change]): print("Skipped half written journal line;", journal_record) #A line that was only half written at a power loss ("12,Gea") has no valid checksum
+                    elif int(journal_loc) < total_storage_positions: wms_online_list[int(journal_loc)] = journal_name #Changes for locations that no longer exist (downsized racks) are skipped
+                except: print("Skipped broken journal line;", journal_record)               #A broken line is ignored, the snapshot + older lines are still valid
+    except: pass                                                                            #No journal file
+
+
+def log_wms_change(location, name):                                                         #Adding 1 WMS change (rack or outside) with the next sequence number to the change log for the ESP32
+    global wms_sequence                                                                     #Using this global variable in this local function (if not defined to be global, it will make a local variable)
+
+    with wms_log_lock:                                                                      #2 threads can not get the same number or change the log at the same time
+        wms_sequence += 1
+        if name == "No box present": wms_change_log.append([wms_sequence, location, 0, ""])
+        else:                        wms_change_log.append([wms_sequence, location, 1, name])
+        if len(wms_change_log) > wms_change_log_size: del wms_change_log[0]                 #Only the last changes are kept, if the ESP32 needs older ones it gets the full WMS
 
 
 ########## MANUAL OVERRIDING FOR WMS NAMES! THIS WILL DELETE THE CURRENT FILE AND CAN NOT BE UNDONE!! ##########
 ########## If you use this, put all pallets in order in the rack starting at down left in 1st rack, and go up, then go to the right side, then 2nd rack etc. ##########
 def override_wms():                                                                         #Defining the override function
+    global wms_table                                                                        #Using this global variable in this local function (if not defined to be global, it will make a local variable)
+
     override_list = ["Gear 12T LBG", "Tile 3L LBG", "Tile 4L Black", "Liftarm 3L Yellow", "Pin 2L Black", "Gear 20T Blue", "Axle 2L Red", "Liftarm 11L Yellow", "MOTUS HANDLING", \
         "Medium Actuator", "Small Chain Black", "Pin 3L Blue", "Gear Half 12T Tan", "Pin 3L Red", "Liftarm L 4x2 LBG", "Axle Hole Conn T1 LBG", "4Pin Conn LBG"]
     for x in range(len(wms_online_list)):                                                   #For each rack location perform an override
         if x < len(override_list): wms_online_list[x] = override_list[x]                    #If there is a name in the override list, use it
         else: wms_online_list[x] = "No box present"                                         #If there are more locations than items in the override list, add empty locations
-    os.remove("wms_hb_outsidestatus.txt")                                                   #Delete the outside offline .txt file (Complete new start)
+    remove_snapshot("wms_hb_outsidestatus.txt")                                             #Delete the outside offline .txt file (Complete new start)
+    try: os.remove("wms_hb_slots.bin")                                                      #Delete the binary table as well, it will be made again from the new names
+    except: pass
+    wms_table = []
     print("The complete WMS file has been deleted and replaced by;", override_wms)          #Print this feedback line when debugging
 
 #override_wms()                                                                             #Use hashtag # infront of next line of code if you DO NOT want to override! [KEEP # for normal operation!]
-save_offline_wms()                                                                          #Save the offline rack WMS, if you enabled the override, this will make it permanent
 
 
-##########~~~~~~~~~~WMS FOR ALL LOCATIONS OUTSIDE OF THE RACKS~~~~~~~~~~##########
-outside_file = open("wms_hb_outsidestatus.txt", "a")                                        #Create new file on first start ever (file doesn't exist yet), if it does exist already just open it
-outside_file.write("")                                                                      #Add an empty string to have something in it
-outside_file.close()                                                                        #Close the .txt file.
+##########~~~~~~~~~~FREE/FULL RACK LOCATIONS AND BOX NAMES, KEPT UP TO DATE BY EVERY WMS CHANGE~~~~~~~~~~##########
+free_locations      = []                                                                    #List with every free rack location number, the order does not matter
+free_locations_idx  = []                                                                    #For every rack location the place in the free_locations list, -1 if the location holds a box
+full_locations      = []                                                                    #List with every rack location number that holds a box, the order does not matter
+full_locations_idx  = []                                                                    #For every rack location the place in the full_locations list, -1 if the location is free
+name_locations      = {}                                                                    #Dictionary with every box name in the rack and a list of the locations that hold a box with this name {"Pin 2L Black" : [4, 37]}
+slot_costs          = []                                                                    #For every rack location the estimated stacker crane cycle time (ms) from the chain conveyors and back
+slots_by_cost       = []                                                                    #All rack locations sorted from the shortest to the longest cycle time
+crane_lift_angles   = crane_lift_coord                                                      #Lifting motor angles used for the cycle time estimates, replaced by the calibrated values from the stacker crane
+
+def add_location_index(loc_list, loc_idx, location):                                        #Adding 1 rack location to a free/full list, if it is not already in there
+    if loc_idx[location] != -1: return                                                     #Already in the list, nothing to change
+    loc_idx[location] = len(loc_list)                                                       #Remember where in the list this location is placed (at the end)
+    loc_list.append(location)
+
+def remove_location_index(loc_list, loc_idx, location):                                     #Removing 1 rack location from a free/full list without searching the list
+    idx = loc_idx[location]
+    if idx == -1: return                                                                    #Not in the list, nothing to change
+    last_location = loc_list.pop()                                                          #Take the last location from the list
+    if last_location != location:                                                           #If it was not the location we want to remove, put it on the place of the removed location
+        loc_list[idx] = last_location
+        loc_idx[last_location] = idx
+    loc_idx[location] = -1
+
+def update_location_index(location, old_name, new_name):                                    #Changing 1 rack location in all indexes, called for every WMS change
+    if old_name != "No box present" and old_name in name_locations:                         #Remove the location from the old box name
+        if location in name_locations[old_name]: name_locations[old_name].remove(location)
+        if name_locations[old_name] == []: del name_locations[old_name]                     #No more boxes with this name in the rack
+    if new_name == "No box present":
+        remove_location_index(full_locations, full_locations_idx, location)
+        add_location_index   (free_locations, free_locations_idx, location)
+    else:
+        remove_location_index(free_locations, free_locations_idx, location)
+        add_location_index   (full_locations, full_locations_idx, location)
+        if new_name in name_locations: name_locations[new_name].append(location)            #Add the location to the new box name
+        else:                          name_locations[new_name] = [location]
+
+def free_storage_location(name=""):                                                         #Returns a free rack location chosen with the put-away policy for a box with this name, or -1 if the rack is full
+    if len(free_locations) == 0: return -1
+    if putaway_policy == "Velocity" and name != "":                                         #Free location that fits how often this box name is taken out
+        return velocity_storage_location(name)
+    if putaway_policy == "Balanced fill":                                                   #Cheapest free location in the rack number with the least boxes, so all racks fill up evenly
+        rack_boxes = [0] * (rack_length + 1)
+        for x in full_locations: rack_boxes[slot_rack(x)] += 1
+        least_boxes = min([rack_boxes[slot_rack(x)] for x in free_locations])
+        for x in slots_by_cost:
+            if free_locations_idx[x] != -1 and rack_boxes[slot_rack(x)] == least_boxes: return x
+    elif putaway_policy == "Closest first" or putaway_policy == "Velocity":                 #Free location with the shortest stacker crane cycle time
+        for x in slots_by_cost:
+            if free_locations_idx[x] != -1: return x
+    return choice(free_locations)                                                           #Random policy
+
+def full_storage_location():                                                                #Returns a random rack location that holds a box, or -1 if the rack is empty
+    if len(full_locations) == 0: return -1
+    return choice(full_locations)
+
+def name_storage_location(name):                                                            #Returns the rack location with the shortest cycle time that holds a box with this name and is not already asked to be taken out, or -1 if there is none in the rack
+    name_free = [x for x in name_locations.get(name, []) if not job_queued(take_out_queue, x)]
+    if name_free == []: return -1
+    return min(name_free, key=lambda x: slot_costs[x])
+
+def rack_full():                                                                            #Returns True if there is no free rack location left
+    return len(free_locations) == 0
+
+def build_slot_costs(lift_coord):                                                           #Estimating the stacker crane cycle time (ms) for every rack location and sorting the locations from fast to slow
+    global slot_costs                                                                       #Using these global variables in this local function (if not defined to be global, it will make a local variable)
+    global slots_by_cost
+    global crane_lift_angles
+
+    crane_lift_angles = lift_coord
+    slot_costs    = [slot_travel_time(x, lift_coord) for x in range(total_storage_positions)]
+    slots_by_cost = sorted(range(total_storage_positions), key=lambda x: slot_costs[x])
+
+for x in range(total_storage_positions):                                                    #Building the indexes at startup from the loaded WMS
+    free_locations_idx.append(-1)
+    full_locations_idx.append(-1)
+    update_location_index(x, "No box present", wms_online_list[x])
+build_slot_costs(crane_lift_coord)                                                          #Typical lifting angles until the stacker crane sends its calibrated values
+
+
+##########~~~~~~~~~~PICK FREQUENCY PER BOX NAME, FAST MOVING BOXES ARE STORED ON THE LOCATIONS WITH THE SHORTEST CYCLE TIME~~~~~~~~~~##########
+#   wms_hb_pickcount.txt = 1 line per box name that has been taken out of the rack "14,Pin 2L Black" [count,name], saved as a snapshot like the WMS files
+pick_count_max      = 1000                                                                  #When a name reaches this count, all counts are halved so the order follows the recent requests
+pick_counts         = {}                                                                    #Dictionary with the amount of times each box name has been taken out of the rack {"Pin 2L Black" : 14}
+pick_counts_dirty   = False                                                                 #Set when a count has changed and still needs to be saved in the offline file
+for pick_record in load_snapshot("wms_hb_pickcount.txt"):                                   #Loading the counts from the offline file
+    try:
+        pick_count, pick_name = pick_record.split(",", 1)                                   #Split only on the first comma, the count is in front of the name
+        pick_counts[pick_name] = int(pick_count)
+    except: print("Skipped broken pick count line;", pick_record)
+
+def count_pick(name):                                                                       #Adding 1 retrieval for this box name, the writer thread saves the counts offline
+    global pick_counts_dirty                                                                #Using this global variable in this local function (if not defined to be global, it will make a local variable)
+
+    if name == "No box present": return
+    pick_counts[name] = pick_counts.get(name, 0) + 1
+    if pick_counts[name] >= pick_count_max:                                                 #Halving all counts, older requests weigh less than new ones
+        for x in pick_counts: pick_counts[x] = pick_counts[x] // 2
+    pick_counts_dirty = True                                                                #Only marks the counts as changed, many retrievals are saved together (no waiting for the flash memory in the crane thread)
+
+def save_pick_counts():                                                                     #Writing the counts to the offline file, called by the writer thread
+    global pick_counts_dirty                                                                #Using this global variable in this local function (if not defined to be global, it will make a local variable)
+
+    pick_counts_dirty = False                                                               #Reset before writing, a retrieval during writing will be saved the next time
+    save_snapshot("wms_hb_pickcount.txt", ["%s,%s"%(pick_counts[x], x) for x in list(pick_counts)])
+
+def velocity_storage_location(name):                                                        #Returns a free rack location for this box name, the more it is taken out compared to the other names, the shorter the cycle time of the location
+    free_by_cost = [x for x in slots_by_cost if free_locations_idx[x] != -1]                #All free rack locations, from the shortest to the longest cycle time
+    if free_by_cost == []: return -1
+    faster_names = len([x for x in pick_counts if pick_counts[x] > pick_counts.get(name, 0)])   #Amount of box names that are taken out more often than this one
+    return free_by_cost[len(free_by_cost) * faster_names // (len(pick_counts) + 1)]         #The fastest name gets the first free location, a name that was never taken out one of the last
+
+
+##########~~~~~~~~~~JOB QUEUES WITH PRIORITY AND AGING (TAKE OUT, BRING HERE, FLOOR TAKEOUT)~~~~~~~~~~##########
+job_priority_bonus  = {"Touchscreen": 60000, "Automatic": 0}                                #Head start (ms) per priority, a job that waited longer than the difference still goes first (aging)
+job_lock            = allocate_lock()                                                       #The UART, crane and conveyor threads all change the queues, only 1 at a time. Never call another job queue function while holding it
+
+def new_job_queue():                                                                        #Returns an empty job queue. "heap" = locations as a binary heap, "pos" = place of a location in the heap, "jobs" = [sort key, priority, enqueue time] per location
+    return {"heap": [], "pos": {}, "jobs": {}}
+
+def job_queue_swap(queue, idx_a, idx_b):                                                    #Swapping 2 jobs in the heap and remembering their new places
+    heap = queue["heap"]
+    heap[idx_a], heap[idx_b] = heap[idx_b], heap[idx_a]
+    queue["pos"][heap[idx_a]] = idx_a
+    queue["pos"][heap[idx_b]] = idx_b
+
+def job_queue_sift(queue, idx):                                                             #Moving 1 job up or down the heap until the heap is sorted again (O(log n))
+    heap = queue["heap"]
+    jobs = queue["jobs"]
+    while idx > 0 and jobs[heap[idx]][0] < jobs[heap[(idx - 1) // 2]][0]:                   #Move up while the sort key is lower than the parent
+        job_queue_swap(queue, idx, (idx - 1) // 2)
+        idx = (idx - 1) // 2
+    while True:                                                                             #Move down while the sort key is higher than one of the children
+        lowest = idx
+        for child in (2 * idx + 1, 2 * idx + 2):
+            if child < len(heap) and jobs[heap[child]][0] < jobs[heap[lowest]][0]: lowest = child
+        if lowest == idx: return
+        job_queue_swap(queue, idx, lowest)
+        idx = lowest
+
+def job_queue_add(queue, location, priority):                                               #Adding a job for a location, a location that already has a job keeps it, but can get a higher priority
+    #Score of a job = priority bonus + waiting time. All jobs use the same clock, so the job with the lowest (enqueue time - bonus) has the highest score, and the keys never need to be updated while waiting
+    with job_lock:
+        if location in queue["jobs"]:
+            enqueue_time = queue["jobs"][location][2]
+            if enqueue_time - job_priority_bonus[priority] >= queue["jobs"][location][0]: return #The job already has this or a higher priority
+            queue["jobs"][location] = [enqueue_time - job_priority_bonus[priority], priority, enqueue_time]
+            job_queue_sift(queue, queue["pos"][location])
+        else:
+            enqueue_time = timer_jobs.time()
+            queue["jobs"][location] = [enqueue_time - job_priority_bonus[priority], priority, enqueue_time]
+            queue["pos"][location]  = len(queue["heap"])
+            queue["heap"].append(location)
+            job_queue_sift(queue, len(queue["heap"]) - 1)
+    save_request_flag(location)                                                             #Outside of the lock, saving reads the queues again
+    raise_event("jobs")
+
+def job_queue_remove(queue, location):                                                      #Cancelling or finishing the job for a location (O(log n)), returns False if there was no job for this location
+    with job_lock:
+        if location not in queue["pos"]: return False
+        idx  = queue["pos"][location]
+        last = len(queue["heap"]) - 1
+        job_queue_swap(queue, idx, last)                                                    #Move the job to the end of the heap so it can be removed without shifting the list
+        queue["heap"].pop()
+        del queue["pos"][location]
+        del queue["jobs"][location]
+        if idx < last: job_queue_sift(queue, idx)                                           #The job that took its place needs to be sorted again
+    save_request_flag(location)                                                             #Outside of the lock, saving reads the queues again
+    raise_event("jobs")
+    return True
+
+def job_queue_peek(queue):                                                                  #Returns the location of the job that needs to be done first, or -1 if the queue is empty
+    with job_lock:
+        if queue["heap"] == []: return -1
+        return queue["heap"][0]
+
+def job_queued(queue, location):                                                            #Returns True if there is a job open for this location
+    with job_lock: return location in queue["jobs"]
+
+def job_queue_length(queue):                                                                #Returns the amount of open jobs
+    with job_lock: return len(queue["heap"])
+
+def job_queue_wait_time(queue, location):                                                   #Returns how long (ms) the job for this location is waiting, or -1 if there is no job for this location
+    with job_lock:
+        if location not in queue["jobs"]: return -1
+        return timer_jobs.time() - queue["jobs"][location][2]
+
+def job_queue_same_priority(queue):                                                         #Returns all locations with the same priority as the first job, these can be done in any order
+    with job_lock:
+        if queue["heap"] == []: return []
+        priority = queue["jobs"][queue["heap"][0]][1]
+        return [x for x in queue["heap"] if queue["jobs"][x][1] == priority]
+
+def job_queue_batch(queue, amount):                                                         #Returns the locations of the first jobs that need to be done, in the order they need to be done (maximum amount)
+    #The next job is always the lowest key of the jobs whose parent is already taken, so only the top of the heap is read (O(amount^2)) and the heap is not changed
+    with job_lock:
+        heap  = queue["heap"]
+        jobs  = queue["jobs"]
+        batch = []
+        candidates = [0] if heap != [] else []
+        while candidates != [] and len(batch) < amount:
+            idx = min(candidates, key=lambda x: jobs[heap[x]][0])
+            candidates.remove(idx)
+            batch.append(heap[idx])
+            candidates += [child for child in (2 * idx + 1, 2 * idx + 2) if child < len(heap)]
+        return batch
+
+def job_started(queue, location):                                                           #Printing the waiting time of a job that is being started
+    print("Job for location", location, "waited", job_queue_wait_time(queue, location), "ms, jobs in the queue:", job_queue_length(queue))    #Print this feedback line when debugging
+
+take_out_queue      = new_job_queue()                                                       #Queue with all jobs to bring pallets out of the highbay
+bring_here_queue    = new_job_queue()                                                       #Queue with all jobs to bring pallets to a certain place in the highbay
+floor_takeout_queue = new_job_queue()                                                       #Queue with all jobs to bring pallets back to the scissorlift by the 6DoF
+
+def location_requested(location):                                                           #Returns True if there is a touchscreen job open for this location, this request flag is saved in the binary WMS table
+    with job_lock:
+        for queue in [take_out_queue, bring_here_queue, floor_takeout_queue]:
+            if location in queue["jobs"] and queue["jobs"][location][1] == "Touchscreen": return True
+    return False
+
+def save_request_flag(location):                                                            #Saving the request flag of a location after its jobs have changed
+    if location < total_storage_positions: write_wms_record(location)                       #Rack location, only written if the flag has really changed
+    elif location in positions: save_outside_wms()                                          #Outside location, saved by the writer thread
+
 
-with open("wms_hb_outsidestatus.txt") as retrieve_outside_wms:                              #Reading from offline file, storing them in an online list
-    wms_outside_list = retrieve_outside_wms.read().splitlines()                             #Each line in the .txt file is added in the online list [line1, line2, line3,...]
+##########~~~~~~~~~~WMS FOR ALL LOCATIONS OUTSIDE OF THE RACKS~~~~~~~~~~##########
+if wms_table != []:                                                                         #Binary table is usable, take the outside names from it
+    wms_outside_list = [x[1] for x in wms_table[total_storage_positions:]]
+else: wms_outside_list = load_snapshot("wms_hb_outsidestatus.txt")                          #Reading from the offline file of an older version, storing them in an online list [line1, line2, line3,...]
 
 for x in range(len(positions) - len(wms_outside_list)):                                     #Adding extra positions at first start ever or expanding conveyors/floor storage
     wms_outside_list.append("No box present")                                               #Setting the new extra locations as free machine parts/storage location
@@ -209,23 +739,72 @@ for x in range(len(wms_outside_list) - len(positions)):
 
 for i in range(len(positions)):                                                             #At startup, load offline stored boxes that are outside of the racks
     if wms_outside_list[i] == "No box present": continue                                    #If there is no box at this location, do nothing
-    else:                                                                                   #If there is a box, save the name in the corresponding dictionary for this location
-        outside_dict["location%s"%positions[i]]["name"] = wms_outside_list[i]
-        outside_dict["location%s"%positions[i]]["box"]  = True
+    else:                                                                                   #If there is a box, save the name in the location lists for this location
+        outside_name[positions[i]] = wms_outside_list[i]
+        outside_box[positions[i]]  = True
         if i >= len(positions) - floor_storage_space:                                       #If the location is floor storage, set the dropoff time to 0 (seconds)
-            outside_dict["location%s"%positions[i]]["dropofftime"]   = 0
+            outside_dropofftime[positions[i]] = 0
+if wms_table != []:                                                                         #The saved dropoff times are from the last program run, keep their order with the newest one at 0 (seconds)
+    floor_dropoff = [wms_table[total_storage_positions + i][3] for i in range(len(positions) - floor_storage_space, len(positions)) if wms_outside_list[i] != "No box present"]
+    for i in range(len(positions) - floor_storage_space, len(positions)):
+        if wms_outside_list[i] != "No box present": outside_dropofftime[positions[i]] = wms_table[total_storage_positions + i][3] - max(floor_dropoff)
+
+outside_box[107] = False                                                                    #Reset the robot location as   there is no program to handle a box stuck on the arm
+outside_name[107] = "No box present"                                                        #It will fall off when initiating (homing), you will need to manually add this box later
+
+if wms_table == []: save_wms_table()                                                        #Make the binary table once from the text files (or the override), after this only changed records are written
+for x in range(len(wms_table)): wms_saved_states[x] = wms_table[x]                          #The table has the loaded state, only changes after this are written
 
-outside_dict["location107"]["box"] = False                                                  #Reset the robot dictionary as there is no program to handle a box stuck on the arm
-outside_dict["location107"]["name"] = "No box present"                                      #It will fall off when initiating (homing), you will need to manually add this box later
+def save_outside_wms():                                                                     #Only marks the outside WMS as changed, the writer thread saves it to the offline file (no waiting for the flash memory)
+    global outside_wms_dirty                                                                #Using this global variable in this local function (if not defined to be global, it will make a local variable)
 
-def save_outside_wms():
-    global wms_outside_list
+    outside_wms_dirty = True
+    raise_event("outside")                                                                  #Every change outside of the rack is saved, so this also wakes up the automatic loops
 
-    for x in range(len(wms_outside_list)):                              
-        wms_outside_list[x] = outside_dict["location%s"%positions[x]]["name"]               #Loading all current names into online list
-    with open("wms_hb_outsidestatus.txt", "w") as backup_outside_wms:                       #Open the .txt file in 'Write' mode
-        for current_outside_state in wms_outside_list:                                      #Each value (name of the location) is added on a new line in the .txt file
-            backup_outside_wms.write(current_outside_state + "\n")                          #Save them to the offline file for everything outside the rack
+def flush_outside_wms():                                                                    #Asking the writer thread to save the outside WMS now, without waiting for the interval (emergency stop)
+    global outside_wms_flush                                                                #Using this global variable in this local function (if not defined to be global, it will make a local variable)
+
+    outside_wms_flush = True
+
+def write_outside_wms():                                                                    #Writing the outside WMS to the binary table, only the records that have really changed
+    for x in range(len(positions)):
+        write_wms_record(total_storage_positions + x)                                       #Only written if the location has changed
+
+def outside_wms_writer():                                                                   #A loop that saves the outside WMS at most once every interval, all changes in between are saved together
+    global outside_wms_dirty                                                                #Using these global variables in this local function (if not defined to be global, it will make a local variable)
+    global outside_wms_flush
+
+    while True:                                                                             #Start a forever loop
+        wait(50)                                                                            #Breathing time for the EV3
+        if pick_counts_dirty == True and (outside_wms_flush == True or timer_pick_counts.time() >= outside_wms_interval): #The pick counts are saved with the same interval, all retrievals in between are saved together
+            timer_pick_counts.reset()
+            save_pick_counts()
+        if wms_table_dirty == True:                                                         #A record or name could not be written, make the complete files again
+            try: save_wms_table()
+            except: print("Binary WMS table could not be made, trying again")               #Print this feedback line when debugging
+        if outside_wms_dirty == False:                                                      #Nothing to save
+            outside_wms_flush = False
+            continue
+        if outside_wms_flush == True or timer_outside_wms.time() >= outside_wms_interval:   #Save directly when asked, else wait for the interval since the last save
+            outside_wms_dirty = False                                                       #Reset before writing, a change during writing will be saved the next time
+            outside_wms_flush = False
+            timer_outside_wms.reset()
+            write_outside_wms()
+
+def write_offline_files():                                                                  #Saving the last changes of the outside WMS and the pick counts
+    if wms_table_dirty == True: save_wms_table()
+    write_outside_wms()
+    if pick_counts_dirty == True: save_pick_counts()
+
+for x in range(len(wms_table)):                                                             #Restoring the touchscreen requests that were open when the program stopped
+    if wms_table[x][2] == 1:
+        if   x < total_storage_positions and wms_online_list[x] != "No box present": job_queue_add(take_out_queue, x, "Touchscreen")
+        elif x < total_storage_positions:                                            job_queue_add(bring_here_queue, x, "Touchscreen")
+        elif outside_box[positions[x - total_storage_positions]] == True and positions[x - total_storage_positions] >= 110: job_queue_add(floor_takeout_queue, positions[x - total_storage_positions], "Touchscreen")
+save_outside_wms()                                                                          #The robot location and the dropoff times have changed at startup, the writer thread saves them
+
+try: sys.atexit(write_offline_files)                                                        #Saving the last changes when the program is stopped (shutdown)
+except: print("No exit function possible, outside WMS and pick counts are saved by the writer thread only")
 
 
 ##########~~~~~~~~~~DEFINE SUB-ROUTINES [FUNCTIONS]~~~~~~~~~~##########
@@ -249,19 +828,19 @@ def mode_warehouse(zone, state):
     elif zone == 2:                                                                         #ZONE  2 Is the operation mode for all conveyors (locations 101,102,103,104,105,106)
         if   state == 0:                                                                    #STATE 0 Keeps all boxes stationary on the current location, no inter-conveyor transport
             conveyors = "Off"
-            comm_list_chain.append("Conveyors off")                                         #The state gets added to the bluetooth communication waiting list for the chain conveyor brick
+            queue_put(comm_list_chain, "Conveyors off")                                     #The state gets added to the bluetooth communication waiting list for the chain conveyor brick
         elif state == 1:                                                                    #STATE 1 The transport between all the conveyors is done automatically
             conveyors = "Automatic"
-            comm_list_chain.append("Conveyors automatic")                                   #The state gets added to the bluetooth communication waiting list for the chain conveyor brick
+            queue_put(comm_list_chain, "Conveyors automatic")                               #The state gets added to the bluetooth communication waiting list for the chain conveyor brick
     elif zone == 3:                                                                         #ZONE  3 Is the operation mode for the 6 axis robotic arm/6 Degrees of Freedom [6DOF] (location 107)
         if   state == 0:                                                                    #STATE 0 Keeps all boxes around the 6DOF stationary, and no input to the floor
             robot_used = False
-            comm_list_chain.append("Robot not used")                                        #The state gets added to the bluetooth communication waiting list for the chain conveyor brick
-            comm_list_robot.append("Robot not used")                                        #The state gets added to the bluetooth communication waiting list for the robot conveyor brick
+            queue_put(comm_list_chain, "Robot not used")                                    #The state gets added to the bluetooth communication waiting list for the chain conveyor brick
+            queue_put(comm_list_robot, "Robot not used")                                    #The state gets added to the bluetooth communication waiting list for the robot conveyor brick
         elif state == 1:                                                                    #STATE 1 Every pallet coming out of the racks will be taken to the floor near the 6DOF, and returned on request
             robot_used = True
-            comm_list_chain.append("Robot used")                                            #The state gets added to the bluetooth communication waiting list for the chain conveyor brick
-            comm_list_robot.append("Robot used")                                            #The state gets added to the bluetooth communication waiting list for the robot conveyor brick
+            queue_put(comm_list_chain, "Robot used")                                        #The state gets added to the bluetooth communication waiting list for the chain conveyor brick
+            queue_put(comm_list_robot, "Robot used")                                        #The state gets added to the bluetooth communication waiting list for the robot conveyor brick
     elif zone == 4:                                                                         #ZONE  4 Is the bluetooth operation mode, selecting howmany devices will be connecting to this master
         if   state == 0:                                                                    #STATE 0 Sets the connecting devices to 0, for debugging some new parts of code with ESP/Master EV3
             connections = 0
@@ -281,85 +860,88 @@ def mode_warehouse(zone, state):
         mode_chosen = True                                                                  #If the command for this ZONE 4 has come in, allow the program to start connecting to these devices
     #Debugging line to see current selected modes
     print(zone, state, "Crane input mode: ", hb_crane_input, ". Crane output mode: ", hb_crane_output, ". Conveyors mode: ", conveyors, "Robot used: ", robot_used, "Bluetooth connections: ", connections)
+    raise_event("mode")
 
 
 def update_request(loc, state):                                                             #The ESP32 will send with this command a request for a location (pickup/dropoff)
-    global bring_here_list                                                                  #Using these global variables in this local function (if not defined to be global, it will make a local variable)
-    global take_out_list
-    global outside_dict
-    global floor_takeout_list
+    global bring_here_queue                                                                 #Using these global variables in this local function (if not defined to be global, it will make a local variable)
+    global take_out_queue
+    global floor_takeout_queue
 
     print("Request update with state %s"%state, " for location %s."%loc)                    #Print this feedback line when debugging
     if 0 <= loc < 100:                                                                      #Check if the request is for a location in the racks (locations 0,1,2,.. max 99)
         if wms_online_list[loc] == "No box present":                                        #Check if there is no box stored on this location
             if state == 0:                                                                  #If no box is stored and the state is 0, the dropoff requests needs to be deleted
-                try: bring_here_list.remove(int(loc))                                       #Try to remove the location from the dropoff list
-                except: return                                                              #If it fails (it wasn't in the list), end this function
+                job_queue_remove(bring_here_queue, int(loc))                                #Cancel the job for this location in the dropoff queue
             elif state == 1:                                                                #If no box is stored and the state is 1, a dropoff request needs to be added to this location
-                bring_here_list.append(int(loc))                                            #Adding this location to the end of the list that has all locations to bring a box to next
+                job_queue_add(bring_here_queue, int(loc), "Touchscreen")                    #Adding a touchscreen job for this location to the queue that has all locations to bring a box to next
         else: 
             if state == 0:                                                                  #If a box is stored and the state is 0, the pickup request needs to be deleted
-                try: take_out_list.remove(int(loc))                                         #Try to remove the location from the pickup list
-                except: return                                                              #If it fails (it wasn't in the list), end this function
+                job_queue_remove(take_out_queue, int(loc))                                  #Cancel the job for this location in the pickup queue
             elif state == 1:                                                                #If a box is stored and the state is 1, a pickup request needs to be added for this location
-                take_out_list.append(int(loc))                                              #Adding this location to the end of the list that has all locations where boxes need to be taken out from
+                job_queue_add(take_out_queue, int(loc), "Touchscreen")                      #Adding a touchscreen job for this location to the queue that has all locations where boxes need to be taken out from
 
     elif 110 <= loc < 120:                                                                  #Check if the request is for a storage location near the 6DOF (locations 110,111,112,113,114)
-        if outside_dict["location%s"%loc]["box"] == True:                                   #Check if there is a box stored on this location
-            if state == 0:                                                                  #If a box is on this location and the state is 0, the pickup request needs to be deleted
-                try: floor_takeout_list.remove(int(loc))                                    #Try to remove the location from the pickup list
-                except: return                                                              #If it fails (it wasn't in the list), end this function
+        if outside_box[loc] == True:                                                        #Check if there is a box stored on this location
+            if state == 0 and not(int(loc) in robot_batch):                                 #If a box is on this location and the state is 0, the pickup request needs to be deleted (not when the robot already got the job)
+                job_queue_remove(floor_takeout_queue, int(loc))                             #Cancel the job for this location in the pickup queue
             elif state == 1:                                                                #If a box is on this location and the state is 1, a pickup request needs to be added for this location
-                floor_takeout_list.append(int(loc))                                         #Adding this location to the end of the list that has all locations where boxes need to be taken out from
+                job_queue_add(floor_takeout_queue, int(loc), "Touchscreen")                 #Adding a touchscreen job for this location to the queue that has all locations where boxes need to be taken out from
+
+
+def request_name(name):                                                                     #The ESP32 will send with this command a request to take out a box by its name, the master chooses the rack location
+    box_name = name.decode()                                                                #Decoding the string (name of the items in the pallet) that is send by UARTRemote
+    loc = name_storage_location(box_name)
+    print("Request to take out a box with name:", box_name, ". From location:", loc)        #Print this feedback line when debugging
+    if loc == -1: return                                                                    #No box with this name in the rack (or all of them are already requested)
+    job_queue_add(take_out_queue, loc, "Touchscreen")                                       #Adding a touchscreen job for this location, the same as a request by location
+    queue_put(comm_list_uart, ["update_request", loc, 1])                                   #Showing the request on the touchscreen
 
 
 def adjust_manual(task, val):                                                               #The ESP32 will send with this command manual controls for the 6DOF / scissorlift / conveyors / stacker crane
     global man_adj_scissor_max                                                              #Using these global variables in this local function (if not defined to be global, it will make a local variable)
     global max_speed_scissorlift_adj
     global max_speed_roll_adj
-    global outside_dict
     global scissorlift_top_pos
     
     print(task,val )                                                                        #Print this feedback line when debugging
     if   task == 0:                                                                         #TASK  0 Are the commands for the 6DOF before homing has started
-        if   val == 0:  conv_status_to_robot_mbox.send("Stop motors")                       #VAL   0 Is used to hold all motors in their current position
-        elif val == 1:  conv_status_to_robot_mbox.send("Start homing")                      #VAL   1 Is used to start the homing of the 6DOF
-        elif val == 2:  conv_status_to_robot_mbox.send("J1 CW")                             #VAL   2 Is used to run Joint 1         Clockwise
-        elif val == 3:  conv_status_to_robot_mbox.send("J1 CCW")                            #VAL   3 Is used to run Joint 1 Counter-Clockwise
-        elif val == 4:  conv_status_to_robot_mbox.send("J2 CW")                             #VAL   4 Is used to run Joint 2         Clockwise
-        elif val == 5:  conv_status_to_robot_mbox.send("J2 CCW")                            #VAL   5 Is used to run Joint 2 Counter-Clockwise
-        elif val == 6:  conv_status_to_robot_mbox.send("J3 CW")                             #VAL   6 Is used to run Joint 3         Clockwise
-        elif val == 7:  conv_status_to_robot_mbox.send("J3 CCW")                            #VAL   7 Is used to run Joint 3 Counter-Clockwise
-    elif 0 < task < 7:  comm_list_robot.append("Adjust J%s: %s"%(task, val))                #TASK 1-6 Are the commands to manually adjust each Joint of the 6DOF by 1degree (-10,10 limits)
+        if   val == 0:  link_send(robot_link, "Stop motors")                                #VAL   0 Is used to hold all motors in their current position
+        elif val == 1:  link_send(robot_link, "Start homing")                               #VAL   1 Is used to start the homing of the 6DOF
+        elif val == 2:  link_send(robot_link, "J1 CW")                                      #VAL   2 Is used to run Joint 1         Clockwise
+        elif val == 3:  link_send(robot_link, "J1 CCW")                                     #VAL   3 Is used to run Joint 1 Counter-Clockwise
+        elif val == 4:  link_send(robot_link, "J2 CW")                                      #VAL   4 Is used to run Joint 2         Clockwise
+        elif val == 5:  link_send(robot_link, "J2 CCW")                                     #VAL   5 Is used to run Joint 2 Counter-Clockwise
+        elif val == 6:  link_send(robot_link, "J3 CW")                                      #VAL   6 Is used to run Joint 3         Clockwise
+        elif val == 7:  link_send(robot_link, "J3 CCW")                                     #VAL   7 Is used to run Joint 3 Counter-Clockwise
+    elif 0 < task < 7:  queue_put(comm_list_robot, "Adjust J%s: %s"%(task, val))            #TASK 1-6 Are the commands to manually adjust each Joint of the 6DOF by 1degree (-10,10 limits)
     elif task ==  7:                                                                        #TASK  7 Command to mannually adjust the top position of the scissorlift by a few mm (-10,10 limits)
-        man_adj_scissor_max = int(val)                                                      #TODO can't this value be added directly to the standard value and saved in the dictionary?
-        outside_dict["location106"]["liftheight"]   = scissorlift_top_pos + (man_adj_scissor_max * 40)
+        man_adj_scissor_max = int(val)                                                      #TODO can't this value be added directly to the standard value and saved in the location list?
+        outside_liftheight[106] = scissorlift_top_pos + (man_adj_scissor_max * 40)
     elif task ==  8: max_speed_scissorlift_adj = 0.01 * int(val)                            #TASK  8 Command for manually adjusting the scissorlift speed           (20% ... 100%)
-    elif task ==  9: comm_list_crane.append("Height adjustment: %s"%val)                    #TASK  9 Command for manually adjusting the stacker crane basket height (-10,10 limits)
-    elif task == 10: comm_list_crane.append("Speed adjustment: %s"%val)                     #TASK 10 Command for manually adjusting the stacker crane speed         (20% ... 100%)
-    elif task == 11: comm_list_chain.append("Speed adjustment: %s"%val)                     #TASK 11 Command for manually adjusting the chain conveyors speed       (20% ... 100%)
+    elif task ==  9: queue_put(comm_list_crane, "Height adjustment: %s"%val)                #TASK  9 Command for manually adjusting the stacker crane basket height (-10,10 limits)
+    elif task == 10: queue_put(comm_list_crane, "Speed adjustment: %s"%val)                 #TASK 10 Command for manually adjusting the stacker crane speed         (20% ... 100%)
+    elif task == 11: queue_put(comm_list_chain, "Speed adjustment: %s"%val)                 #TASK 11 Command for manually adjusting the chain conveyors speed       (20% ... 100%)
     elif task == 12: max_speed_roll_adj = 0.01 * int(val)                                   #TASK 12 Command for manually adjusting the roll conveyors speed        (20% ... 100%)
 
 
 def reset_error(error):                                                                     #The ESP32 will send with this command manual controlled error solving for the conveyors / stacker crane
     print("A request to reset an error at %s"%error)                                        #Print this feedback line when debugging
     if   error == 0:                                                                        #Error 0 Is used to retry checking if a box is on the input chain conveyor or not (if there should/should not be one)
-        comm_list_chain.append("Reset")                                                     #A not used message is added to the bluetooth communication waiting list for the chain conveyor brick [To be able to call the real one multiple times if needed]
-        comm_list_chain.append("Inp error reset")                                           #This real message is added to the bluetooth communication waiting list for the chain conveyor brick
+        queue_put(comm_list_chain, "Reset")                                                 #A not used message is added to the bluetooth communication waiting list for the chain conveyor brick [To be able to call the real one multiple times if needed]
+        queue_put(comm_list_chain, "Inp error reset")                                       #This real message is added to the bluetooth communication waiting list for the chain conveyor brick
     if   error == 1:                                                                        #Error 1 Is used to retry checking if a box is on the output chain conveyor or not (if there should/should not be one)
-        comm_list_chain.append("Reset")
-        comm_list_chain.append("Outp error reset")                                          #This real message is added to the bluetooth communication waiting list for the chain conveyor brick
+        queue_put(comm_list_chain, "Reset")
+        queue_put(comm_list_chain, "Outp error reset")                                      #This real message is added to the bluetooth communication waiting list for the chain conveyor brick
     elif error == 2:                                                                        #Error 2 Is used to retry centering the telescopic fork of the stacker crane if it noticed a malfunction
-        if crane_status == "Homing":                                                        #If the stacker crane is still homing and has a calibration error, send the next messages
-            conv_status_to_crane_mbox.send("Try again")
-            wait(400)
-            conv_status_to_crane_mbox.send("Reset")
+        if crane_status == "Homing":                                                        #If the stacker crane is still homing and has a calibration error, send the next message
+            link_send(crane_link, "Try again")                                              #Directly to the link, the communication waiting list is only send after homing
         else:                                                                               #If the stacker crane is finished homing and has a homing error, send the next messages
-            comm_list_crane.append("Reset")
-            comm_list_crane.append("Reset error fork homing")
+            queue_put(comm_list_crane, "Reset")
+            queue_put(comm_list_crane, "Reset error fork homing")
     elif error == 3:                                                                        #Error 3 Is used to retry reaching its driving position if it noticed a malfunction
-        comm_list_crane.append("Reset")
-        comm_list_crane.append("Reset drive error")
+        queue_put(comm_list_crane, "Reset")
+        queue_put(comm_list_crane, "Reset drive error")
 
 
 def mod_wms(loc, state, name):                                                              #The ESP32 will send with this command manual added/deleted boxes to/from the WMS (Warehouse Management System)
@@ -368,102 +950,158 @@ def mod_wms(loc, state, name):
     if     0 <= loc < 100:                                                                  #Check if the WMS change is for a location in the racks (locations 0,1,2,.. max 99)
         if   state == 0:                                                                    #STATE 0 Removes the box from the rack WMS
             change_one_wms_position(loc, "No box present")                                  #Perform the function that changes 1 WMS position and saves it online+offline
-            if int(loc) in take_out_list:                                                   #Check if for this location a request is open to take it out of the rack
-                try: take_out_list.remove(int(loc))                                         #If it is, try to remove it from the list
-                except: print("Did not find the box to remove")                             #Print this feedback line when debugging
+            job_queue_remove(take_out_queue, int(loc))                                      #If for this location a request is open, it is done now
         elif state == 1:                                                                    #STATE 1 Adds the box to the rack WMS
             change_one_wms_position(loc, new_name)                                          #Perform the function that changes 1 WMS position and saves it online+offline
-            if int(loc) in bring_here_list:                                                 #Check if for this location a request is open to take a box to this location
-                try: bring_here_list.remove(int(loc))                                       #If it is, try to remove it from the list
-                except: print("Did not find the box to remove")                             #Print this feedback line when debugging
+            job_queue_remove(bring_here_queue, int(loc))                                    #If for this location a request is open, it is done now
     elif 100 <= loc < 200:                                                                  #Check if the WMS change is for a conveyor or a storage location near the 6DOF (locations 100,101,102,103,104,105,106,107,110,111,112,113,114)
         if   state == 0:                                                                    #STATE 0 Removes the box from the outside WMS
-            outside_dict["location%s"%loc]["name"] = "No box present"                       #Removing the current name from the dictionary
-            outside_dict["location%s"%loc]["box"] = False                                   #Removing the box is present state from the dictionary
-            if   loc == 101: comm_list_chain.append("Chain out empty")                      #If the location is a conveyor, a message is added to the bluetooth communication waiting list for the chain conveyor brick 
-            elif loc == 102: comm_list_chain.append("Roll out empty")
-            elif loc == 104: comm_list_chain.append("Roll in empty")
-            elif loc == 105: comm_list_chain.append("Chain in empty")
-            elif loc == 106: comm_list_chain.append("Scissor empty")
-            if int(loc) in floor_takeout_list:                                              #Check if for this location a request is open to take a box from this location
-                try: floor_takeout_list.remove(int(loc))                                    #If it is, try to remove it from the list
-                except: print("Did not find the box to remove")                             #Print this feedback line when debugging
+            set_outside_box(loc, "No box present")                                          #Removing the current name and the box is present state
+            if   loc == 101: queue_put(comm_list_chain, "Chain out empty")                  #If the location is a conveyor, a message is added to the bluetooth communication waiting list for the chain conveyor brick 
+            elif loc == 102: queue_put(comm_list_chain, "Roll out empty")
+            elif loc == 104: queue_put(comm_list_chain, "Roll in empty")
+            elif loc == 105: queue_put(comm_list_chain, "Chain in empty")
+            elif loc == 106: queue_put(comm_list_chain, "Scissor empty")
+            job_queue_remove(floor_takeout_queue, int(loc))                                 #If for this location a request is open, it is done now
         elif state == 1:                                                                    #STATE 1 Adds the box to the outside WMS
-            outside_dict["location%s"%loc]["name"] = new_name                               #Adding the new name to the dictionary
-            outside_dict["location%s"%loc]["box"] = True                                    #Adding the box is present state to the dictionary
-            if   loc == 101: comm_list_chain.append("Chain out full")                       #If the location is a conveyor, a message is added to the bluetooth communication waiting list for the chain conveyor brick 
-            elif loc == 102: comm_list_chain.append("Roll out full")
-            elif loc == 104: comm_list_chain.append("Roll in full")
-            elif loc == 105: comm_list_chain.append("Chain in full")
+            set_outside_box(loc, new_name)                                                  #Adding the new name and the box is present state
+            if   loc == 101: queue_put(comm_list_chain, "Chain out full")                   #If the location is a conveyor, a message is added to the bluetooth communication waiting list for the chain conveyor brick 
+            elif loc == 102: queue_put(comm_list_chain, "Roll out full")
+            elif loc == 104: queue_put(comm_list_chain, "Roll in full")
+            elif loc == 105: queue_put(comm_list_chain, "Chain in full")
             elif loc == 106:
-                comm_list_chain.append("Input from scissor")
-                comm_list_robot.append("Scissor full")                                      #If the location is the scissorlift, a message is added to the bluetooth communication waiting list for the robot brick 
+                queue_put(comm_list_chain, "Input from scissor")
+                queue_put(comm_list_robot, "Scissor full")                                  #If the location is the scissorlift, a message is added to the bluetooth communication waiting list for the robot brick 
         save_outside_wms()                                                                  #Saving the offline WMS for machine parts and floor storage
 
 
+def wms_changes_since(epoch, seq, timeout=-1):                                              #The ESP32 will send with this command the epoch and the last WMS change number it has received, all changes after it are send again. Timeout (ms) for a full UART queue
+    global wms_resync_needed                                                                #Using this global variable in this local function (if not defined to be global, it will make a local variable)
+
+    with wms_log_lock:                                                                      #The log and the number of the same moment, a change after this is send with the next sequence update
+        change_log = list(wms_change_log)
+        sequence   = wms_sequence
+    print("WMS changes requested since", epoch, seq, "current", wms_epoch, sequence)        #Print this feedback line when debugging
+    if epoch != wms_epoch or seq > sequence or (seq < sequence and (change_log == [] or change_log[0][0] > seq + 1)): #The number is from before a restart or the changes are no longer in the log, send everything
+        full_records = []
+        for i in range(total_storage_positions):                                            #Every rack location, also the empty ones so the ESP32 removes boxes that are gone
+            if wms_online_list[i] == "No box present": full_records.append([i, 0, ""])
+            else:                                      full_records.append([i, 1, wms_online_list[i]])
+        for i in positions:                                                                 #Every conveyor and floor storage location
+            if outside_box[i] == True: full_records.append([i, 1, outside_name[i]])
+            else:                      full_records.append([i, 0, ""])
+        messages = [["update_storage_bulk", frame] for frame in wms_bulk_frames(full_records)]
+    else:
+        messages = [["update_storage", change[1], change[2], change[3]] for change in change_log if change[0] > seq] #Only the changes the ESP32 has not received yet
+    messages.append(["update_sequence", wms_epoch, sequence])                               #After these messages the ESP32 is up to date until this number
+    for message in messages:
+        if queue_put(comm_list_uart, message, timeout) == False:                            #The UART communication waiting list is full, try all changes again when the ESP32 has answered the next message
+            wms_resync_needed = True
+            return
+
+
 ur.add_command(mode_warehouse)                                                              #Adding all the previous defined receiving functions to the UartRemote commands list
 ur.add_command(update_request)
+ur.add_command(request_name)
 ur.add_command(adjust_manual)
 ur.add_command(reset_error)
 ur.add_command(mod_wms)
+ur.add_command(wms_changes_since)
 
 
 ##########~~~~~~~~~~UART SENDING COMMUNICATION COMMANDS~~~~~~~~~~##########
 def update_WMS_ESP(loc, state, name):                                                       #The ESP32 will receive with this command information about 1 WMS position (name by string included)
     print("WMS update", loc, state, name)                                                   #Print this feedback line when debugging (location / box present or not / the name of the box)
-    if state == 0:                                                                          #STATE 0 No box is present at this location
-        while ur.call("update_storage", '2bs', loc, 0, "") == None: continue                #Send the message, whilst no answer is received, send the message again
-    elif state == 1:                                                                        #STATE 1 A box is present at this location
-        while ur.call("update_storage", '2b%ss'%len(name), loc, 1, name) == None: continue  #Send the message, whilst no answer is received, send the message again
+    if state == 0: queue_put(comm_list_uart, ["update_storage", loc, 0, ""])                #STATE 0 No box is present at this location, the message is added to the UART communication waiting list for the ESP32
+    elif state == 1: queue_put(comm_list_uart, ["update_storage", loc, 1, name])            #STATE 1 A box is present at this location
+
+
+def wms_bulk_frames(records):                                                               #Packing many WMS positions [[loc, state, name], ...] in as few UART messages as possible, returns a list of message strings
+    frames = []                                                                             #Defining local variables
+    frame  = ""
+    for record in records:                                                                  #Every location is added as "loc,state,length,name|", the length of the name is sent so a "|" or "," in the name can not split the record
+        next_record = "%s,%s,%s,%s|"%(record[0], record[1], len(record[2]), record[2])
+        if len(frame) + len(next_record) > wms_bulk_frame_size:                             #If the message would become too long for 1 UART message, start a new one
+            frames.append(frame)
+            frame = ""
+        frame += next_record
+    if frame != "": frames.append(frame)                                                    #Add the last (not full) message
+    return frames
+
+
+def update_WMS_ESP_bulk(records):                                                           #The ESP32 will receive with this command many WMS positions in 1 message [[loc, state, name], ...] (used at startup)
+    for frame in wms_bulk_frames(records):
+        print("WMS bulk update", frame)                                                     #Print this feedback line when debugging
+        queue_put(comm_list_uart, ["update_storage_bulk", frame])                           #The message is added to the UART communication waiting list for the ESP32
+
+
+##########~~~~~~~~~~UART REQUEST LAYER, NO THREAD WAITS FOR THE ESP32~~~~~~~~~~##########
+#Every message to the ESP32 becomes a request {id, command, format, arguments, callback, tries, time of the first try}. Only the UART thread calls the ESP32, 1 request at a time
+#(a call waits for the answer before the next request is send). A request is tried again until its retry budget or timeout is used up, then its callback gets None as result
+def uart_request(command, fmt, args, callback=None):                                        #Adding a request for the ESP32, returns its id. Callback(request, result) is called with the answer, or with None if it failed
+    global uart_request_id                                                                  #Using this global variable in this local function (if not defined to be global, it will make a local variable)
+
+    uart_request_id = uart_request_id % 9999 + 1
+    uart_requests.append({"id": uart_request_id, "command": command, "fmt": fmt, "args": args, "callback": callback, "tries": 0, "start": None})
+    return uart_request_id
+
+
+def uart_request_from_list(comm_uart):                                                      #Making a request from a message of the UART communication waiting list [command name, arguments...]
+    if   comm_uart[0] == "update_mode":         uart_request("update_mode", '1b%ss'%len(comm_uart[2]), comm_uart[1:], uart_result)  #(state / error text)
+    elif comm_uart[0] == "update_storage":      uart_request("update_storage", '2b%ss'%len(comm_uart[3]), comm_uart[1:], uart_result)   #(location / box present or not / name)
+    elif comm_uart[0] == "update_request":      uart_request("update_request", '2b', comm_uart[1:], uart_result)    #(location / request state)
+    elif comm_uart[0] == "update_storage_bulk": uart_request("update_storage_bulk", '%ss'%len(comm_uart[1]), comm_uart[1:], uart_result)    #(many WMS positions in 1 message)
+    elif comm_uart[0] == "update_sequence":     uart_request("update_sequence", '2i', comm_uart[1:], uart_result)   #(epoch of this program run / WMS change number)
+    elif comm_uart[0] == "transport_pallet":    uart_request("transport_pallet", '2b', comm_uart[1:], uart_result)  #(start location / end location, no name is given for faster process speed)
+    else: print("Command not found, can not execute", comm_uart)                            #Print this feedback line when debugging if the command name doesn't exist
+
 
+def uart_result(request, result):                                                           #Callback for the requests from the UART communication waiting list
+    global wms_sequence_send                                                                #Using these global variables in this local function (if not defined to be global, it will make a local variable)
+    global wms_resync_needed
 
-##########~~~~~~~~~~UART AND BLUETOOTH SENDING COMMUNICATION COMMANDS~~~~~~~~~~##########
-def communication_bt_uart():                                                                #The ESP32 will receive with this command all other information that is added to the list from a loop together with Bluetooth commands
-    global comm_list_uart                                                                   #TODO is this global needed? BT lists are not global but work
+    if result != None:                                                                      #The ESP32 has answered
+        if request["command"] == "update_sequence": wms_sequence_send = request["args"][1]  #The ESP32 is up to date until this WMS change number
+    elif request["command"] in ["update_storage", "update_storage_bulk", "transport_pallet", "update_sequence"]:
+        wms_resync_needed = True                                                            #A WMS change is lost, when the ESP32 answers again it gets all changes after the last confirmed number
+    else:                                                                                   #An error or request state message is tried again with a new budget, so the touchscreen shows it when it is back
+        request["tries"] = 0                                                                #Kept in the UART requests, a put on a full UART queue would block this thread that has to empty it
+        request["start"] = None
+        uart_requests.append(request)
+
+
+def uart_call(request):                                                                     #1 try of a request, returns the answer of the ESP32 or None. Blocks at most the UART timeout of 1 call
+    if request["start"] == None: request["start"] = timer_uart.time()                       #The timeout starts at the first try, not while the request waits in the list
+    request["tries"] += 1
+    print(request["command"], request["fmt"], *request["args"])                             #Print this feedback line when debugging (command name / what is send, byte and-or string / the message consisting out of bytes-strings)
+    try: return ur.call(request["command"], request["fmt"], *request["args"])
+    except: return None
+
+
+def communication_bt_uart():                                                                #The ESP32 will receive with this command all other information that is added to the list from a loop (Bluetooth commands are send by the link sender threads)
+    global wms_resync_needed                                                                #Using these global variables in this local function (if not defined to be global, it will make a local variable)
+    global uart_online
 
     while True:                                                                             #Start a forever loop
-        wait(100)
-        if len(comm_list_uart) > 0:                                                         #Check if there is a command in the UART communication list
-            comm_uart = comm_list_uart[0]                                                   #Reading the first command in the UART communication list [The result is a list]
-            if comm_uart[0] == "update_mode":                                               #The first result is the command name, checking what command is requested, if "update mode" execute this statement
-                print("update_mode", '1b%ss'%len(comm_uart[2]), comm_uart[1], comm_uart[2]) #Print this feedback line when debugging (command name / what is send, byte and-or string / the message consisting out of bytes-strings)
-                while ur.call("update_mode", '1b%ss'%len(comm_uart[2]), comm_uart[1], comm_uart[2]) == None: continue   #Send the message, whilst no answer is received, send the message again
-                del comm_list_uart[0]                                                       #If the message is succesfully send, delete it from the communication list
-            elif comm_uart[0] == "update_storage":                                          #TODO check if this is still being used or join with the update_WMS_ESP
-                print("update_storage", '2b%ss'%len(comm_uart[3]), comm_uart[1], comm_uart[2], comm_uart[3])
-                while ur.call("update_storage", '2b%ss'%len(comm_uart[3]), comm_uart[1], comm_uart[2], comm_uart[3]) == None: continue
-                del comm_list_uart[0]
-            elif comm_uart[0] == "update_request":                                          #Sending the message that a location has changed its request status (if an automatic mode has chosen a random box transport)
-                print("update_request", '2b', comm_uart[1], comm_uart[2])
-                while ur.call("update_request", '2b', comm_uart[1], comm_uart[2]) == None: continue
-                del comm_list_uart[0]
-            elif comm_uart[0] == "transport_pallet":                                        #Sending a message that a pallet has been moved from one position to another, no name is given (faster process speed)
-                print("transport_pallet", '2b', comm_uart[1], comm_uart[2])
-                while ur.call("transport_pallet", '2b', comm_uart[1], comm_uart[2]) == None: continue
-                del comm_list_uart[0]
-            else: print("Command not found, can not execute")                               #Print this feedback line when debugging if the command name doesn't exist
-            continue                                                                        #UART commands go first, so restart the loop from the beginning, trying to send another UART command TODO Maybe need to change this for faster Emergency stops?
-        if len(comm_list_chain) > 0 and chain_status != "Homing":                           #Check if there is a command in the chain conveyor communication list
-            print("outgoing message to chain brick: %s."%comm_list_chain[0])                #Print this feedback line when debugging
-            conv_status_to_chain_mbox.send(comm_list_chain[0])                              #The message is send by bluetooth communication to the chain conveyor brick
-            wait(50)
-            conv_status_to_chain_mbox.send(comm_list_chain[0])                              #Sending each double as I had trouble receiving some commands TODO is this still needed?
-            del comm_list_chain[0]                                                          #If the message is send, delete it from the communication list
-            wait(300)                                                                       #If other lists have no messages, but this one would have 1 more, allow the receiver some time to read this message first
-        if len(comm_list_crane) > 0 and crane_status != "Homing":                           #Check if there is a command in the stacker crane communication list
-            print("outgoing message to crane brick: %s."%comm_list_crane[0])                #Print this feedback line when debugging
-            conv_status_to_crane_mbox.send(comm_list_crane[0])                              #The message is send by bluetooth communication to the stacker crane brick
-            wait(50)
-            conv_status_to_crane_mbox.send(comm_list_crane[0])                              #Sending each double as I had trouble receiving some commands TODO is this still needed?
-            del comm_list_crane[0]                                                          #If the message is send, delete it from the communication list
-            wait(300)                                                                       #If other lists have no messages, but this one would have 1 more, allow the receiver some time to read this message first
-        if len(comm_list_robot) > 0 and robot_status != "Homing":                           #Check if there is a command in the 6DOF communication list
-            print("outgoing message to robot brick: %s."%comm_list_robot[0])                #Print this feedback line when debugging
-            conv_status_to_robot_mbox.send(comm_list_robot[0])                              #The message is send by bluetooth communication to the 6DOF brick
-            wait(50)
-            conv_status_to_robot_mbox.send(comm_list_robot[0])                              #Sending each double as I had trouble receiving some commands TODO is this still needed?
-            del comm_list_robot[0]                                                          #If the message is send, delete it from the communication list
-            wait(300)                                                                       #If other lists have no messages, but this one would have 1 more, allow the receiver some time to read this message first
+        if uart_online == False: wait(uart_offline_wait)                                    #Do not keep the UART busy with a touchscreen that is not answering
+        if uart_requests == []:
+            comm_uart = queue_get(comm_list_uart, 100)                                      #Sleep until there is a message in the UART communication waiting queue, at most 100ms
+            if comm_uart == None and wms_sequence_send != wms_sequence and wms_resync_needed == False: comm_uart = ["update_sequence", wms_epoch, wms_sequence] #If all UART messages are send, tell the ESP32 until which WMS change number it is up to date
+            if comm_uart != None: uart_request_from_list(comm_uart)
+        while len(uart_requests) > 0:                                                       #Send the requests 1 by 1 in order, the ESP32 has to apply the pallet moves in the same order
+            request = uart_requests[0]
+            result  = uart_call(request)
+            if result == None and request["tries"] < uart_retry_budget and timer_uart.time() - request["start"] < uart_call_timeout:
+                uart_online = False                                                         #No answer, try this request again in the next pass
+                break
+            del uart_requests[0]
+            if result == None: print("UART request %s %s failed after %s tries"%(request["id"], request["command"], request["tries"]))   #Print this feedback line when debugging
+            elif uart_online == False or wms_resync_needed == True:                         #The ESP32 answers again
+                uart_online = True
+                if wms_resync_needed == True:
+                    wms_resync_needed = False
+                    wms_changes_since(wms_epoch, wms_sequence_send, 0)                      #Send all WMS changes after the last number the ESP32 has confirmed, without waiting for room in the queue this thread has to empty itself
+            if request["callback"] != None: request["callback"](request, result)
 
 
 ##########~~~~~~~~~~DEFINE SUB-ROUTINES [FUNCTIONS] FOR THE OPERATION OF THE WAREHOUSE~~~~~~~~~~##########
@@ -482,52 +1120,59 @@ def check_emergency_stop(zone):
 
 
 def conveyor_transfer_auto():                                                               #A loop that checks if a roll conveyor or scissorlift can do a job
-    global outside_dict                                                                     #Using these global variables in this local function (if not defined to be global, it will make a local variable)
-    global outbound
+    global outbound                                                                         #Using these global variables in this local function (if not defined to be global, it will make a local variable)
     global inbound
-    global floor_takeout_list
+    global floor_takeout_queue
     global robot_used
     global robot_status
 
+    event_seen = 0                                                                          #Defining local variables
     while True:                                                                             #Start a forever loop
-        if outside_dict["location102"]["box"] == True and outside_dict["location103"]["box"] == False:  #Check if there is a box on the output roll conveyor and none on the middle roll conveyor (locations 102,103)
+        event_seen = event_state(conveyor_auto_events)                                      #Read the events before checking, a change during the checks wakes up the sleep directly
+        if outside_box[102] == True and outside_box[103] == True and outside_box[104] == False:     #Both the output and the middle roll conveyor have a box, and the input roll conveyor is free (locations 102,103,104)
+            if robot_used == False and outside_box[106] == False:                           #Same rules as "mid to input" without the robot
+                move_box_roll("train")                                                      #Start the roll conveyor transfer function, both boxes move at the same time
+            elif robot_used == True and outbound == 0 and full_floor_spaces("normal") < floor_storage_space and job_queue_length(floor_takeout_queue) == 0:  #Same rules as "mid to input" with the robot
+                inbound += 1                                                                #Set 1 extra box going to the robot floor storage
+                move_box_roll("train")                                                      #Start the roll conveyor transfer function, both boxes move at the same time
+        if outside_box[102] == True and outside_box[103] == False:                          #Check if there is a box on the output roll conveyor and none on the middle roll conveyor (locations 102,103)
             move_box_roll("output to mid")                                                  #Start the roll conveyor transfer function
         
         #When not using 6DoF (This can be turned on/off remotely)
-        if outside_dict["location103"]["box"] == True and outside_dict["location104"]["box"] == False and outside_dict["location106"]["box"] == False and robot_used == False: #If the input roll conveyor is free, and the scissorlift also free, and a box on the middle roll conveyor
+        if outside_box[103] == True and outside_box[104] == False and outside_box[106] == False and robot_used == False: #If the input roll conveyor is free, and the scissorlift also free, and a box on the middle roll conveyor
             move_box_roll("mid to input")                                                   #Start the roll conveyor transfer function
-        if outside_dict["location106"]["box"] == True and outside_dict["location106"]["liftposition"] == "ready down" and robot_used == False:  #If there is a box on the scissorlift and the robot is not used (location 106)
-            if outside_dict["location104"]["box"] == True:                                  #Check if there is a box on the output roll conveyor (location 104)
+        if outside_box[106] == True and outside_liftposition[106] == "ready down" and robot_used == False:  #If there is a box on the scissorlift and the robot is not used (location 106)
+            if outside_box[104] == True:                                                    #Check if there is a box on the output roll conveyor (location 104)
                 scissorlift.run_target(max_speed_scissorlift * max_speed_scissorlift_adj, 300, then=Stop.COAST, wait=True)  #TODO I would like to have the scissorlift at this height when waiting for a command (potentially adding a box by forklift)
-                while outside_dict["location104"]["box"] == True: wait(100)                 #If there is a box on the output roll conveyor, wait for it to be taken away (location 104)
+                while outside_box[104] == True: wait(100)                                   #If there is a box on the output roll conveyor, wait for it to be taken away (location 104)
                 scissorlift.run_target(max_speed_scissorlift * max_speed_scissorlift_adj, 0, then=Stop.COAST, wait=True)    #Lower the scissorlift so the box touches the chains (location 106)
-                comm_list_chain.append("Scissor is down")                                   #A message is added to the bluetooth communication waiting list for the chain conveyor brick that the scissor is down, box can be taken away (location 106)
+                queue_put(comm_list_chain, "Scissor is down")                               #A message is added to the bluetooth communication waiting list for the chain conveyor brick that the scissor is down, box can be taken away (location 106)
         #TODO add a scissorlift raising slightly if the position is free and the robot is not used
         
         #When using 6DoF
-        if robot_used == True and outside_dict["location103"]["box"] == True:               #If the robot is used and a box is on the middle roll conveyor (location 103)
-            if outbound == 0 and full_floor_spaces("normal") < floor_storage_space and outside_dict["location104"]["box"] == False and len(floor_takeout_list) == 0:    #Check if no box is being taken out and if there is still enough room for 1 more going in
+        if robot_used == True and outside_box[103] == True:                                 #If the robot is used and a box is on the middle roll conveyor (location 103)
+            if outbound == 0 and full_floor_spaces("normal") < floor_storage_space and outside_box[104] == False and job_queue_length(floor_takeout_queue) == 0:    #Check if no box is being taken out and if there is still enough room for 1 more going in
                 inbound += 1                                                                #Set 1 extra box going to the robot floor storage
                 move_box_roll("mid to input")                                               #Start the roll conveyor transfer function
-        if robot_used == True and outside_dict["location106"]["box"] == True and outside_dict["location106"]["liftposition"] == "ready down" and inbound > 0 and outbound == 0: #If there is a box on the scissorlift and it is inbound (location 106)
-            outside_dict["location106"]["liftposition"] = "moving up"                       #Change the scissorlift position from down to moving
+        if robot_used == True and outside_box[106] == True and outside_liftposition[106] == "ready down" and inbound > 0 and outbound == 0: #If there is a box on the scissorlift and it is inbound (location 106)
+            outside_liftposition[106] = "moving up"                                         #Change the scissorlift position from down to moving
             sub_scissor_robot_operation.start()                                             #Start the scissorlift-robot transfer function
-        if robot_used == True and sens_output_floor.distance() < 40 and len(floor_takeout_list) == 0 and emergency_stop == False:
+        if robot_used == True and sens_output_floor.distance() < 40 and job_queue_length(floor_takeout_queue) == 0 and emergency_stop == False:
             for i in positions[-floor_storage_space:]:
-                if outside_dict["location%s"%i]["box"] == True and not(i in floor_takeout_list):
+                if outside_box[i] == True and not(job_queued(floor_takeout_queue, i)):
                     ev3.speaker.beep()
-                    floor_takeout_list.append(i)
+                    job_queue_add(floor_takeout_queue, i, "Automatic")
                     break
-        if inbound == 0 and outbound <= len(floor_takeout_list) and len(floor_takeout_list) > 0 and robot_used == True and robot_status == "Ready" and outside_dict["location107"]["box"] == False: #If there is no inbound, but takeout requests are open
+        if inbound == 0 and outbound <= job_queue_length(floor_takeout_queue) and job_queue_length(floor_takeout_queue) > 0 and robot_used == True and robot_status == "Ready" and outside_box[107] == False and robot_batch == []: #If there is no inbound, but takeout requests are open
             robot_status = "Performing task"                                                #Set the robot status to a busy state
-            #print("outbound count:", outbound, ". Floor take_out_list: ", floor_takeout_list, ". Full floorspaces:" , full_floor_spaces("freespace"), ". Inbound count: ", inbound)    ##Print this feedback line when debugging [Not used]
+            #print("outbound count:", outbound, ". Floor take_out_list: ", floor_takeout_queue["heap"], ". Full floorspaces:" , full_floor_spaces("freespace"), ". Inbound count: ", inbound)    ##Print this feedback line when debugging [Not used]
             outbound += 1                                                                   #Set 1 extra box going out of the robot floor storage
             sub_scissor_robot_operation.start()                                             #Start the scissorlift-robot transfer function
+        wait_event(conveyor_auto_events, event_seen, 200)                                   #Sleep until something changed, the timeout is for the floor sensor and the scissorlift position
 
 
 def move_box_roll(pos):                                                                     #Transferring a pallet from one to another roller conveyor
-    global outside_dict                                                                     #Using these global variables in this local function (if not defined to be global, it will make a local variable)
-    global conveyors
+    global conveyors                                                                        #Using these global variables in this local function (if not defined to be global, it will make a local variable)
     
     check_emergency_stop("Conveyors")                                                       #Check if the movement is allowed to start
     if pos == "output to mid":                                                              #Check what roll conveyor locations need to start transferring
@@ -543,13 +1188,10 @@ def move_box_roll(pos):
                     check_emergency_stop("Conveyors")                                       #Check if the movement is allowed to restart
                     break                                                                   #Close this loop, so motors will restart again
         while roll_conv_outp.control.done() == False: continue                              #Wait for the second motor to finish reaching the desired motor angle
-        outside_dict["location103"]["name"] = outside_dict["location102"]["name"]           #Transfer the name from the previous location to the new one (location 102 to 103)
-        outside_dict["location103"]["box"]  = True                                          #Set the box present at the new location (location 103)
-        outside_dict["location102"]["name"] = "No box present"                              #Remove the name from the old location (location 102)
-        outside_dict["location102"]["box"] = False                                          #Remove the box present at the old location (location 102)
+        move_outside_box(102, 103)                                                          #Transfer the box from the previous location to the new one (location 102 to 103)
         save_outside_wms()                                                                  #Saving the offline WMS for machine parts and floor storage
-        comm_list_uart.append(["transport_pallet", 102, 103])                               #The message is added to the UART communication waiting list for the ESP32
-        comm_list_chain.append("Roll out empty")                                            #The message is added to the bluetooth communication waiting list for the chain conveyor brick 
+        queue_put(comm_list_uart, ["transport_pallet", 102, 103])                           #The message is added to the UART communication waiting list for the ESP32
+        queue_put(comm_list_chain, "Roll out empty")                                        #The message is added to the bluetooth communication waiting list for the chain conveyor brick 
         
     elif pos == "mid to input":                                                             #Check what roll conveyor locations need to start transferring [Same as previous transfer, but different motors]
         m1_angle = roll_conv_inp.angle() + roll_dist_conv
@@ -564,145 +1206,285 @@ def move_box_roll(pos):
                     check_emergency_stop("Conveyors")
                     break
         while roll_conv_mid.control.done() == False: continue
-        outside_dict["location104"]["name"] = outside_dict["location103"]["name"]
-        outside_dict["location104"]["box"]  = True
-        outside_dict["location103"]["name"] = "No box present"
-        outside_dict["location103"]["box"] = False
+        move_outside_box(103, 104)
         save_outside_wms()
-        comm_list_uart.append(["transport_pallet", 103, 104])
-        comm_list_chain.append("Roll in full")
+        queue_put(comm_list_uart, ["transport_pallet", 103, 104])
+        queue_put(comm_list_chain, "Roll in full")
+
+    elif pos == "train":                                                                    #All 3 roll conveyors run together, transferring 2 boxes at the same time (locations 102 -> 103 and 103 -> 104)
+        m1_angle = roll_conv_inp.angle()  + roll_dist_conv                                  #Get the current motor angle for the first  conveyor and add the movement, save it as a local variable
+        m2_angle = roll_conv_mid.angle()  + roll_dist_conv                                  #Get the current motor angle for the second conveyor and add the movement, save it as a local variable
+        m3_angle = roll_conv_outp.angle() + roll_dist_conv                                  #Get the current motor angle for the third  conveyor and add the movement, save it as a local variable
+        while roll_conv_mid.angle() < m2_angle - 10 or roll_conv_outp.angle() < m3_angle - 10:  #Start a loop until both conveyors with a box are near 10degrees of finishing the rotation
+            roll_conv_inp.run_target (max_speed_roll_conv * max_speed_roll_adj, m1_angle, then=Stop.COAST, wait=False)  #Send the first  motor run to the target command, don't wait for finishing
+            roll_conv_mid.run_target (max_speed_roll_conv * max_speed_roll_adj, m2_angle, then=Stop.COAST, wait=False)  #Send the second motor run to the target command, don't wait for finishing
+            roll_conv_outp.run_target(max_speed_roll_conv * max_speed_roll_adj, m3_angle, then=Stop.COAST, wait=False)  #Send the third  motor run to the target command, don't wait for finishing
+            while roll_conv_mid.angle() < m2_angle - 50 or roll_conv_outp.angle() < m3_angle - 50:  #Start a loop until both conveyors with a box are near 50degrees of finishing the rotation
+                if emergency_stop == True or conveyors == "Off":                            #If during this loop an emergency stop occurs or the conveyors are turned off
+                    roll_conv_inp. stop()                                                   #Stop the first conveyor
+                    roll_conv_mid. stop()                                                   #Stop the second conveyor
+                    roll_conv_outp.stop()                                                   #Stop the third conveyor
+                    check_emergency_stop("Conveyors")                                       #Check if the movement is allowed to restart
+                    break                                                                   #Close this loop, so motors will restart again
+        while roll_conv_mid.control.done() == False or roll_conv_outp.control.done() == False: continue    #Wait for both motors to finish reaching the desired motor angle
+        shift_outside_boxes([102, 103, 104])                                                #Transfer both boxes in the WMS in 1 step (location 103 to 104 and 102 to 103)
+        save_outside_wms()                                                                  #Saving the offline WMS for machine parts and floor storage, both changes together
+        queue_put(comm_list_uart, ["transport_pallet", 103, 104])                           #The message is added to the UART communication waiting list for the ESP32 (first the front box, so the ESP32 never has 2 boxes on 1 location)
+        queue_put(comm_list_uart, ["transport_pallet", 102, 103])                           #The message is added to the UART communication waiting list for the ESP32
+        queue_put(comm_list_chain, "Roll out empty")                                        #The message is added to the bluetooth communication waiting list for the chain conveyor brick
+        queue_put(comm_list_chain, "Roll in full")                                          #The message is added to the bluetooth communication waiting list for the chain conveyor brick
 
 
 def crane_auto():                                                                           #A loop that checks if the stacker crane can do a job
-    global bring_here_list                                                                  #Using these global variables in this local function (if not defined to be global, it will make a local variable)
-    global take_out_list
-    global outside_dict
+    global bring_here_queue                                                                 #Using these global variables in this local function (if not defined to be global, it will make a local variable)
+    global take_out_queue
     global crane_status
+    global crane_position
+    global crane_parked
 
-    temp_name_list = []                                                                     #Defining local variables
-    task_storage = 0                                                                        #TODO can't this variable declaration be deleted?
+    task_storage = 0                                                                        #Defining local variables TODO can't this variable declaration be deleted?
+    event_seen   = 0
+    park_abort_sent = False
 
     while True:                                                                             #Start a forever loop 
         check_emergency_stop("Crane")                                                       #Check if a movement is allowed to start
+        event_seen = event_state(crane_auto_events)                                         #Read the events before checking, a change during the checks wakes up the sleep directly
         if crane_status == "Ready" or crane_status == "Dropped off":                        #Check if stacker crane is ready to perform a task
-            if outside_dict["location105"]["box"] == True and outside_dict["location100"]["box"] == False:  #Check if there is a box on the input chain conveyor (location 105) and the stacker crane is free (location 100)
-                if bring_here_list == [] and hb_crane_input == "Automatic":                 #Check if the mode automatic input is selected and no more manually requests are open
-                    while True:                                                             #Start a forever loop
-                        chosen_random_nr = choice(storage_locations)                        #Choose a random number (only locations in the rack are in this list)
-                        if wms_online_list[chosen_random_nr] == "No box present": break     #Check if the chosen location is free, if not reloop. If it is free, break out of the forever loop
-                    comm_list_uart.append(["update_request", chosen_random_nr, 3])          #The message is added to the UART communication waiting list for the ESP32
-                    crane_order("Store", 0, chosen_random_nr)                               #Start the crane function
-                elif ( hb_crane_input == "Automatic" and bring_here_list != [] ) or ( hb_crane_input == "Manual" and bring_here_list != [] ):   #Check the input mode and if there is a manual request
-                    task_storage = bring_here_list[0]                                       #Save the first location that is requested for input
-                    comm_list_uart.append(["update_request", task_storage, 3])              #The message is added to the UART communication waiting list for the ESP32
-                    crane_order("Store", 0, bring_here_list[0])                             #Start the crane function
-                    if len(bring_here_list) > 0:                                            #TODO can't this be solved with a try/except
-                        if bring_here_list[0] == task_storage: bring_here_list.pop(0)       #Delete the task that was performed
-            if outside_dict["location101"]["box"] == False and outside_dict["location100"]["box"] == False: #Check if the output chain conveyor is empty (location 101) and the stacker crane is free (location 100)
-                if (hb_crane_output == "Automatic" and take_out_list == [] ) or (hb_crane_output == "Manual" and take_out_list == [] and sens_output_floor.distance() < 60):    #Check if there is no manual takeout request
-                    temp_name_list.clear()                                                  #Empty the local variable list
-                    for x in wms_online_list:                                               #For every rack location perform the next check
-                        if x != "No box present": temp_name_list.append(x)                  #If the location is not free (meaning there is a box), add it to the local variable list
-                    if len(temp_name_list) > 0:                                             #If there is anything in the list
-                        chosen_random_name = choice(temp_name_list)                         #Choose a random box from the list
-                        chosen_random_box = wms_online_list.index(chosen_random_name)       #Find the location number for this name
-                        comm_list_uart.append(["update_request", chosen_random_box, 3])     #The message is added to the UART communication waiting list for the ESP32
+            if outside_box[105] == True and outside_box[100] == False:                      #Check if there is a box on the input chain conveyor (location 105) and the stacker crane is free (location 100)
+                if job_queue_length(bring_here_queue) == 0 and hb_crane_input == "Automatic":   #Check if the mode automatic input is selected and no more manually requests are open
+                    if check_rack_full() == False:                                          #If the rack is full, the box is kept on the input chain conveyor (location 105)
+                        chosen_random_nr = free_storage_location(outside_name[105])         #Choose a free rack location with the put-away policy
+                        queue_put(comm_list_uart, ["update_request", chosen_random_nr, 3])  #The message is added to the UART communication waiting list for the ESP32
+                        crane_store(chosen_random_nr)                                       #Start the crane function, combined with a retrieve if possible
+                elif hb_crane_input != "Off" and job_queue_length(bring_here_queue) > 0:    #Check the input mode and if there is a manual request
+                    task_storage = job_queue_peek(bring_here_queue)                         #The job with the highest priority (including the time it is waiting)
+                    job_started(bring_here_queue, task_storage)
+                    queue_put(comm_list_uart, ["update_request", task_storage, 3])          #The message is added to the UART communication waiting list for the ESP32
+                    crane_store(task_storage)                                               #Start the crane function, combined with a retrieve if possible
+                    job_queue_remove(bring_here_queue, task_storage)                        #Delete the task that was performed (if it was not cancelled in the meantime)
+            if outside_box[101] == False and outside_box[100] == False:                     #Check if the output chain conveyor is empty (location 101) and the stacker crane is free (location 100)
+                if (hb_crane_output == "Automatic" and job_queue_length(take_out_queue) == 0 ) or (hb_crane_output == "Manual" and job_queue_length(take_out_queue) == 0 and sens_output_floor.distance() < 60):    #Check if there is no manual takeout request
+                    chosen_random_box = full_storage_location()                             #Choose a random rack location that holds a box
+                    if chosen_random_box != -1:                                             #If there is any box in the rack
                         ev3.speaker.beep()                                                  #Make a beeping sound to show that the input has been accepted and order started
-                        crane_order("Retrieve", wms_online_list.index(chosen_random_name), 0)   #Start the crane function
-                elif (hb_crane_output == "Automatic" and take_out_list != [] ) or (hb_crane_output == "Manual" and take_out_list != [] ):   #Check if there is a manual takeout request
-                    task_storage = take_out_list[0]                                         #Save the first location that is requested for output
-                    comm_list_uart.append(["update_request", task_storage, 3])              #The message is added to the UART communication waiting list for the ESP32
-                    crane_order("Retrieve", take_out_list[0], 0)                            #Start the crane function
-                    if len(take_out_list) > 0:                                              #TODO can't this be solved with a try/except
-                        if take_out_list[0] == task_storage: take_out_list.pop(0)           #Delete the task that was performed
-            if outside_dict["location100"]["box"] == True:                                  #Check if there is a box stuck on the stacker crane (mostly startup after homing)
-                if hb_crane_input != "Off" or hb_crane_output != "Off":                     #Check if the stacker crane is allowed to move
-                    while True:                                                             #Start a forever loop
-                        chosen_random_nr = choice(storage_locations)                        #Choose a random number (only locations in the rack are in this list)
-                        if wms_online_list[chosen_random_nr] == "No box present": break     #Check if the chosen location is free, if not reloop. If it is free, break out of the forever loop
-                    comm_list_uart.append(["update_request", chosen_random_nr, 3])          #The message is added to the UART communication waiting list for the ESP32
+                        job_queue_add(take_out_queue, chosen_random_box, "Automatic")       #Automatic jobs have the lowest priority, touchscreen requests go first
+                if hb_crane_output != "Off" and job_queue_length(take_out_queue) > 0:       #Check if there is a takeout request
+                    task_storage = job_queue_peek(take_out_queue)                           #The job with the highest priority (including the time it is waiting)
+                    job_started(take_out_queue, task_storage)
+                    queue_put(comm_list_uart, ["update_request", task_storage, 3])          #The message is added to the UART communication waiting list for the ESP32
+                    crane_order("Retrieve", task_storage, 0)                                #Start the crane function
+                    job_queue_remove(take_out_queue, task_storage)                          #Delete the task that was performed (if it was not cancelled in the meantime)
+            if outside_box[100] == False and outside_box[105] == False and job_queue_length(take_out_queue) == 0 and job_queue_length(bring_here_queue) == 0:  #No box to store and no open requests
+                if reslot_enabled == True and (hb_crane_input != "Off" or hb_crane_output != "Off") and timer_crane_idle.time() > reslot_idle_time:   #Only when the stacker crane has been idle for a while
+                    reslot_from, reslot_to = reslot_move()                                  #Find the box that gains the most by moving to a location with a shorter cycle time
+                    if reslot_from != -1:
+                        print("Re-slotting", wms_online_list[reslot_from], "from", reslot_from, "to", reslot_to)   #Print this feedback line when debugging
+                        crane_order("Move", reslot_from, reslot_to)                         #Start the crane function, 1 box at a time so a new request only waits for this move
+            if prepos_enabled == True and outside_box[100] == False and (hb_crane_input != "Off" or hb_crane_output != "Off") and timer_crane_idle.time() > prepos_idle_time:    #Parking the stacker crane when it is idle
+                park_pos = crane_park_target()                                              #The most likely next pickup position
+                if park_pos != -2 and park_pos != crane_position:                           #Only drive when the crane is not already there
+                    crane_parked    = True                                                  #The next order is measured as a parked one
+                    park_abort_sent = False
+                    crane_order("Manual", 0, park_pos)                                      #Start the crane function, the crane will drive without using the telescopic fork (status "Parking" until the crane is there)
+            if outside_box[100] == True:                                                    #Check if there is a box stuck on the stacker crane (mostly startup after homing)
+                if (hb_crane_input != "Off" or hb_crane_output != "Off") and check_rack_full() == False:   #Check if the stacker crane is allowed to move and has a free rack location to go to
+                    chosen_random_nr = free_storage_location(outside_name[100])             #Choose a free rack location with the put-away policy
+                    queue_put(comm_list_uart, ["update_request", chosen_random_nr, 3])      #The message is added to the UART communication waiting list for the ESP32
                     crane_order("Startup full", 0, chosen_random_nr)                        #Start the crane function
+        elif crane_status == "Parking" and park_abort_sent == False:                        #Check if an order can start while the stacker crane is still driving to its parking position
+            next_pickup = crane_next_pickup()
+            if next_pickup != -2 and next_pickup != crane_position:                         #The parking position is not where the order starts, stop driving there
+                queue_put(comm_list_crane, "Abort drive")                                   #The crane stops where it is and reports "Ready"
+                park_abort_sent = True
+                crane_parked    = False                                                     #The order is not measured as a parked one, the crane was not there
+                crane_position  = -2                                                        #The crane stops somewhere on the way
+        wait_event(crane_auto_events, event_seen, 500)                                      #Sleep until something changed, the timeout is for the output floor sensor and the idle timers
+
+
+def crane_park_target():                                                                    #Returns the most likely next pickup position for the stacker crane (-1 = chain conveyors, 0-59 = rack location), or -2 if there is no expected job
+    if outside_box[104] == True or outside_box[105] == True or outside_box[106] == True:    #A box is on its way to the input chain conveyor (location 104/106 -> 105)
+        return -1
+    if job_queue_length(take_out_queue) > 0 and hb_crane_output != "Off":                   #The next box to take out, waiting for the output chain conveyor to be free
+        return job_queue_peek(take_out_queue)
+    if hb_crane_input == "Automatic" or job_queue_length(bring_here_queue) > 0:             #The next job will most likely start with a box from the input chain conveyor
+        return -1
+    return -2
+
+
+def crane_next_pickup():                                                                    #Returns the first position of the order the stacker crane can start now (-1 = chain conveyors, 0-59 = rack location), or -2 if no order can start
+    if outside_box[105] == True and hb_crane_input != "Off": return -1                      #A box to store on the input chain conveyor
+    if job_queue_length(take_out_queue) > 0 and outside_box[101] == False and hb_crane_output != "Off": return job_queue_peek(take_out_queue)
+    return -2
+
+
+def measure_prepositioning(parked, order_time):                                             #Adding the measured time of 1 order to the totals of the parked or not parked orders, the averages are printed once every few orders
+    prepos_order_time[int(parked)] += order_time
+    prepos_orders[int(parked)]     += 1
+    if sum(prepos_orders) % prepos_report_every == 0:                                       #Print this feedback line when debugging
+        print("Average order time, not parked:", prepos_order_time[0] // max(prepos_orders[0], 1), "ms (%s orders), parked:"%prepos_orders[0], prepos_order_time[1] // max(prepos_orders[1], 1), "ms (%s orders)"%prepos_orders[1])
+
+
+def reslot_move():                                                                          #Returns [from location, to location] for the box that gains the most by moving closer to the chain conveyors, or [-1, -1] if no move is worth it
+    free_by_cost = [x for x in slots_by_cost if free_locations_idx[x] != -1]                #All free rack locations, from the shortest to the longest cycle time
+    if free_by_cost == []: return [-1, -1]
+    best_to   = free_by_cost[0]                                                             #Every box gains the most on the free location with the shortest cycle time
+    best_from = -1
+    best_gain = reslot_min_gain
+    for x in full_locations:                                                                #Frequently requested boxes gain the most, a box that is never requested gains nothing and stays where it is
+        gain = pick_counts.get(wms_online_list[x], 0) * (slot_costs[x] - slot_costs[best_to])
+        if gain > best_gain:
+            best_from = x
+            best_gain = gain
+    if best_from == -1: return [-1, -1]
+    return [best_from, best_to]
+
+
+def dual_command_retrieval(store_pos):                                                       #Returns the rack location to take out on the same trip after storing at store_pos, or -1 if no box can be taken out now
+    if outside_box[101] == True: return -1                                                  #The output chain conveyor (location 101) needs to be empty
+    if hb_crane_output != "Off" and job_queue_length(take_out_queue) > 0:                   #Check if there is a takeout request
+        return min(job_queue_same_priority(take_out_queue), key=lambda x: slot_move_time(store_pos, x, crane_lift_angles))  #Of the jobs with the highest priority, the location the stacker crane reaches the fastest from the store location
+    if (hb_crane_output == "Automatic" and job_queue_length(take_out_queue) == 0 ) or (hb_crane_output == "Manual" and job_queue_length(take_out_queue) == 0 and sens_output_floor.distance() < 60):    #Same rules as a single retrieve without a manual request
+        return full_storage_location()                                                      #Choose a random rack location that holds a box, -1 if the rack is empty
+    return -1
+
+
+def crane_store(store_pos):                                                                 #Storing the box from the input chain conveyor (location 105), and if possible take a box out on the same trip
+    retrieve_pos = dual_command_retrieval(store_pos)                                        #Find a box that can be taken out together with this store
+    if retrieve_pos == -1:
+        crane_order("Store", 0, store_pos)                                                  #Single command, the stacker crane only stores
+        return
+    if job_queued(take_out_queue, retrieve_pos): job_started(take_out_queue, retrieve_pos)
+    queue_put(comm_list_uart, ["update_request", retrieve_pos, 3])                          #The message is added to the UART communication waiting list for the ESP32
+    crane_order("Store and retrieve", retrieve_pos, store_pos)                              #Dual command, store and drive directly to the retrieve location
+    job_queue_remove(take_out_queue, retrieve_pos)                                          #Delete the takeout task that was performed (if it was a queued job)
+
+
+def check_rack_full():                                                                      #Returns True if the rack is full, and shows/removes the error on the touchscreen when this changes
+    global rack_full_error                                                                  #Using this global variable in this local function (if not defined to be global, it will make a local variable)
+
+    if rack_full() == True:
+        if rack_full_error == False:                                                        #Only send the error once, not every loop
+            rack_full_error = True
+            queue_put(comm_list_uart, ["update_mode", 1, "Rack full, input on hold"])       #The message is added to the UART communication waiting list for the ESP32
+        return True
+    if rack_full_error == True:                                                             #A location became free again, remove the error
+        rack_full_error = False
+        queue_put(comm_list_uart, ["update_mode", 0, "Rack full, input on hold"])           #The message is added to the UART communication waiting list for the ESP32
+    return False
+
+
+def wait_crane_status(status):                                                              #Sleeping until the stacker crane has sent this status
+    event_seen = event_state(["crane"])
+    while crane_status != status: event_seen = wait_event(["crane"], event_seen, 1000)
 
 
 def crane_order(task, pos_pickup, pos_dropoff):                                             #Executing a stacker crane movement
-    global outside_dict                                                                     #Using these global variables in this local function (if not defined to be global, it will make a local variable)
-    global crane_status
+    global crane_status                                                                     #Using these global variables in this local function (if not defined to be global, it will make a local variable)
+    global crane_position
+    global crane_parked
     print("Crane task: ",task, ". Pickup at: ", pos_pickup, ". Dropoff at: ", pos_dropoff)  #Print this feedback line when debugging
+    order_parked = crane_parked                                                             #Parking (Manual driving) is not an order itself, the order after it is measured as parked
+    if task != "Manual": crane_parked = False
+    timer_crane_order.reset()
 
     if task == "Startup full":                                                              #Check what the stacker crane needs to transfer, if a box is on the stacker crane after homing, store it
-        comm_list_crane.append("Startup ,%s"%pos_dropoff)                                   #Tell the crane the job is storing a leftover box into the warehouse. Start adding the dropoff location to the bluetooth command list for the stacker crane
-        while crane_status != "Dropped off": wait(50)                                       #Waiting for the crane to tell the box has been put in the warehouse, the crane is available for a new job now
-        change_one_wms_position(pos_dropoff, outside_dict["location100"]["name"])           #Perform the function that changes 1 WMS position and saves it online+offline
-        outside_dict["location100"]["name"] = "No box present"                              #Remove the name from the old location (location 100)
-        outside_dict["location100"]["box"]  = False                                         #Remove the present status from the old location (location 100)
+        queue_put(comm_list_crane, "Startup ,%s"%pos_dropoff)                               #Tell the crane the job is storing a leftover box into the warehouse. Start adding the dropoff location to the bluetooth command list for the stacker crane
+        wait_crane_status("Dropped off")                                                    #Waiting for the crane to tell the box has been put in the warehouse, the crane is available for a new job now
+        change_one_wms_position(pos_dropoff, outside_name[100])                             #Perform the function that changes 1 WMS position and saves it online+offline
+        set_outside_box(100, "No box present")                                              #Remove the name and the present status from the old location (location 100)
         save_outside_wms()                                                                  #Saving the offline WMS for machine parts and floor storage
-        comm_list_uart.append(["transport_pallet", 100, pos_dropoff])                       #The message is added to the UART communication waiting list for the ESP32
+        queue_put(comm_list_uart, ["transport_pallet", 100, pos_dropoff])                   #The message is added to the UART communication waiting list for the ESP32
 
 
     elif task == "Store":                                                                   #Check what the stacker crane needs to transfer, the box on location 105 needs to be stored in the racks
-        comm_list_crane.append("Store at ,%s"%pos_dropoff)                                  #Tell the crane the job is storing a box into the warehouse. Start adding the dropoff location to the bluetooth command list for the stacker crane
-        while crane_status != "Picked up": wait(50)                                         #Waiting for the crane to tell the box has been taken away from the input chain conveyor
-        outside_dict["location100"]["box"]  = True                                          #Set the box present at the new location (location 100)
-        outside_dict["location100"]["name"] = outside_dict["location105"]["name"]           #Transfer the name from the previous location to the new one (location 105 to 100)
-        outside_dict["location105"]["name"] = "No box present"                              #Remove the name from the old location (location 105)
-        outside_dict["location105"]["box"]  = False                                         #Remove the present status from the old location (location 105)
+        queue_put(comm_list_crane, "Store at ,%s"%pos_dropoff)                              #Tell the crane the job is storing a box into the warehouse. Start adding the dropoff location to the bluetooth command list for the stacker crane
+        wait_crane_status("Picked up")                                                      #Waiting for the crane to tell the box has been taken away from the input chain conveyor
+        move_outside_box(105, 100)                                                          #Transfer the box from the previous location to the new one (location 105 to 100)
         save_outside_wms()                                                                  #Saving the offline WMS for machine parts and floor storage
-        comm_list_uart.append(["transport_pallet", 105, 100])                               #The message is added to the UART communication waiting list for the ESP32
-        comm_list_chain.append("Reset")                                                     #A not used message is added to the bluetooth communication waiting list for the chain conveyor brick [To be able to call the real one multiple times if needed]
-        comm_list_chain.append("Chain in empty")                                            #Send to chain EV3 that the input chain conveyor is empty
-        while crane_status != "Dropped off": wait(50)                                       #Waiting for the crane to tell the box has been put in the warehouse, the crane is available for a new job now
-        change_one_wms_position(pos_dropoff, outside_dict["location100"]["name"])           #Perform the function that changes 1 WMS position and saves it online+offline
-        outside_dict["location100"]["name"] = "No box present"                              #Remove the name from the old location (location 100)
-        outside_dict["location100"]["box"]  = False                                         #Remove the present status from the old location (location 100)
+        queue_put(comm_list_uart, ["transport_pallet", 105, 100])                           #The message is added to the UART communication waiting list for the ESP32
+        queue_put(comm_list_chain, "Reset")                                                 #A not used message is added to the bluetooth communication waiting list for the chain conveyor brick [To be able to call the real one multiple times if needed]
+        queue_put(comm_list_chain, "Chain in empty")                                        #Send to chain EV3 that the input chain conveyor is empty
+        wait_crane_status("Dropped off")                                                    #Waiting for the crane to tell the box has been put in the warehouse, the crane is available for a new job now
+        change_one_wms_position(pos_dropoff, outside_name[100])                             #Perform the function that changes 1 WMS position and saves it online+offline
+        set_outside_box(100, "No box present")                                              #Remove the name and the present status from the old location (location 100)
         save_outside_wms()                                                                  #Saving the offline WMS for machine parts and floor storage
-        comm_list_uart.append(["transport_pallet", 100, pos_dropoff])                       #The message is added to the UART communication waiting list for the ESP32
+        queue_put(comm_list_uart, ["transport_pallet", 100, pos_dropoff])                   #The message is added to the UART communication waiting list for the ESP32
+
+    elif task == "Store and retrieve":                                                      #Check what the stacker crane needs to transfer, the box on location 105 needs to be stored and another box taken out to location 101 on the same trip
+        queue_put(comm_list_crane, "Store and retrieve ,%s,%s"%(pos_dropoff,pos_pickup))    #Tell the crane the job is storing a box and taking one out. Start adding the dropoff and pickup locations to the bluetooth command list for the stacker crane
+        wait_crane_status("Picked up")                                                      #Waiting for the crane to tell the box has been taken away from the input chain conveyor
+        move_outside_box(105, 100)                                                          #Transfer the box from the previous location to the new one (location 105 to 100)
+        save_outside_wms()                                                                  #Saving the offline WMS for machine parts and floor storage
+        queue_put(comm_list_uart, ["transport_pallet", 105, 100])                           #The message is added to the UART communication waiting list for the ESP32
+        queue_put(comm_list_chain, "Reset")                                                 #A not used message is added to the bluetooth communication waiting list for the chain conveyor brick [To be able to call the real one multiple times if needed]
+        queue_put(comm_list_chain, "Chain in empty")                                        #Send to chain EV3 that the input chain conveyor is empty
+        wait_crane_status("Dropped off")                                                    #Waiting for the crane to tell the box has been put in the warehouse, the store leg is finished
+        change_one_wms_position(pos_dropoff, outside_name[100])                             #Perform the function that changes 1 WMS position and saves it online+offline
+        set_outside_box(100, "No box present")                                              #Remove the name and the present status from the old location (location 100)
+        save_outside_wms()                                                                  #Saving the offline WMS for machine parts and floor storage
+        queue_put(comm_list_uart, ["transport_pallet", 100, pos_dropoff])                   #The message is added to the UART communication waiting list for the ESP32
+        wait_crane_status("Picked up")                                                      #Waiting for the crane to tell the box has been taken out of the rack, the retrieve leg started without driving back
+        set_outside_box(100, wms_online_list[pos_pickup])                                   #Transfer the name from the previous location to the new one (location 0-59 to 100) and set the box present
+        count_pick(outside_name[100])                                                       #1 more retrieval for this box name
+        change_one_wms_position(pos_pickup, "No box present")                               #Perform the function that changes 1 WMS position and saves it online+offline
+        save_outside_wms()                                                                  #Saving the offline WMS for machine parts and floor storage
+        queue_put(comm_list_uart, ["transport_pallet", pos_pickup, 100])                    #The message is added to the UART communication waiting list for the ESP32
+        wait_crane_status("Dropped off")                                                    #Waiting for the crane to tell the box has been put on the output chain conveyor, the crane is available for a new job now
+        move_outside_box(100, 101)                                                          #Transfer the box from the previous location to the new one (location 100 to 101)
+        save_outside_wms()                                                                  #Saving the offline WMS for machine parts and floor storage
+        queue_put(comm_list_uart, ["transport_pallet", 100, 101])                           #The message is added to the UART communication waiting list for the ESP32
+        queue_put(comm_list_chain, "Chain out full")                                        #Send to chain EV3 that the output chain conveyor is full
+        queue_put(comm_list_chain, "Emptying mailbox")                                      #Clearing the mailbox for potential same command send later
 
     elif task == "Retrieve":                                                                #Check what the stacker crane needs to transfer, a box in the rack needs to be taken out to location 101
-        comm_list_crane.append("Retrieve at ,%s"%pos_pickup)                                #Tell the crane the job is taking a box from the warehouse. Start adding the pickup location to the bluetooth command list for the stacker crane
-        while crane_status != "Picked up": wait(50)                                         #Waiting for the crane to tell the box has been taken away from the input chain conveyor
-        outside_dict["location100"]["box"]  = True                                          #Set the box present at the new location (location 100)
-        outside_dict["location100"]["name"] = wms_online_list[pos_pickup]                   #Transfer the name from the previous location to the new one (location 0-59 to 100)
+        queue_put(comm_list_crane, "Retrieve at ,%s"%pos_pickup)                            #Tell the crane the job is taking a box from the warehouse. Start adding the pickup location to the bluetooth command list for the stacker crane
+        wait_crane_status("Picked up")                                                      #Waiting for the crane to tell the box has been taken away from the input chain conveyor
+        set_outside_box(100, wms_online_list[pos_pickup])                                   #Transfer the name from the previous location to the new one (location 0-59 to 100) and set the box present
+        count_pick(outside_name[100])                                                       #1 more retrieval for this box name
         change_one_wms_position(pos_pickup, "No box present")                               #Perform the function that changes 1 WMS position and saves it online+offline
         save_outside_wms()                                                                  #Saving the offline WMS for machine parts and floor storage
-        comm_list_uart.append(["transport_pallet", pos_pickup, 100])                        #The message is added to the UART communication waiting list for the ESP32
-        while crane_status != "Dropped off": wait(50)                                       #Waiting for the crane to tell the box has been put in the warehouse, the crane is available for a new job now
-        outside_dict["location101"]["box"]  = True                                          #Set the box present at the new location (location 101)
-        outside_dict["location101"]["name"] = outside_dict["location100"]["name"]           #Transfer the name from the previous location to the new one (location 100 to 101)
-        outside_dict["location100"]["name"] = "No box present"                              #Remove the name from the old location (location 100)
-        outside_dict["location100"]["box"]  = False                                         #Remove the present status from the old location (location 100)
+        queue_put(comm_list_uart, ["transport_pallet", pos_pickup, 100])                    #The message is added to the UART communication waiting list for the ESP32
+        wait_crane_status("Dropped off")                                                    #Waiting for the crane to tell the box has been put in the warehouse, the crane is available for a new job now
+        move_outside_box(100, 101)                                                          #Transfer the box from the previous location to the new one (location 100 to 101)
         save_outside_wms()                                                                  #Saving the offline WMS for machine parts and floor storage
-        comm_list_uart.append(["transport_pallet", 100, 101])                               #The message is added to the UART communication waiting list for the ESP32
-        comm_list_chain.append("Chain out full")                                            #Send to chain EV3 that the output chain conveyor is full
-        comm_list_chain.append("Emptying mailbox")                                          #Clearing the mailbox for potential same command send later
-
-    elif task == "Move":                                                                    #Check what the stacker crane needs to transfer, a box needs to be stored on another place in the racks TODO[Not used yet]
-        comm_list_crane.append("Move between ,%s,%s"%(pos_pickup,pos_dropoff))              #Tell the crane the job is moving a box in the warehouse. Start adding the pickup and dropoff locations to the bluetooth command list for the stacker crane
-        while crane_status != "Picked up": wait(50)                                         #Waiting for the crane to tell the box has been taken away from the input chain conveyor
-        outside_dict["location100"]["box"]  = True                                          #Set the box present at the new location (location 100)
-        outside_dict["location100"]["name"] = wms_online_list[pos_pickup]                   #Transfer the name from the previous location to the new one (location 0-59 to 100)
+        queue_put(comm_list_uart, ["transport_pallet", 100, 101])                           #The message is added to the UART communication waiting list for the ESP32
+        queue_put(comm_list_chain, "Chain out full")                                        #Send to chain EV3 that the output chain conveyor is full
+        queue_put(comm_list_chain, "Emptying mailbox")                                      #Clearing the mailbox for potential same command send later
+
+    elif task == "Move":                                                                    #Check what the stacker crane needs to transfer, a box needs to be stored on another place in the racks (re-slotting)
+        queue_put(comm_list_crane, "Move between ,%s,%s"%(pos_pickup,pos_dropoff))          #Tell the crane the job is moving a box in the warehouse. Start adding the pickup and dropoff locations to the bluetooth command list for the stacker crane
+        wait_crane_status("Picked up")                                                      #Waiting for the crane to tell the box has been taken away from the input chain conveyor
+        set_outside_box(100, wms_online_list[pos_pickup])                                   #Transfer the name from the previous location to the new one (location 0-59 to 100) and set the box present
         change_one_wms_position(pos_pickup, "No box present")                               #Perform the function that changes 1 WMS position and saves it online+offline
         save_outside_wms()                                                                  #Saving the offline WMS for machine parts and floor storage
-        comm_list_uart.append(["transport_pallet", pos_pickup, 100])                        #The message is added to the UART communication waiting list for the ESP32
-        while crane_status != "Dropped off": wait(50)                                       #Waiting for the crane to tell the box has been put in the warehouse, the crane is available for a new job now
-        change_one_wms_position(pos_dropoff, outside_dict["location100"]["name"])           #Perform the function that changes 1 WMS position and saves it online+offline
-        outside_dict["location100"]["name"] = "No box present"                              #Remove the name from the old location (location 100)
-        outside_dict["location100"]["box"]  = False                                         #Remove the present status from the old location (location 100)
+        queue_put(comm_list_uart, ["transport_pallet", pos_pickup, 100])                    #The message is added to the UART communication waiting list for the ESP32
+        wait_crane_status("Dropped off")                                                    #Waiting for the crane to tell the box has been put in the warehouse, the crane is available for a new job now
+        change_one_wms_position(pos_dropoff, outside_name[100])                             #Perform the function that changes 1 WMS position and saves it online+offline
+        set_outside_box(100, "No box present")                                              #Remove the name and the present status from the old location (location 100)
         save_outside_wms()                                                                  #Saving the offline WMS for machine parts and floor storage
-        comm_list_uart.append(["transport_pallet", 100, pos_dropoff])                       #The message is added to the UART communication waiting list for the ESP32
+        queue_put(comm_list_uart, ["transport_pallet", 100, pos_dropoff])                   #The message is added to the UART communication waiting list for the ESP32
 
-    elif task == "Manual":                                                                  #Check what the stacker crane needs to transfer, this one is for manually driving to a location, without using the telescopic fork TODO[Not used yet]
-        comm_list_crane.append("Drive to ,%s"%pos_dropoff)                                  #Tell the crane the job is moving to a location in the warehouse
+    elif task == "Manual":                                                                  #Check what the stacker crane needs to transfer, this one is for driving to a location without using the telescopic fork (parking)
+        crane_status = "Parking"                                                            #No new order is started before the crane reports "Ready", unless the drive is aborted
+        queue_put(comm_list_crane, "Drive to ,%s"%pos_dropoff)                              #Tell the crane the job is moving to a location in the warehouse
+
+    if task == "Retrieve" or task == "Store and retrieve": crane_position = -1              #The last dropoff was on the output chain conveyor
+    else:                                                  crane_position = pos_dropoff
+    timer_crane_idle.reset()                                                                #The stacker crane is idle from now on, until the next order
+    if task != "Manual": measure_prepositioning(order_parked, timer_crane_order.time())     #The real time of this order, from sending it until the crane is finished
     
 
+floor_zone_costs = build_zone_costs()                                                       #Robot path cost (steps + weighted mm) for every floor zone, built from the taught waypoints in Warehouse_Robot_Paths (rebuilt at every startup)
+
 def full_floor_spaces(mode):                                                                #This function checks if there is free dropoff place and returns the location, or returns the amount of occupied places
     counter = 0                                                                             #Defining local variables
     empty_places = []
 
     for i in range(floor_storage_space):                                                    #Check every floor storage location (locations 110,111,112,113,114)
-        if outside_dict["location%s"%positions[-floor_storage_space+i]]["box"] == True:     #If there is a box on this location
+        if outside_box[positions[-floor_storage_space+i]] == True:                          #If there is a box on this location
             counter +=1                                                                     #Add 1 to the local counter
         elif mode == "freespace": empty_places.append(positions[-floor_storage_space+i])    #If there is no box and the function mode is searching for a free spot, add this location to the local list
-    if mode == "freespace": return choice(empty_places)                                     #If the mode is searching for a free location, choose a random one from all the free locations and return the value (locations 110,111,112,113,114)
+    if mode == "freespace": return min(empty_places, key=lambda x: floor_zone_costs[x])     #If the mode is searching for a free location, return the free location the robot reaches fastest (locations 110,111,112,113,114)
     counter += inbound                                                                      #If the mode was normal, add to the occupied locations the amount of boxes still being inbound
     return counter                                                                          #Return the amount of occupied floor storage places
 
@@ -710,34 +1492,33 @@ def full_floor_spaces(mode):
 def scissor_robot_operation():                                                              #Executing a scissorlift to 6DOF or reverse movement
     global inbound                                                                          #Using these global variables in this local function (if not defined to be global, it will make a local variable)
     global outbound
-    global floor_takeout_list
+    global floor_takeout_queue
     global conveyors
+    global robot_batch
+    global robot_status
       
     if inbound > 0:                                                                         #Check if the task is taking a box from the scissorlift to the floor
-        comm_list_chain.append("Scissor is up")                                             #A message is added to the bluetooth communication waiting list for the chain conveyor brick that the scissor is no more down
+        queue_put(comm_list_chain, "Scissor is up")                                         #A message is added to the bluetooth communication waiting list for the chain conveyor brick that the scissor is no more down
         check_emergency_stop("Conveyors")                                                   #Check if a movement is allowed to start
-        while scissorlift.angle() < outside_dict["location106"]["liftheight"] - 50:         #Start a loop until the scissorlift is near 50degrees of finishing the rotation
-            scissorlift.run_target(max_speed_scissorlift * max_speed_scissorlift_adj, outside_dict["location106"]["liftheight"], then=Stop.COAST, wait=False)  #Send the scissorlift motor run to the target command, don't wait for finishing
-            while scissorlift.angle() < outside_dict["location106"]["liftheight"] - 50:     #Start a loop until the scissorlift is near 50degrees of finishing the rotation
+        while scissorlift.angle() < outside_liftheight[106] - 50:                           #Start a loop until the scissorlift is near 50degrees of finishing the rotation
+            scissorlift.run_target(max_speed_scissorlift * max_speed_scissorlift_adj, outside_liftheight[106], then=Stop.COAST, wait=False)  #Send the scissorlift motor run to the target command, don't wait for finishing
+            while scissorlift.angle() < outside_liftheight[106] - 50:                       #Start a loop until the scissorlift is near 50degrees of finishing the rotation
                 if emergency_stop == True or conveyors == "Off":                            #If during this loop an emergency stop occurs or the conveyors are turned off
                     scissorlift.stop()                                                      #Stop the scissorlift
                     check_emergency_stop("Conveyors")                                       #Check if a movement is allowed to start
                     break                                                                   #Close this loop, so the motor will restart again
-        comm_list_robot.append("Scissor is up")                                             #A message is added to the bluetooth communication waiting list for the robot brick that the scissor is up and ready for pickup (location 106)
+        queue_put(comm_list_robot, "Scissor is up")                                         #A message is added to the bluetooth communication waiting list for the robot brick that the scissor is up and ready for pickup (location 106)
         while robot_status != "Ready": wait(100)                                            #Wait for the robot to be finished with the previous task (location 107)
-        outside_dict["location107"]["liftposition"] = "performing task"                     #Set the robot dictionary to no more ready, but performing a task now
+        outside_liftposition[107] = "performing task"                                       #Set the robot location to no more ready  , but performing a task now
         wait(100)                                                                           #TODO check if this wait is needed?
         dropoff_loc = full_floor_spaces("freespace")                                        #Request this function to return a free storage place location (locations 110,111,112,113,114)
         command_robot = "Scissor standard to zone {}"                                       #Make a local variable with a string to format TODO delete this variable, this was before I learned about %s formatting
         print(command_robot.format(dropoff_loc))                                            #Print this feedback line when debugging
-        comm_list_robot.append(command_robot.format(dropoff_loc))                           #A message is added to the bluetooth communication waiting list for the robot brick where to dropoff the box (location 110,111,112,113,114)
+        queue_put(comm_list_robot, command_robot.format(dropoff_loc))                       #A message is added to the bluetooth communication waiting list for the robot brick where to dropoff the box (location 110,111,112,113,114)
         while robot_status != "Picked up": wait(50)                                         #Wait for the robot to be finished with the pickup (location 106 to 107)
-        outside_dict["location107"]["name"] = outside_dict["location106"]["name"]           #Transfer the name from the previous location to the new one (location 106 to 107)
-        outside_dict["location107"]["box"]  = True                                          #Set the box present at the new location (location 107)
-        outside_dict["location106"]["name"] = "No box present"                              #Remove the name from the old location (location 106)
-        outside_dict["location106"]["box"]  = False                                         #Remove the present status from the old location (location 106)
+        move_outside_box(106, 107)                                                          #Transfer the box from the previous location to the new one (location 106 to 107)
         save_outside_wms()                                                                  #Saving the offline WMS for machine parts and floor storage
-        comm_list_uart.append(["transport_pallet", 106, 107])                               #The message is added to the UART communication waiting list for the ESP32
+        queue_put(comm_list_uart, ["transport_pallet", 106, 107])                           #The message is added to the UART communication waiting list for the ESP32
         check_emergency_stop("Conveyors")                                                   #Check if a movement is allowed to start
         while scissorlift.angle() > 50:                                                     #Start a loop until the scissorlift is near 50degrees of finishing the rotation
             scissorlift.run_target(max_speed_scissorlift * max_speed_scissorlift_adj, 0, then=Stop.COAST, wait=False)   #Send the scissorlift motor run to the target command, don't wait for finishing
@@ -746,88 +1527,87 @@ def scissor_robot_operation():
                     scissorlift.stop()                                                      #Stop the scissorlift
                     check_emergency_stop("Conveyors")                                       #Check if a movement is allowed to start
                     break                                                                   #Close this loop, so the motor will restart again
-        outside_dict["location106"]["liftposition"] = "ready down"                          #Change the scissorlift position from up to down
-        comm_list_robot.append("Scissor is down")                                           #A message is added to the bluetooth communication waiting list for the robot brick that the scissor is down (location 106)
-        comm_list_chain.append("Scissor is down")                                           #A message is added to the bluetooth communication waiting list for the chain conveyor brick that the scissor is down (location 106)
-        comm_list_chain.append("Scissor empty")                                             #A message is added to the bluetooth communication waiting list for the chain conveyor brick that the scissor ready for new input (location 106)
+        outside_liftposition[106] = "ready down"                                            #Change the scissorlift position from up to down
+        queue_put(comm_list_robot, "Scissor is down")                                       #A message is added to the bluetooth communication waiting list for the robot brick that the scissor is down (location 106)
+        queue_put(comm_list_chain, "Scissor is down")                                       #A message is added to the bluetooth communication waiting list for the chain conveyor brick that the scissor is down (location 106)
+        queue_put(comm_list_chain, "Scissor empty")                                         #A message is added to the bluetooth communication waiting list for the chain conveyor brick that the scissor ready for new input (location 106)
         while robot_status != "Ready": wait(50)                                             #Wait for the robot to be finished with the previous task (location 107)
-        outside_dict["location%s"%dropoff_loc]["dropofftime"]   = math.floor(timer_floors.time() / 1000)    #Adding to the floor location dictionary the time when it was put down on the floor (seconds)
-        outside_dict["location%s"%dropoff_loc]["name"]          = outside_dict["location107"]["name"]       #Transfer the name from the previous location to the new one (location 107 to 110,111,112,113,114)
-        outside_dict["location107"]["name"]                     = "No box present"          #Remove the name from the old location (location ...)
-        outside_dict["location%s"%dropoff_loc]["box"]           = True                      #Set the box present at the new location (location 110,111,112,113,114)
-        outside_dict["location107"]["box"]                      = False                     #Remove the present status from the old location (location 107)
+        outside_dropofftime[dropoff_loc] = math.floor(timer_floors.time() / 1000)           #Adding to the floor location the time            when it was put down on the floor (seconds)
+        move_outside_box(107, dropoff_loc)                                                  #Transfer the box from the previous location to the new one (location 107 to 110,111,112,113,114)
         save_outside_wms()                                                                  #Saving the offline WMS for machine parts and floor storage
-        comm_list_uart.append(["transport_pallet", 107, dropoff_loc])                       #The message is added to the UART communication waiting list for the ESP32
+        queue_put(comm_list_uart, ["transport_pallet", 107, dropoff_loc])                   #The message is added to the UART communication waiting list for the ESP32
         inbound -= 1                                                                        #Set 1 less box going to the robot floor storage
     elif outbound > 0:                                                                      #Check if the task is taking a box from the floor to the scissorlift
-        command_robot = "Zone {} to scissor standard"                                       #Make a local variable with a string to format TODO delete this variable, this was before I learned about %s formatting
-        print(command_robot.format(floor_takeout_list[0]))                                  #Print this feedback line when debugging
+        robot_batch = job_queue_batch(floor_takeout_queue, robot_batch_size)                #The floor locations with the highest priority (including the time they are waiting)
+        for x in robot_batch: job_started(floor_takeout_queue, x)
+        if len(robot_batch) > 1: command_robot = "Zones to scissor standard: %s" % ",".join([str(x) for x in robot_batch])    #The robot drives from the scissor directly to the next zone
+        else: command_robot = "Zone %s to scissor standard" % robot_batch[0]
+        print(command_robot)                                                                #Print this feedback line when debugging
         if outbound > 1: wait(1500)                                                         #Waiting for some reason TODO This was added, removed and had to readd, don't know why 500ms was not enough
-        comm_list_robot.append(command_robot.format(floor_takeout_list[0]))                 #A message is added to the bluetooth communication waiting list for the robot brick where to pickup the box (location 110,111,112,113,114)
-        while outside_dict["location106"]["box"] == True: wait(100)                         #Wait for the scissorlift to be empty (location 106)
-        outside_dict["location106"]["liftposition"] = "moving up"                           #Change the scissorlift position from down to moving
-        comm_list_chain.append("Scissor is up")                                             #A message is added to the bluetooth communication waiting list for the chain conveyor brick that the scissor is up (location 106)
-        comm_list_chain.append("Prepare input 6dof")                                        #A message is added to the bluetooth communication waiting list for the chain conveyor brick that the scissor preparing for a new box to be taken to the rack (location 106)
-        check_emergency_stop("Conveyors")                                                   #Check if a movement is allowed to start
-        while scissorlift.angle() < outside_dict["location106"]["liftheight"] - 250 - 50:   #Start a loop until the scissorlift is near 50degrees of finishing the rotation (dropoff is 250 lower than pickup)
-            scissorlift.run_target(max_speed_scissorlift * max_speed_scissorlift_adj, outside_dict["location106"]["liftheight"] - 250, then=Stop.COAST, wait=False) #Send the scissorlift motor run to the target command, don't wait for finishing (dropoff is 250 lower than pickup)
-            while scissorlift.angle() < outside_dict["location106"]["liftheight"] - 250 - 50:   #Start a loop until the scissorlift is near 50degrees of finishing the rotation (dropoff is 250 lower than pickup)
-                if emergency_stop == True or conveyors == "Off":                            #If during this loop an emergency stop occurs or the conveyors are turned off
-                    scissorlift.stop()                                                      #Stop the scissorlift
-                    check_emergency_stop("Conveyors")                                       #Check if a movement is allowed to start
-                    break                                                                   #Close this loop, so the motor will restart again
-        comm_list_robot.append("Scissor is up")                                             #A message is added to the bluetooth communication waiting list for the robot brick that the scissor is up and ready for dropoff (location 106)
-        while robot_status != "Picked up": wait(50)                                         #Wait for the robot to be finished with the previous task (location 107)
-        outside_dict["location%s"%floor_takeout_list[0]]["dropofftime"] = 99999             #Reset to the floor location dictionary the time when it was put down on the floor (seconds 99999)
-        outside_dict["location%s"%floor_takeout_list[0]]["box"]         = False             #Remove the present status from the old location (location 110,111,112,113,114)
-        outside_dict["location107"]["name"]                             = outside_dict["location%s"%floor_takeout_list[0]]["name"]  #Transfer the name from the previous location to the new one (location 110,111,112,113,114 to 107)
-        outside_dict["location107"]["box"]                              = True              #Set the box present at the new location (location 107)
-        outside_dict["location%s"%floor_takeout_list[0]]["name"]        = "No box present"  #Remove the name from the old location (floor location 110,111,112,113,114)
-        save_outside_wms()                                                                  #Saving the offline WMS for machine parts and floor storage
-        comm_list_uart.append(["transport_pallet", floor_takeout_list[0], 107])             #The message is added to the UART communication waiting list for the ESP32
-        floor_takeout_list.pop(0)                                                           #Delete the task that was performed
-        while robot_status != "Ready": wait(50)                                             #Wait for the robot to be finished with the previous task (location 107)
-        outside_dict["location106"]["name"]                             = outside_dict["location107"]["name"]   #Transfer the name from the previous location to the new one (location 107 to 106)
-        outside_dict["location107"]["name"]                             = "No box present"  #Remove the name from the old location (location 107)
-        outside_dict["location107"]["box"]                              = False             #Remove the present status from the old location (location 107)
-        outside_dict["location106"]["box"]                              = True              #Set the box present at the new location (location 106)
-        save_outside_wms()                                                                  #Saving the offline WMS for machine parts and floor storage
-        comm_list_uart.append(["transport_pallet", 107, 106])                               #The message is added to the UART communication waiting list for the ESP32
-        check_emergency_stop("Conveyors")                                                   #Check if a movement is allowed to start
-        comm_list_robot.append("Scissor is down")                                           #A message is added to the bluetooth communication waiting list for the robot brick that the scissor is down (location 106)
-        comm_list_chain.append("Input from scissor")                                        #A message is added to the bluetooth communication waiting list for the chain conveyor brick that the scissor preparing for a new box to be taken to the rack (location 106)
-        while scissorlift.angle() > 50:                                                     #Start a loop until the scissorlift is near 50degrees of finishing the rotation
-            scissorlift.run_target(max_speed_scissorlift * max_speed_scissorlift_adj, 0, then=Stop.COAST, wait=False)   #Send the scissorlift motor run to the target command, don't wait for finishing
+        queue_put(comm_list_robot, command_robot)                                           #A message is added to the bluetooth communication waiting list for the robot brick where to pickup the box (location 110,111,112,113,114)
+        while robot_batch != []:                                                            #This thread handles every box of the batch, no new thread is started before the batch is finished
+            floor_job = robot_batch[0]                                                      #The floor location the robot picks up now
+            while outside_box[106] == True: wait(100)                                       #Wait for the scissorlift to be empty (location 106)
+            outside_liftposition[106] = "moving up"                                         #Change the scissorlift position from down to moving
+            queue_put(comm_list_chain, "Scissor is up")                                     #A message is added to the bluetooth communication waiting list for the chain conveyor brick that the scissor is up (location 106)
+            queue_put(comm_list_chain, "Prepare input 6dof")                                #A message is added to the bluetooth communication waiting list for the chain conveyor brick that the scissor preparing for a new box to be taken to the rack (location 106)
+            check_emergency_stop("Conveyors")                                               #Check if a movement is allowed to start
+            while scissorlift.angle() < outside_liftheight[106] - 250 - 50:                 #Start a loop until the scissorlift is near 50degrees of finishing the rotation (dropoff is 250 lower than pickup)
+                scissorlift.run_target(max_speed_scissorlift * max_speed_scissorlift_adj, outside_liftheight[106] - 250, then=Stop.COAST, wait=False) #Send the scissorlift motor run to the target command, don't wait for finishing (dropoff is 250 lower than pickup)
+                while scissorlift.angle() < outside_liftheight[106] - 250 - 50:             #Start a loop until the scissorlift is near 50degrees of finishing the rotation (dropoff is 250 lower than pickup)
+                    if emergency_stop == True or conveyors == "Off":                        #If during this loop an emergency stop occurs or the conveyors are turned off
+                        scissorlift.stop()                                                  #Stop the scissorlift
+                        check_emergency_stop("Conveyors")                                   #Check if a movement is allowed to start
+                        break                                                               #Close this loop, so the motor will restart again
+            queue_put(comm_list_robot, "Scissor is up")                                     #A message is added to the bluetooth communication waiting list for the robot brick that the scissor is up and ready for dropoff (location 106)
+            while robot_status != "Picked up": wait(50)                                     #Wait for the robot to be finished with the previous task (location 107)
+            outside_dropofftime[floor_job] = 99999                                          #Reset to the floor location the time            when it was put down on the floor (seconds 99999)
+            move_outside_box(floor_job, 107)                                                #Transfer the box from the previous location to the new one (location 110,111,112,113,114 to 107)
+            save_outside_wms()                                                              #Saving the offline WMS for machine parts and floor storage
+            queue_put(comm_list_uart, ["transport_pallet", floor_job, 107])                 #The message is added to the UART communication waiting list for the ESP32
+            job_queue_remove(floor_takeout_queue, floor_job)                                #Delete the task that was performed
+            robot_batch.pop(0)                                                              #The next pass waits for the next box of the batch
+            while robot_status != "Ready": wait(50)                                         #Wait for the robot to be finished with the previous task (location 107)
+            move_outside_box(107, 106)                                                      #Transfer the box from the previous location to the new one (location 107 to 106)
+            save_outside_wms()                                                              #Saving the offline WMS for machine parts and floor storage
+            queue_put(comm_list_uart, ["transport_pallet", 107, 106])                       #The message is added to the UART communication waiting list for the ESP32
+            check_emergency_stop("Conveyors")                                               #Check if a movement is allowed to start
+            queue_put(comm_list_robot, "Scissor is down")                                   #A message is added to the bluetooth communication waiting list for the robot brick that the scissor is down (location 106)
+            if robot_batch != []:                                                           #The robot waits at the next zone of the batch until it gets this message, so its next "Picked up" is always for the next box
+                robot_status = "Performing task"                                            #Set the robot status to a busy state
+                queue_put(comm_list_robot, "Next zone go")                                  #A message is added to the bluetooth communication waiting list for the robot brick that it can take the next box to the scissor
+            queue_put(comm_list_chain, "Input from scissor")                                #A message is added to the bluetooth communication waiting list for the chain conveyor brick that the scissor preparing for a new box to be taken to the rack (location 106)
             while scissorlift.angle() > 50:                                                 #Start a loop until the scissorlift is near 50degrees of finishing the rotation
-                if emergency_stop == True or conveyors == "Off":                            #If during this loop an emergency stop occurs or the conveyors are turned off
-                    scissorlift.stop()                                                      #Stop the scissorlift
-                    check_emergency_stop("Conveyors")                                       #Check if a movement is allowed to start
-                    break                                                                   #Close this loop, so the motor will restart again
-        outside_dict["location106"]["liftposition"] = "ready down"                          #Change the scissorlift position from up to down
-        comm_list_chain.append("Scissor is down")                                           #A message is added to the bluetooth communication waiting list for the chain conveyor brick that the scissor is down (location 106)
-        wait(50)                                                                            #TODO is this wait still needed?
-        while outside_dict["location106"]["box"] == True: wait(100)                         #Wait for the scissorlift to be empty (location 106)
+                scissorlift.run_target(max_speed_scissorlift * max_speed_scissorlift_adj, 0, then=Stop.COAST, wait=False)   #Send the scissorlift motor run to the target command, don't wait for finishing
+                while scissorlift.angle() > 50:                                             #Start a loop until the scissorlift is near 50degrees of finishing the rotation
+                    if emergency_stop == True or conveyors == "Off":                        #If during this loop an emergency stop occurs or the conveyors are turned off
+                        scissorlift.stop()                                                  #Stop the scissorlift
+                        check_emergency_stop("Conveyors")                                   #Check if a movement is allowed to start
+                        break                                                               #Close this loop, so the motor will restart again
+            outside_liftposition[106] = "ready down"                                        #Change the scissorlift position from up to down
+            queue_put(comm_list_chain, "Scissor is down")                                   #A message is added to the bluetooth communication waiting list for the chain conveyor brick that the scissor is down (location 106)
+            wait(50)                                                                        #TODO is this wait still needed?
+            while outside_box[106] == True: wait(100)                                       #Wait for the scissorlift to be empty (location 106)
         if outbound > 0: outbound -= 1                                                      #Set 1 less box coming from the robot floor storage
 
 
 def scissor_lift_operation():                                                               #TODO This function is used only once at startup, is it needed?
-    global outside_dict                                                                     #Using these global variables in this local function (if not defined to be global, it will make a local variable)
-    global conveyors
+    global conveyors                                                                        #Using these global variables in this local function (if not defined to be global, it will make a local variable)
 
-    if robot_used == True or (robot_used == False and outside_dict["location104"]["box"] == True):  #If the robot is used or if there is a box on the input roll conveyor
-        comm_list_chain.append("Scissor is up")                                             #A message is added to the bluetooth communication waiting list for the chain conveyor brick that the scissor is up (location 106)
+    if robot_used == True or (robot_used == False and outside_box[104] == True):            #If the robot is used or if there is a box on the input roll conveyor
+        queue_put(comm_list_chain, "Scissor is up")                                         #A message is added to the bluetooth communication waiting list for the chain conveyor brick that the scissor is up (location 106)
         check_emergency_stop("Conveyors")                                                   #Check if a movement is allowed to start
-        while scissorlift.angle() < outside_dict["location106"]["liftheight"] - 50:         #Start a loop until the scissorlift is near 50degrees of finishing the rotation
-            scissorlift.run_target(max_speed_scissorlift * max_speed_scissorlift_adj, outside_dict["location106"]["liftheight"], then=Stop.COAST, wait=False)   #Send the scissorlift motor run to the target command, don't wait for finishing
-            while scissorlift.angle() < outside_dict["location106"]["liftheight"] - 50:     #Start a loop until the scissorlift is near 50degrees of finishing the rotation
+        while scissorlift.angle() < outside_liftheight[106] - 50:                           #Start a loop until the scissorlift is near 50degrees of finishing the rotation
+            scissorlift.run_target(max_speed_scissorlift * max_speed_scissorlift_adj, outside_liftheight[106], then=Stop.COAST, wait=False)   #Send the scissorlift motor run to the target command, don't wait for finishing
+            while scissorlift.angle() < outside_liftheight[106] - 50:                       #Start a loop until the scissorlift is near 50degrees of finishing the rotation
                     if emergency_stop == True or conveyors == "Off":                        #If during this loop an emergency stop occurs or the conveyors are turned off
                         scissorlift.stop()                                                  #Stop the scissorlift
                         check_emergency_stop("Conveyors")                                   #Check if a movement is allowed to start
                         break                                                               #Close this loop, so the motor will restart again
-        outside_dict["location106"]["liftposition"] = "ready up"                            #Change the scissorlift position from down to up
+        outside_liftposition[106] = "ready up"                                              #Change the scissorlift position from down to up
 
     if robot_used == False:                                                                 #If the robot is being used
-        while outside_dict["location104"]["box"] == True: wait(200)                         #Wait while there is a box on the input roll conveyor
+        while outside_box[104] == True: wait(200)                                           #Wait while there is a box on the input roll conveyor
         check_emergency_stop("Conveyors")                                                   #Check if a movement is allowed to start
         while scissorlift.angle() > 0:                                                      #Start a loop until the scissorlift is down
             scissorlift.run_target(max_speed_scissorlift * max_speed_scissorlift_adj, 0, then=Stop.COAST, wait=False)   #Send the scissorlift motor run to the target command, don't wait for finishing
@@ -836,13 +1616,33 @@ def scissor_lift_operation():
                     scissorlift.stop()                                                      #Stop the scissorlift
                     check_emergency_stop("Conveyors")                                       #Check if a movement is allowed to start
                     break                                                                   #Close this loop, so the motor will restart again           
-        outside_dict["location106"]["liftposition"] = "ready down"                          #Change the scissorlift position from up to down
-        comm_list_chain.append("Scissor is down")                                           #A message is added to the bluetooth communication waiting list for the chain conveyor brick that the scissor is down (location 106)
+        outside_liftposition[106] = "ready down"                                            #Change the scissorlift position from up to down
+        queue_put(comm_list_chain, "Scissor is down")                                       #A message is added to the bluetooth communication waiting list for the chain conveyor brick that the scissor is down (location 106)
 
 
-def bluetooth_receiver():                                                                   #A loop that checks if there are new bluetooth commands incoming
-    global outside_dict                                                                     #Using these global variables in this local function (if not defined to be global, it will make a local variable)
-    global crane_status
+def chain_link_sender():                                                                    #A loop that hands the chain communication waiting list to its link and sends/receives on it at its own pace, a slow link does not hold up the others
+    while True:                                                                             #Start a forever loop
+        if chain_status != "Homing": link_send_list(chain_link, comm_list_chain)            #Hand the waiting messages to the link, a brick that is still homing gets them after homing
+        link_poll(chain_link)                                                               #Receive, acknowledge and (re)send messages on this link
+        wait(chain_link["pace"])
+
+
+def crane_link_sender():                                                                    #A loop that hands the crane communication waiting list to its link and sends/receives on it at its own pace
+    while True:
+        if crane_status != "Homing": link_send_list(crane_link, comm_list_crane)
+        link_poll(crane_link)
+        wait(crane_link["pace"])
+
+
+def robot_link_sender():                                                                    #A loop that hands the robot communication waiting list to its link and sends/receives on it at its own pace
+    while True:
+        if robot_status != "Homing": link_send_list(robot_link, comm_list_robot)
+        link_poll(robot_link)
+        wait(robot_link["pace"])
+
+
+def bluetooth_receiver():                                                                   #A loop that checks if there are new bluetooth commands incoming on the links
+    global crane_status                                                                     #Using these global variables in this local function (if not defined to be global, it will make a local variable)
     global robot_status
     global chain_status
 
@@ -851,81 +1651,78 @@ def bluetooth_receiver():
     last_robot_msg = ""
 
     while True:                                                                             #Start a forever loop
-        new_msg = chain_status_to_conv_mbox.read()                                          #Read the last message received by bluetooth from the chain conveyor brick
-        if new_msg != last_chain_msg:                                                       #Compare the last message with the last already received message
+        new_msg = link_read(chain_link)                                                     #Read the next message received by bluetooth from the chain conveyor brick
+        if new_msg != None:                                                                 #Every message is received once, also 2 of the same messages after each other
             last_chain_msg = new_msg                                                        #Store the new message as the received message
+            raise_event("chain")
             print("incoming message from chain brick: %s."%new_msg)                         #Print this feedback line when debugging
             if   last_chain_msg                             == "Chain out empty":           #Compare the received message
-                if outside_dict["location101"]["box"]       == True:                        #If there is a box at this location
-                    outside_dict["location102"]["name"]     =  outside_dict["location101"]["name"]  #Transfer the name from the previous location to the new one (location 101 to 102)
-                    outside_dict["location101"]["name"]     = "No box present"              #Remove the name from the old location (location 101)
-                    outside_dict["location101"]["box"]      = False                         #Remove the present status from the old location (location 101)
+                if outside_box[101] == True:                                          #If there is a box at this location
+                    set_outside_box(102, outside_name[101], outside_box[102])               #Transfer the name from the previous location to the new one (location 101 to 102), present when the roll conveyor has it
+                    set_outside_box(101, "No box present")                                  #Remove the name and the present status from the old location (location 101)
             elif last_chain_msg                             == "Roll out full":             #Compare the received message
-                if outside_dict["location102"]["box"]       == False:                       #If there is no box at this location
-                    outside_dict["location102"]["box"]      = True                          #Set the box present at the new location (location 102)
-                    comm_list_uart.append(["transport_pallet", 101, 102])                   #The message is added to the UART communication waiting list for the ESP32
+                if outside_box[102] == False:                                         #If there is no box at this location
+                    set_outside_box(102, outside_name[102], True)                           #Set the box present at the new location (location 102)
+                    queue_put(comm_list_uart, ["transport_pallet", 101, 102])               #The message is added to the UART communication waiting list for the ESP32
             elif last_chain_msg                             == "Chain in full from corner": #Compare the received message
-                if outside_dict["location105"]["box"]       == False:                       #If there is no box at this location
-                    outside_dict["location105"]["name"]     = outside_dict["location104"]["name"]   #Transfer the name from the previous location to the new one (location 104 to 105)
-                    outside_dict["location105"]["box"]      = True                          #Set the box present at the new location (location 105)
-                    outside_dict["location104"]["name"]     = "No box present"              #Remove the name from the old location (location 104)
-                    comm_list_uart.append(["transport_pallet", 104, 105])                   #The message is added to the UART communication waiting list for the ESP32
+                if outside_box[105] == False:                                         #If there is no box at this location
+                    set_outside_box(105, outside_name[104])                                 #Transfer the name from the previous location to the new one (location 104 to 105) and set the box present
+                    set_outside_box(104, "No box present", outside_box[104])                #Remove the name from the old location (location 104), present until the roll conveyor is empty
+                    queue_put(comm_list_uart, ["transport_pallet", 104, 105])               #The message is added to the UART communication waiting list for the ESP32
             elif last_chain_msg                             == "Roll in empty":             #Compare the received message
-                if outside_dict["location104"]["box"]       == True:                        #If there is a box at this location
-                    outside_dict["location104"]["box"]      = False                         #Remove the present status from the old location (location 104)
+                if outside_box[104] == True:                                          #If there is a box at this location
+                    set_outside_box(104, outside_name[104], False)                          #Remove the present status from the old location (location 104)
             elif last_chain_msg                             == "Chain in full from scissor":    #Compare the received message
-                if outside_dict["location105"]["box"]       == False:                       #If there is no box at this location
-                    outside_dict["location104"]["box"]      = True                          #Set the box present at the new location (location 104) #To ensure waiting for the corner transfer to be up to continue
-                    outside_dict["location105"]["name"]     = outside_dict["location106"]["name"]   #Transfer the name from the previous location to the new one (location 106 to 105)
-                    outside_dict["location105"]["box"]      = True                          #Set the box present at the new location (location 105)
-                    outside_dict["location106"]["name"]     = "No box present"              #Remove the name from the old location (location 106)
-                    outside_dict["location106"]["box"]      = False                         #Remove the present status from the old location (location 106)
-                    comm_list_uart.append(["transport_pallet", 106, 105])                   #The message is added to the UART communication waiting list for the ESP32
+                if outside_box[105] == False:                                         #If there is no box at this location
+                    set_outside_box(104, outside_name[104], True)                           #Set the box present at the new location (location 104) #To ensure waiting for the corner transfer to be up to continue
+                    move_outside_box(106, 105)                                              #Transfer the name and present status from the previous location to the new one (location 106 to 105)
+                    queue_put(comm_list_uart, ["transport_pallet", 106, 105])               #The message is added to the UART communication waiting list for the ESP32
             elif last_chain_msg                             == "Scissor full":              #Compare the received message
-                if outside_dict["location106"]["box"]       == False:                       #If there is no box at this location
-                    outside_dict["location106"]["name"]     = outside_dict["location104"]["name"]   #Transfer the name from the previous location to the new one (location 104 to 106)
-                    outside_dict["location106"]["box"]      = True                          #Set the box present at the new location (location 106)
-                    outside_dict["location104"]["name"]     = "No box present"              #Remove the name from the old location (location 104)
-                    comm_list_uart.append(["transport_pallet", 104, 106])                   #The message is added to the UART communication waiting list for the ESP32
+                if outside_box[106] == False:                                         #If there is no box at this location
+                    set_outside_box(106, outside_name[104])                                 #Transfer the name from the previous location to the new one (location 104 to 106) and set the box present
+                    set_outside_box(104, "No box present", outside_box[104])                #Remove the name from the old location (location 104)
+                    queue_put(comm_list_uart, ["transport_pallet", 104, 106])               #The message is added to the UART communication waiting list for the ESP32
             elif last_chain_msg                             == "Homing finished":           #Compare the received message
-                    comm_list_uart.append(["update_mode", 0, "Homing chain conveyors not finished"])    #The message is added to the UART communication waiting list for the ESP32
+                    queue_put(comm_list_uart, ["update_mode", 0, "Homing chain conveyors not finished"]) #The message is added to the UART communication waiting list for the ESP32
                     chain_status = "Ready"                                                  #Change the state for the chain conveyor brick to ready, ready to operate tasks
             elif last_chain_msg                             == "Homing unfinished":         #Compare the received message
-                    comm_list_uart.append(["update_mode", 1, "Homing chain conveyors not finished"])    #The message is added to the UART communication waiting list for the ESP32
+                    queue_put(comm_list_uart, ["update_mode", 1, "Homing chain conveyors not finished"]) #The message is added to the UART communication waiting list for the ESP32
                     chain_status = "Homing"                                                 #Change the state for the chain conveyor brick to homing, unable to operate tasks
             elif last_chain_msg                             == "Outp not free error":       #Compare the received message
-                    comm_list_uart.append(["update_mode", 1, "Output chain not empty"])     #The message is added to the UART communication waiting list for the ESP32
+                    queue_put(comm_list_uart, ["update_mode", 1, "Output chain not empty"]) #The message is added to the UART communication waiting list for the ESP32
             elif last_chain_msg                             == "Outp not full error":       #Compare the received message
-                    comm_list_uart.append(["update_mode", 1, "Output chain not full"])      #The message is added to the UART communication waiting list for the ESP32
+                    queue_put(comm_list_uart, ["update_mode", 1, "Output chain not full"])  #The message is added to the UART communication waiting list for the ESP32
             elif last_chain_msg                             == "Inp not free error":        #Compare the received message
-                    comm_list_uart.append(["update_mode", 1, "Input chain not empty"])      #The message is added to the UART communication waiting list for the ESP32
+                    queue_put(comm_list_uart, ["update_mode", 1, "Input chain not empty"])  #The message is added to the UART communication waiting list for the ESP32
             elif last_chain_msg                             == "Inp not full error":        #Compare the received message
-                    comm_list_uart.append(["update_mode", 1, "Input chain not full"])       #The message is added to the UART communication waiting list for the ESP32
+                    queue_put(comm_list_uart, ["update_mode", 1, "Input chain not full"])   #The message is added to the UART communication waiting list for the ESP32
             elif last_chain_msg                             == "Input received":            #Compare the received message
-                    comm_list_crane.append("Input received")                                #Tell the crane the job is finished, box was well received. Message is added to the bluetooth command list for the stacker crane
+                    queue_put(comm_list_crane, "Input received")                            #Tell the crane the job is finished, box was well received. Message is added to the bluetooth command list for the stacker crane
             
             save_outside_wms()                                                              #Saving the offline WMS for machine parts and floor storage
-        wait(20)                                                                            #Breathing time for the EV3
+        wait(link_poll_time)                                                                #Breathing time for the EV3
 
-        new_msg = robot_status_to_conv_mbox.read()                                          #Read the last message received by bluetooth from the robot brick
-        if new_msg != last_robot_msg:                                                       #Compare the last message with the last already received message
+        new_msg = link_read(robot_link)                                                     #Read the next message received by bluetooth from the robot brick
+        if new_msg != None:                                                                 #Every message is received once, also 2 of the same messages after each other
             last_robot_msg = new_msg                                                        #Store the new message as the received message
+            raise_event("robot")
             print("incoming message from robot brick: %s."%last_robot_msg)                  #Print this feedback line when debugging
             if   last_robot_msg                                == "Ready":                  #Compare the received message
                 robot_status = "Ready"                                                      #Change the state for the robot brick to ready, ready to operate tasks
             elif last_robot_msg                                == "Picked up":              #Compare the received message
                 robot_status = "Picked up"                                                  #Change the state for the robot brick that it picked up the box for the current task
             elif last_robot_msg                                == "Homing finished":        #Compare the received message
-                comm_list_uart.append(["update_mode", 0, "Homing robot not finished"])      #The message is added to the UART communication waiting list for the ESP32
+                queue_put(comm_list_uart, ["update_mode", 0, "Homing robot not finished"])  #The message is added to the UART communication waiting list for the ESP32
                 robot_status = "Ready"                                                      #Change the state for the robot brick to ready to operate tasks
             elif last_robot_msg                                == "Homing unfinished":      #Compare the received message
-                comm_list_uart.append(["update_mode", 1, "Homing robot not finished"])      #The message is added to the UART communication waiting list for the ESP32
+                queue_put(comm_list_uart, ["update_mode", 1, "Homing robot not finished"])  #The message is added to the UART communication waiting list for the ESP32
                 robot_status = "Homing"                                                     #Change the state for the robot brick to homing, unable to operate tasks
-        wait(20)                                                                            #Breathing time for the EV3
+        wait(link_poll_time)                                                                #Breathing time for the EV3
 
-        new_msg = crane_status_to_conv_mbox.read()                                          #Read the last message received by bluetooth from the stacker crane brick
-        if new_msg != last_crane_msg:                                                       #Compare the last message with the last already received message
+        new_msg = link_read(crane_link)                                                     #Read the next message received by bluetooth from the stacker crane brick
+        if new_msg != None:                                                                 #Every message is received once, also 2 of the same messages after each other
             last_crane_msg = new_msg                                                        #Store the new message as the received message
+            raise_event("crane")
             print("incoming message from crane brick: %s."%last_crane_msg)                  #Print this feedback line when debugging
             if   last_crane_msg                                == "Ready":                  #Compare the received message
                 crane_status = "Ready"                                                      #Change the state for the stacker crane brick to ready, ready to operate tasks
@@ -933,26 +1730,31 @@ def bluetooth_receiver():
                 crane_status = "Picked up"                                                  #Change the state for the stacker crane brick that it picked up the box for the current task
             elif last_crane_msg                                == "Dropped off":            #Compare the received message
                 crane_status = "Dropped off"                                                #Change the state for the stacker crane brick that it dropped off the box for the current task
+            elif "Lift calibration" in last_crane_msg:                                      #Compare the received message
+                build_slot_costs([int(x) for x in last_crane_msg.split(",")[1:]])           #Recalculate the cycle time for every rack location with the calibrated lifting angles
             elif last_crane_msg                                == "Homing finished":        #Compare the received message
-                comm_list_uart.append(["update_mode", 0, "Homing stacker crane not finished"])  #The message is added to the UART communication waiting list for the ESP32
+                queue_put(comm_list_uart, ["update_mode", 0, "Homing stacker crane not finished"]) #The message is added to the UART communication waiting list for the ESP32
                 crane_status = "Ready"                                                      #Change the state for the stacker crane brick to ready, ready to operate tasks
             elif last_crane_msg                                == "Homing unfinished":      #Compare the received message
-                comm_list_uart.append(["update_mode", 1, "Homing stacker crane not finished"])  #The message is added to the UART communication waiting list for the ESP32
+                queue_put(comm_list_uart, ["update_mode", 1, "Homing stacker crane not finished"]) #The message is added to the UART communication waiting list for the ESP32
                 crane_status = "Homing"                                                     #Change the state for the stacker crane brick to homing, unable to operate tasks
             elif last_crane_msg                                == "Homing fork error":      #Compare the received message
-                comm_list_uart.append(["update_mode", 1, "Homing stacker crane fork error"])    #The message is added to the UART communication waiting list for the ESP32
+                queue_put(comm_list_uart, ["update_mode", 1, "Homing stacker crane fork error"]) #The message is added to the UART communication waiting list for the ESP32
             elif last_crane_msg                                == "Crane sensor remains pushed error":  #Compare the received message
-                comm_list_uart.append(["update_mode", 1, "Homing stacker crane lift or drive error"])   #The message is added to the UART communication waiting list for the ESP32
+                queue_put(comm_list_uart, ["update_mode", 1, "Homing stacker crane lift or drive error"]) #The message is added to the UART communication waiting list for the ESP32
             elif last_crane_msg                                == "Crane positioning error":    #Compare the received message
-                comm_list_uart.append(["update_mode", 1, "Positioning stacker crane error"])    #The message is added to the UART communication waiting list for the ESP32
-        wait(20)                                                                            #Breathing time for the EV3
+                queue_put(comm_list_uart, ["update_mode", 1, "Positioning stacker crane error"]) #The message is added to the UART communication waiting list for the ESP32
+        wait(link_poll_time)                                                                #Breathing time for the EV3
      
 
 def change_one_wms_position(location, new_name):                                            #Perform the function that changes 1 WMS position and saves it online+offline
     global wms_online_list                                                                  #Using this global variable in this local function (if not defined to be global, it will make a local variable)
 
+    update_location_index(location, wms_online_list[location], new_name)                    #Keep the free/full rack locations and box names up to date
     wms_online_list[location] = new_name                                                    #Transfer the name for the new location to the wms online list (location 0,1,2,...,99 / namestring)
-    save_offline_wms()                                                                      #Save the updated online list to the offline .txt file, ready to be used if the brick is shut down now
+    write_wms_record(location)                                                              #Change only this record in the binary table, ready to be used if the brick is shut down now
+    log_wms_change(location, new_name)                                                      #Add the change to the log for the ESP32
+    raise_event("rack")                                                                     #A box in the rack has changed (crane or touchscreen), this wakes up the automatic loops
 
 
 def wait_for_release_buttons():                                                             #A loop that checks if all buttons on the EV3 brick are released
@@ -974,72 +1776,81 @@ def startupsequence():
     global connections                                                                      #Using these global variables in this local function (if not defined to be global, it will make a local variable)
     global mode_chosen
 
+    startup_records = []                                                                    #Defining local variables
     for i in range(total_storage_positions):                                                #Check every rack storage location (locations 0,1,2,...,99)
         if wms_online_list[i] == "No box present": continue                                 #If there is no box at this storage location, continue the for loop
-        else: update_WMS_ESP(i, 1, wms_online_list[i])                                      #If there is a box, send the location and name of the pallet by a function and UartRemote
-        wait(100)                                                                           #Wait 100ms TODO check if this wait can be deleted
+        else: startup_records.append([i, 1, wms_online_list[i]])                            #If there is a box, add the location and name of the pallet to the list that will be send
     for i in positions:                                                                     #Check every conveyor and floor storage location (locations 100,101,102,103,104,105,106,107,110,111,112,113,114)
-        if outside_dict["location%s"%i]["box"] == True:                                     #If there is a box at this location
-            update_WMS_ESP(i, 1, outside_dict["location%s"%i]["name"])                      #Send the location and name of the pallet by a function and UartRemote
-        wait(100)                                                                           #Wait 100ms TODO check if this wait can be deleted
-    comm_list_uart.append(["update_mode", 0, "Show connection screen"])                     #The message is added to the UART communication waiting list for the ESP32
+        if outside_box[i] == True:                                                          #If there is a box at this location
+            startup_records.append([i, 1, outside_name[i]])                                 #Add the location and name of the pallet to the list that will be send
+    update_WMS_ESP_bulk(startup_records)                                                    #Send all locations with a box in as few UART messages as possible
+    for i in list(range(total_storage_positions)) + positions:                              #The touchscreen requests that were restored from the binary table
+        if location_requested(i) == True: queue_put(comm_list_uart, ["update_request", i, 1])
+    queue_put(comm_list_uart, ["update_mode", 0, "Show connection screen"])                 #The message is added to the UART communication waiting list for the ESP32
 
     ev3.screen.draw_text(4,  2, "Select operating mode", text_color=Color.BLACK, background_color=Color.WHITE)  #Write a line of text on the EV3 screen
     while mode_chosen == False: ur.process_uart()                                           #Process incoming commands by UART until the mode has been chosen on the screen
     ev3.screen.draw_text(4,  2, "Connecting to %s devices.                                "%connections, text_color=Color.BLACK, background_color=Color.WHITE)  #Write a line of text on the EV3 screen, how many devices will be connecting by bluetooth
-    comm_list_uart.append(["update_mode", 0, "Mode not selected"])                          #The message is added to the UART communication waiting list for the ESP32
+    queue_put(comm_list_uart, ["update_mode", 0, "Mode not selected"])                      #The message is added to the UART communication waiting list for the ESP32
 
     ##########ALWAYS START THIS SERVER-BRICK FIRST. THEN START THE SLAVE-BRICKS, OR THEY WILL TIMEOUT IF THEY CAN NOT CONNECT TO THIS BRICK BY BLUETOOTH (THIS PROGRAM NEEDS TO BE RUNNING##########
     server_roll.wait_for_connection(connections)                                            #Waiting for the amount of bluetooth devices connected
     ev3.screen.draw_text(4,  2, "Connected to %s devices.                                "%connections, text_color=Color.BLACK, background_color=Color.WHITE)   #Write a line of text on the EV3 screen
 
-    comm_list_uart.append(["update_mode", 0, "Communication not online"])                   #The message is added to the UART communication waiting list for the ESP32
+    queue_put(comm_list_uart, ["update_mode", 0, "Communication not online"])               #The message is added to the UART communication waiting list for the ESP32
     wait(1000)                                                                              #Wait 1second to give the ESP32 program time to update all its functions
-    comm_list_uart.append(["update_mode", 0, "WMS Data not received"])                      #The message is added to the UART communication waiting list for the ESP32
+    queue_put(comm_list_uart, ["update_mode", 0, "WMS Data not received"])                  #The message is added to the UART communication waiting list for the ESP32
 
     if robot_used == True:                                                                  #Depending on the current states send messages, this state is if the 6DOF is being used
-        comm_list_chain.append("Robot used")                                                #A message is added to the bluetooth communication waiting list for the chain conveyor brick that the robot mode is used (location 107)
-        comm_list_robot.append("Robot used")                                                #A message is added to the bluetooth communication waiting list for the robot brick that the robot mode is used (location 107)
-    if outside_dict["location107"]["box"] == True: comm_list_robot.append("Robot full")     #A message is added to the bluetooth communication waiting list for the robot brick that the robot holds a box (location 107) [Not used, it can't hold a box whilst homing]
-    if outside_dict["location106"]["box"] == True:                                          #Depending on the current states send messages, this state is for if there is a box on the scissorlift (location 106)
-        comm_list_chain.append("Input from scissor")                                        #A message is added to the bluetooth communication waiting list for the chain conveyor brick that the scissor is down and has a box to be transported (location 106)
-        comm_list_robot.append("Scissor full")                                              #A message is added to the bluetooth communication waiting list for the robot brick that the scissor is full (location 106)
-    if outside_dict["location105"]["box"] == True: comm_list_chain.append("Chain in full")  #A message is added to the bluetooth communication waiting list for the chain conveyor brick that the input  chain conveyor has a box (location 105)
-    if outside_dict["location104"]["box"] == True: comm_list_chain.append("Roll in full")   #A message is added to the bluetooth communication waiting list for the chain conveyor brick that the input  roll  conveyor has a box (location 104)
-    if outside_dict["location102"]["box"] == True: comm_list_chain.append("Roll out full")  #A message is added to the bluetooth communication waiting list for the chain conveyor brick that the output roll  conveyor has a box (location 102)
-    if outside_dict["location101"]["box"] == True: comm_list_chain.append("Chain out full") #A message is added to the bluetooth communication waiting list for the chain conveyor brick that the output chain conveyor has a box (location 101)
-    if outside_dict["location100"]["box"] == True: comm_list_crane.append("Crane full")     #A message is added to the bluetooth communication waiting list for the crane brick that the crane has a box on the telescopic fork (location 106)
+        queue_put(comm_list_chain, "Robot used")                                            #A message is added to the bluetooth communication waiting list for the chain conveyor brick that the robot mode is used (location 107)
+        queue_put(comm_list_robot, "Robot used")                                            #A message is added to the bluetooth communication waiting list for the robot brick that the robot mode is used (location 107)
+    if outside_box[107] == True: queue_put(comm_list_robot, "Robot full")                   #A message is added to the bluetooth communication waiting list for the robot brick that the robot holds a box (location 107) [Not used, it can't hold a box whilst homing]
+    if outside_box[106] == True:                                                            #Depending on the current states send messages, this state is for if there is a box on the scissorlift (location 106)
+        queue_put(comm_list_chain, "Input from scissor")                                    #A message is added to the bluetooth communication waiting list for the chain conveyor brick that the scissor is down and has a box to be transported (location 106)
+        queue_put(comm_list_robot, "Scissor full")                                          #A message is added to the bluetooth communication waiting list for the robot brick that the scissor is full (location 106)
+    if outside_box[105] == True: queue_put(comm_list_chain, "Chain in full")                #A message is added to the bluetooth communication waiting list for the chain conveyor brick that the input  chain conveyor has a box (location 105)
+    if outside_box[104] == True: queue_put(comm_list_chain, "Roll in full")                 #A message is added to the bluetooth communication waiting list for the chain conveyor brick that the input  roll  conveyor has a box (location 104)
+    if outside_box[102] == True: queue_put(comm_list_chain, "Roll out full")                #A message is added to the bluetooth communication waiting list for the chain conveyor brick that the output roll  conveyor has a box (location 102)
+    if outside_box[101] == True: queue_put(comm_list_chain, "Chain out full")               #A message is added to the bluetooth communication waiting list for the chain conveyor brick that the output chain conveyor has a box (location 101)
+    if outside_box[100] == True: queue_put(comm_list_crane, "Crane full")                   #A message is added to the bluetooth communication waiting list for the crane brick that the crane has a box on the telescopic fork (location 106)
 
     sub_alarm_lights.start()                                                                #Start a sub-thread for flashing a red light if the emergency state is true
     
 
 def homing_scissorlift():                                                                   #This function is called at startup of the EV3 brick after bluetooth connections are working, and it
     global scissorlift_homing                                                               #Using these global variables in this local function (if not defined to be global, it will make a local variable)
-    global outside_dict
 
     scissorlift.run_until_stalled(-500, then=Stop.HOLD, duty_limit=40)                      #Start turning the scissorlift motor at maximal -500degrees/second (downwards), maximal 40% torque used. Wait until the motor is stalled and hold position (Homing)
     scissorlift.reset_angle(scissorlift_homing)                                             #Reset the scissorlift motor angle to a preset value, lower than 0, so in normal operation the motor will never reach this endstop
     scissorlift.run_target(1400, 0, then=Stop.COAST, wait=True)                             #Send the scissorlift motor run to the target command (position 0degrees), wait for finishing
-    outside_dict["location106"]["liftposition"] = "ready down"                              #Change the scissorlift position to down in the dictionary
-    comm_list_chain.append("Scissor is down")                                               #A message is added to the bluetooth communication waiting list for the chain conveyor brick that the scissorlift is in the down position (location 106)
-    comm_list_robot.append("Scissor is down")                                               #A message is added to the bluetooth communication waiting list for the robot brick that the scissorlift is in the down position (location 106)
-    comm_list_uart.append(["update_mode", 0, "Homing scissorlift not finished"])            #The message is added to the UART communication waiting list for the ESP32
+    outside_liftposition[106] = "ready down"                                                #Change the scissorlift position to down in the location list
+    queue_put(comm_list_chain, "Scissor is down")                                           #A message is added to the bluetooth communication waiting list for the chain conveyor brick that the scissorlift is in the down position (location 106)
+    queue_put(comm_list_robot, "Scissor is down")                                           #A message is added to the bluetooth communication waiting list for the robot brick that the scissorlift is in the down position (location 106)
+    queue_put(comm_list_uart, ["update_mode", 0, "Homing scissorlift not finished"])        #The message is added to the UART communication waiting list for the ESP32
 
 
 ##########~~~~~~~~~~CREATING MULTITHREADS~~~~~~~~~~##########
 sub_conveyor_auto           =   Thread(target=conveyor_transfer_auto)                       #This creates a thread, made from a previously defined function. No arguments can be given
 sub_crane_auto              =   Thread(target=crane_auto)
 sub_bluetooth_receiver      =   Thread(target=bluetooth_receiver)
+sub_chain_link_sender       =   Thread(target=chain_link_sender)
+sub_crane_link_sender       =   Thread(target=crane_link_sender)
+sub_robot_link_sender       =   Thread(target=robot_link_sender)
 sub_scissor_lift_operation  =   Thread(target=scissor_lift_operation)
 sub_scissor_robot_operation =   Thread(target=scissor_robot_operation)
 sub_communication_bt_uart   =   Thread(target=communication_bt_uart)
 sub_alarm_lights            =   Thread(target=alarm_lights)
 sub_homing_scissorlift      =   Thread(target=homing_scissorlift)
+sub_outside_wms_writer      =   Thread(target=outside_wms_writer)
 
 
 ##########~~~~~~~~~~PROGRAM STARTING, STARTUP ALL BLUETOOTH RX AND TX, AND UART TX~~~~~~~~~~##########
-sub_bluetooth_receiver.start()                                                              #This starts the loop thread that receives all the bluetooth communication from the slave EV3 bricks. Non-blocking
-sub_communication_bt_uart.start()                                                           #This starts the loop thread that sends all the communication to the slave EV3 bricks by bluetooth and the ESP32 by UART. Non-blocking
+sub_chain_link_sender.start()                                                               #These start the loop threads that send and receive the bluetooth communication with each slave EV3 brick, every link on its own. Non-blocking
+sub_crane_link_sender.start()
+sub_robot_link_sender.start()
+sub_bluetooth_receiver.start()                                                              #This starts the loop thread that handles all the incoming bluetooth communication from the slave EV3 bricks. Non-blocking
+sub_communication_bt_uart.start()                                                           #This starts the loop thread that sends all the communication to the ESP32 by UART. Non-blocking
+sub_outside_wms_writer.start()                                                              #This starts the loop thread that saves the outside WMS to the offline file when it has changed. Non-blocking
 
 
 ##########~~~~~~~~~~WAIT UNTIL (0, 2 or 3) BLUETOOTH DEVICES ARE CONNECTED~~~~~~~~~~##########
@@ -1062,19 +1873,22 @@ while True:
     if touch_input_emerg.pressed() == True:                                                 #Check if the emergency button is pressed in at this moment
         if emergency_stop == False:                                                         #Check if the emergency state is not already set
             emergency_stop = True                                                           #Set the emergency state
-            comm_list_uart.append(["update_mode", 1, "Emergency Stop pushed"])              #The message is added to the UART communication waiting list for the ESP32
+            raise_event("mode")
+            queue_put(comm_list_uart, ["update_mode", 1, "Emergency Stop pushed"])          #The message is added to the UART communication waiting list for the ESP32
+            flush_outside_wms()                                                             #Save the outside WMS now, the brick might be switched off after an emergency stop
             sub_alarm_lights.start()                                                        #This starts the loop thread that controls the red flashing EV3 lights. Non-blocking
-            comm_list_chain.append("Emergency stop pushed")                                 #A message is added to the bluetooth communication waiting list for the chain conveyor brick that the emergency state is set
-            comm_list_crane.append("Emergency stop pushed")                                 #A message is added to the bluetooth communication waiting list for the stacker crane brick that the emergency state is set
-            comm_list_robot.append("Emergency stop pushed")                                 #A message is added to the bluetooth communication waiting list for the robot brick that the emergency state is set
+            queue_put(comm_list_chain, "Emergency stop pushed")                             #A message is added to the bluetooth communication waiting list for the chain conveyor brick that the emergency state is set
+            queue_put(comm_list_crane, "Emergency stop pushed")                             #A message is added to the bluetooth communication waiting list for the stacker crane brick that the emergency state is set
+            queue_put(comm_list_robot, "Emergency stop pushed")                             #A message is added to the bluetooth communication waiting list for the robot brick that the emergency state is set
     if touch_input_reset.pressed() == True:                                                 #Check if the reset emergency button is pressed in at this moment
         if connections == 3 and not(chain_status == "Homing" or crane_status == "Homing" or robot_status == "Homing") or connections == 2 and not(chain_status == "Homing" or crane_status == "Homing") or connections == 0:    #Check if all connected devices have finished homing
             if emergency_stop == True and not touch_input_emerg.pressed() == True:          #If the emergency stop state is True and not currently pressed, then send reset to all controllers
-                comm_list_uart.append(["update_mode", 0, "Emergency Stop pushed"])          #The message is added to the UART communication waiting list for the ESP32
+                queue_put(comm_list_uart, ["update_mode", 0, "Emergency Stop pushed"])      #The message is added to the UART communication waiting list for the ESP32
                 emergency_stop = False                                                      #Reset the emergency state
-                comm_list_chain.append("Emergency stop reset")                              #A message is added to the bluetooth communication waiting list for the chain conveyor brick that the emergency state is reset
-                comm_list_crane.append("Emergency stop reset")                              #A message is added to the bluetooth communication waiting list for the stacker crane brick that the emergency state is reset
-                comm_list_robot.append("Emergency stop reset")                              #A message is added to the bluetooth communication waiting list for the robot brick that the emergency state is reset
+                raise_event("mode")
+                queue_put(comm_list_chain, "Emergency stop reset")                          #A message is added to the bluetooth communication waiting list for the chain conveyor brick that the emergency state is reset
+                queue_put(comm_list_crane, "Emergency stop reset")                          #A message is added to the bluetooth communication waiting list for the stacker crane brick that the emergency state is reset
+                queue_put(comm_list_robot, "Emergency stop reset")                          #A message is added to the bluetooth communication waiting list for the robot brick that the emergency state is reset
     
     ##########USED FOR DEBUGGING OR YOU CAN ADD MANUAL COMMANDS TRIGGERED BY EV3 BUTTONS##########
     if   ev3.buttons.pressed() == [Button.UP]:                                              #Check if the 'Up' button is pressed on the EV3 brick       [Used for debugging, add commands here to trigger on demand]
@@ -1082,17 +1896,17 @@ while True:
 
     elif ev3.buttons.pressed() == [Button.DOWN]:                                            #Check if the 'Down' button is pressed on the EV3 brick     [Used for debugging, add commands here to trigger on demand]
         wait_for_release_buttons()                                                          #Wait for all buttons to be released
-        comm_list_robot.append("Scissor standard to zone 111")                              #Debugging the robot, send it a command to pickup a box from the scissorlift and dropoff on the second floor spot (location 111)
+        queue_put(comm_list_robot, "Scissor standard to zone 111")                          #Debugging the robot, send it a command to pickup a box from the scissorlift and dropoff on the second floor spot (location 111)
 
     elif ev3.buttons.pressed() == [Button.LEFT]:                                            #Check if the 'Left' button is pressed on the EV3 brick     [Used for debugging, add commands here to trigger on demand]
         wait_for_release_buttons()                                                          #Wait for all buttons to be released
 
     elif ev3.buttons.pressed() == [Button.RIGHT]:                                           #Check if the 'Right' button is pressed on the EV3 brick    [Used for debugging, add commands here to trigger on demand]
         wait_for_release_buttons()                                                          #Wait for all buttons to be released
-        comm_list_uart.append(["update_mode", 0, "Communication not online"])               #The messages are added to the UART communication waiting list for the ESP32
-        comm_list_uart.append(["update_mode", 0, "Homing robot not finished"])
-        comm_list_uart.append(["update_mode", 0, "Homing chain conveyors not finished"])
-        comm_list_uart.append(["update_mode", 0, "Homing stacker crane not finished"])
+        queue_put(comm_list_uart, ["update_mode", 0, "Communication not online"])           #The messages are added to the UART communication waiting list for the ESP32
+        queue_put(comm_list_uart, ["update_mode", 0, "Homing robot not finished"])
+        queue_put(comm_list_uart, ["update_mode", 0, "Homing chain conveyors not finished"])
+        queue_put(comm_list_uart, ["update_mode", 0, "Homing stacker crane not finished"])
 
     elif ev3.buttons.pressed() == [Button.CENTER]:                                          #Check if the 'Center' button is pressed on the EV3 brick   [Used for debugging, add commands here to trigger on demand]
         wait_for_release_buttons()                                                          #Wait for all buttons to be released
@@ -15,6 +15,10 @@ import os
 import math
 import struct
 
+from Warehouse_Geometry import *
+from Warehouse_Messaging import *
+from Warehouse_Queue import *
+
 # This program requires LEGO EV3 MicroPython v2.0 or higher.
 # Click "Open user guide" on the EV3 extension tab for more information.
 # MIT License: Copyright (c) 2022 Mr Jos
@@ -49,8 +53,8 @@ drive_homing_adjust     =      0
 
 
 ##########~~~~~~~~~~GEARING~~~~~~~~~~##########
-max_speed_lift          =   1000                                                            #Maximal speed (deg/sec) that the lifting motor is allowed to rotate at
-max_speed_drive         =   1000                                                            #Maximal speed (deg/sec) that the driving motor is allowed to rotate at
+max_speed_lift          =   crane_speed_lift                                                #Maximal speed (deg/sec) that the lifting motor is allowed to rotate at
+max_speed_drive         =   crane_speed_drive                                               #Maximal speed (deg/sec) that the driving motor is allowed to rotate at
 max_speed_fork          =   1400                                                            #Maximal speed (deg/sec) that the telescopic fork motor is allowed to rotate at
 fork_ext_coord          =   2525                                                            #Motor angle to extend the telescopic fork from centered to one side
 dropoff_height          =    160                                                            #Motor angle to add to the pickup location for dropoff height
@@ -60,8 +64,8 @@ remote_speed_adjust     =      1
 
 ##########~~~~~~~~~~MAXIMUM SPEED, MAXIMUM ACCELERATION, MAXIMUM POWER~~~~~~~~~~##########
 tele_fork_motor.control.limits(1400,  800, 100)                                             #Motor settings [Max speed allowed (deg/sec) / Acceleration (deg/sec²) / Power (%)]
-lift_platform.control.limits  (1000,  500, 100)                                             #Motor settings [Max speed allowed (deg/sec) / Acceleration (deg/sec²) / Power (%)]
-driving_motor.control.limits  (1000,  400, 100)                                             #Motor settings [Max speed allowed (deg/sec) / Acceleration (deg/sec²) / Power (%)]
+lift_platform.control.limits  (crane_speed_lift,  crane_accel_lift,  100)                   #Motor settings [Max speed allowed (deg/sec) / Acceleration (deg/sec²) / Power (%)]
+driving_motor.control.limits  (crane_speed_drive, crane_accel_drive, 100)                   #Motor settings [Max speed allowed (deg/sec) / Acceleration (deg/sec²) / Power (%)]
 
 
 ##########~~~~~~~~~~BLUETOOTH SETUP, SERVER SIDE~~~~~~~~~~##########
@@ -69,6 +73,7 @@ client_crane = BluetoothMailboxClient()
 
 conv_status_to_crane_mbox   = TextMailbox('conveyor update to crane' , client_crane)        #Receiving the bluetooth commands from the master EV3 brick on this channel
 crane_status_to_conv_mbox   = TextMailbox('crane update to conveyor' , client_crane)        #Sending   the bluetooth commands to   the master EV3 brick on this channel
+master_link                 = new_link("master", crane_status_to_conv_mbox, conv_status_to_crane_mbox)  #Acknowledged messages to/from the master EV3 brick, each message is delivered once
 
 
 ##########~~~~~~~~~~CREATING AND STARTING A TIMER~~~~~~~~~~##########
@@ -82,18 +87,16 @@ timer_timeout.reset()
 
 
 ##########~~~~~~~~~~BUILDING GLOBAL VARIABLES~~~~~~~~~~##########
-rack_coord              =   [210, 806, 1297, 1796, 2296, 2795]                              #List with distances from the homing points to [0] = Chain conveyor pos, [1-5] = Rack numbers starting from front [208, 795, 1295, 1795, 2295, 2795] 
+rack_coord              =   crane_rack_coord                                                #List with distances from the homing points to [0] = Chain conveyor pos, [1-5] = Rack numbers starting from front [208, 795, 1295, 1795, 2295, 2795] 
 ascending_coord         =   [65]                                                            #List that will be later filled more with all positions when going up with the platform
 descending_coord        =   [55]                                                            #List that will be later filled more with all positions when going down with the platform
 fork_timeout_time       =   4000                                                            #Time in ms before triggering an error when trying to home the telescopic fork
-#Locations are shifted by 1 in the stacker crane program, as position 1 in the lists is the chain conveyor position for pickup and dropoff
-rack_pos   = [0, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 3, 3, 3, 3, 3, 3, 3, 3, 3, 3, 3, 3, 4, 4, 4, 4, 4, 4, 4, 4, 4, 4, 4, 4, 5, 5, 5, 5, 5, 5, 5, 5, 5, 5, 5, 5]    #Depending on the target location drive to a rack number (location 0,1,2,...,59)
-height_pos = [0, 1, 2, 3, 4, 5, 6, 1, 2, 3, 4, 5, 6, 1, 2, 3, 4, 5, 6, 1, 2, 3, 4, 5, 6, 1, 2, 3, 4, 5, 6, 1, 2, 3, 4, 5, 6, 1, 2, 3, 4, 5, 6, 1, 2, 3, 4, 5, 6, 1, 2, 3, 4, 5, 6, 1, 2, 3, 4, 5, 6]    #Depending on the target location lift to a height number (location 0,1,2,...,59)
-side_pos   = [0, 1, 1, 1, 1, 1, 1, 2, 2, 2, 2, 2, 2, 1, 1, 1, 1, 1, 1, 2, 2, 2, 2, 2, 2, 1, 1, 1, 1, 1, 1, 2, 2, 2, 2, 2, 2, 1, 1, 1, 1, 1, 1, 2, 2, 2, 2, 2, 2, 1, 1, 1, 1, 1, 1, 2, 2, 2, 2, 2, 2]    #Depending on the target location extend the fork to the left or right(location 0,1,2,...,59)
+#Locations 0,1,2,...,59 are converted to rack / floor / side numbers by the shared Warehouse_Geometry module, rack 0 / floor 0 is the chain conveyor position for pickup and dropoff
 
 emergency_stop          =   False                                                           #Variable to see if the emergency stop has been pushed / reset
-comm_list               =   []                                                              #List with all commands that still need to be send to the master conveyor brick
+comm_list               =   new_queue("master")                                             #Queue with all commands that still need to be send to the master conveyor brick
 crane_task              =   "None"                                                          #Variable that holds the next task to be done
+drive_abort             =   False                                                           #Variable that gets set True if the master aborts a manual drive (parking), because a new order is waiting
 error_homing_fork       =   False                                                           #Variable to see if the fork homing sensor has triggered an error / has been reset
 error_driving_pos       =   False                                                           #Variable to see if the driving sensor has triggered an error / has been reset
 correct_dropoff         =   True                                                            #Variable that gets set True if the output chain conveyor sensor has confirmed the dropoff of the box
@@ -124,17 +127,14 @@ ev3.light.off()
 
 ##########~~~~~~~~~~DEFINE SUB-ROUTINES~~~~~~~~~~##########
 ##########~~~~~~~~~~BLUETOOTH SENDING COMMUNICATION COMMANDS~~~~~~~~~~##########
-def communication_control():                                                                #The master EV3 brick will receive with this function all Bluetooth commands
+def communication_control():                                                                #The master EV3 brick will receive with this function all Bluetooth commands, and this brick receives the commands from the master
     global comm_list                                                                        #TODO is this global needed? BT lists are not global but work in master
     
     wait(500)                                                                               #Give the master 1second time to start up the bluetooth receiving function
     while True:                                                                             #Start a forever loop
-        wait(300)                                                                           #Allow the receiver some time to read the previous message first
-        if len(comm_list) > 0:                                                              #Check if there is a command in the master conveyor communication list
-            print("outgoing message: %s."%comm_list[0])                                     #Print this feedback line when debugging
-            crane_status_to_conv_mbox.send(comm_list[0])                                    #The message is send by bluetooth communication to the master conveyor brick
-            wait(50)                                                                        #TODO is this needed?
-            del comm_list[0]                                                                #If the message is send, delete it from the communication list
+        wait(link_poll_time)                                                                #Time between checking the mailboxes
+        link_send_list(master_link, comm_list)                                              #Hand the waiting messages to the link, each one is delivered once and in order
+        link_poll(master_link)                                                              #Receive, acknowledge and (re)send messages
 
 
 ##########~~~~~~~~~~DEFINE SUB-ROUTINES [FUNCTIONS] FOR THE OPERATION OF THE WAREHOUSE~~~~~~~~~~##########
@@ -156,30 +156,33 @@ def crane_control():
     while True:                                                                             #Start a forever loop
         check_emergency_stop()                                                              #Check if the movement is allowed to start
         while correct_dropoff == False: wait(100)                                           #If the last task was a dropoff, wait for the confirmation of a good dropoff
-        if   "Store at" in crane_task:                                                      #Check if a stacker crane task has been set
+        if   "Store and retrieve" in crane_task:                                            #Check if a stacker crane task has been set
+            next_task = crane_task.split(",")                                               #Split the incoming command and save the results in a list
+            store_retrieve_box(int(next_task[1]), int(next_task[2]))                        #Read the second and third argument of the list, they contain a location, start with them a function
+        elif "Store at" in crane_task:                                                      #Check if a stacker crane task has been set
             next_task = crane_task.split(",")                                               #Split the incoming command and save the results in a list
-            store_box(int(next_task[1]) + 1)                                                #Read the second argument of the list, it contains a location, start with it a function
+            store_box(int(next_task[1]))                                                    #Read the second argument of the list, it contains a location, start with it a function
         elif "Retrieve at" in crane_task:                                                   #Check if a stacker crane task has been set
             next_task = crane_task.split(",")                                               #Split the incoming command and save the results in a list
-            retrieve_box(int(next_task[1]) + 1)                                             #Read the second argument of the list, it contains a location, start with it a function
+            retrieve_box(int(next_task[1]))                                                 #Read the second argument of the list, it contains a location, start with it a function
         elif "Move between" in crane_task:                                                  #Check if a stacker crane task has been set
             next_task = crane_task.split(",")                                               #Split the incoming command and save the results in a list
-            move_box_crane(int(next_task[1]) + 1, int(next_task[2]) + 1)                    #Read the second and third argument of the list, they contain a location, start with them a function
+            move_box_crane(int(next_task[1]), int(next_task[2]))                            #Read the second and third argument of the list, they contain a location, start with them a function
         elif "Drive to" in crane_task:                                                      #Check if a stacker crane task has been set
             next_task = crane_task.split(",")                                               #Split the incoming command and save the results in a list
-            manual_driving(int(next_task[1]) + 1)                                           #Read the second argument of the list, it contains a location, start with it a function
+            manual_driving(int(next_task[1]))                                               #Read the second argument of the list, it contains a location, start with it a function
         elif "Startup" in crane_task:                                                       #Check if a stacker crane task has been set
             next_task = crane_task.split(",")                                               #Split the incoming command and save the results in a list
-            startup_box(int(next_task[1]) + 1)                                              #Read the second argument of the list, it contains a location, start with it a function
+            startup_box(int(next_task[1]))                                                  #Read the second argument of the list, it contains a location, start with it a function
 
 
 def store_box(store_pos):                                                                   #This function is used to take a box from the input chain conveyor and store it in the high bay racks (location 105 -> 0-59)
     global crane_task                                                                       #Using this global variable in this local function (if not defined to be global, it will make a local variable)
     crane_task = ""                                                                         #Clear the global variable that had the task
     drive_to_pos(0, 0, "Pickup", 1)                                                         #Call the function to drive to a certain location and perform a fork movement
-    comm_list.append("Picked up")                                                           #The message is added to the bluetooth communication waiting list for the master conveyor brick
-    drive_to_pos(rack_pos[store_pos], height_pos[store_pos] , "Dropoff", side_pos[store_pos])   #Call the function to drive to a certain location and perform a fork movement
-    comm_list.append("Dropped off")                                                         #The message is added to the bluetooth communication waiting list for the master conveyor brick
+    queue_put(comm_list, "Picked up")                                                       #The message is added to the bluetooth communication waiting list for the master conveyor brick
+    drive_to_pos(slot_rack(store_pos), slot_floor(store_pos), "Dropoff", slot_side(store_pos))   #Call the function to drive to a certain location and perform a fork movement
+    queue_put(comm_list, "Dropped off")                                                     #The message is added to the bluetooth communication waiting list for the master conveyor brick
 
 
 def retrieve_box(retrieve_pos):                                                             #This function is used to take a box out of the high bay racks and bring it to the output chain conveyor (locations 0-59 -> 101)
@@ -188,34 +191,41 @@ def retrieve_box(retrieve_pos):
     crane_task = ""                                                                         #Clear the global variable that had the task
     correct_dropoff = False                                                                 #If a box needs to be taken out of the rack to the conveyor, a feedback will come to confirm good dropoff, resetting the good dropoff here
     print(retrieve_pos)                                                                     #Print this feedback line when debugging
-    drive_to_pos(rack_pos[retrieve_pos], height_pos[retrieve_pos], "Pickup", side_pos[retrieve_pos])    #Call the function to drive to a certain location and perform a fork movement
-    comm_list.append("Picked up")                                                           #The message is added to the bluetooth communication waiting list for the master conveyor brick
+    drive_to_pos(slot_rack(retrieve_pos), slot_floor(retrieve_pos), "Pickup", slot_side(retrieve_pos))  #Call the function to drive to a certain location and perform a fork movement
+    queue_put(comm_list, "Picked up")                                                       #The message is added to the bluetooth communication waiting list for the master conveyor brick
     drive_to_pos(0, 0, "Dropoff", 2)                                                        #Call the function to drive to a certain location and perform a fork movement
-    comm_list.append("Dropped off")                                                         #The message is added to the bluetooth communication waiting list for the master conveyor brick
+    queue_put(comm_list, "Dropped off")                                                     #The message is added to the bluetooth communication waiting list for the master conveyor brick
+
+
+def store_retrieve_box(store_pos, retrieve_pos):                                            #This function is used to store a box and take another box out on the same trip, without driving back empty (location 105 -> 0-59, 0-59 -> 101)
+    store_box(store_pos)                                                                    #Store the box from the input chain conveyor, the crane stays at this location
+    retrieve_box(retrieve_pos)                                                              #Drive directly from the store location to the retrieve location and bring the box to the output chain conveyor
 
 
 def move_box_crane(retrieve_pos, store_pos):                                                #This function is used to take a box out of the high bay racks and store it on another place in the racks (locations 0-59)
     global crane_task                                                                       #Using this global variable in this local function (if not defined to be global, it will make a local variable)
     crane_task = ""                                                                         #Clear the global variable that had the task
-    drive_to_pos(rack_pos[retrieve_pos], height_pos[retrieve_pos], "Pickup", side_pos[retrieve_pos])    #Call the function to drive to a certain location and perform a fork movement
-    comm_list.append("Picked up")                                                           #The message is added to the bluetooth communication waiting list for the master conveyor brick
-    drive_to_pos(rack_pos[store_pos], height_pos[store_pos] , "Dropoff", side_pos[store_pos])   #Call the function to drive to a certain location and perform a fork movement
-    comm_list.append("Dropped off")                                                         #The message is added to the bluetooth communication waiting list for the master conveyor brick
+    drive_to_pos(slot_rack(retrieve_pos), slot_floor(retrieve_pos), "Pickup", slot_side(retrieve_pos))  #Call the function to drive to a certain location and perform a fork movement
+    queue_put(comm_list, "Picked up")                                                       #The message is added to the bluetooth communication waiting list for the master conveyor brick
+    drive_to_pos(slot_rack(store_pos), slot_floor(store_pos), "Dropoff", slot_side(store_pos))   #Call the function to drive to a certain location and perform a fork movement
+    queue_put(comm_list, "Dropped off")                                                     #The message is added to the bluetooth communication waiting list for the master conveyor brick
 
 
-def manual_driving(driving_pos):                                                            #This function is used to drive to a manual selected position in the high bay racks and not extend the fork
-    global crane_task                                                                       #Using this global variable in this local function (if not defined to be global, it will make a local variable)
+def manual_driving(driving_pos):                                                            #This function is used to drive to a manual selected position in the high bay racks (-1 = chain conveyors) and not extend the fork
+    global crane_task                                                                       #Using these global variables in this local function (if not defined to be global, it will make a local variable)
+    global drive_abort
     crane_task = ""                                                                         #Clear the global variable that had the task
-    comm_list.append("Started moving")                                                      #The message is added to the bluetooth communication waiting list for the master conveyor brick
-    drive_to_pos(rack_pos[driving_pos], height_pos[driving_pos], "Pickup", 0)               #Call the function to drive to a certain location and perform a fork movement
-    comm_list.append("Ready")                                                               #The message is added to the bluetooth communication waiting list for the master conveyor brick
+    drive_abort = False                                                                     #An abort for an earlier drive is not for this one
+    queue_put(comm_list, "Started moving")                                                  #The message is added to the bluetooth communication waiting list for the master conveyor brick
+    drive_to_pos(position_rack(driving_pos), position_floor(driving_pos), "Pickup", 0)      #Call the function to drive to a certain location and perform a fork movement
+    queue_put(comm_list, "Ready")                                                           #The message is added to the bluetooth communication waiting list for the master conveyor brick
 
 
 def startup_box(store_pos):                                                                 #This function is used store a box that was on the stacker crane when homing, in the high bay racks (location 100 -> 0-59)
     global crane_task                                                                       #Using this global variable in this local function (if not defined to be global, it will make a local variable)
     crane_task = ""                                                                         #Clear the global variable that had the task
-    drive_to_pos(rack_pos[store_pos], height_pos[store_pos] , "Dropoff", side_pos[store_pos])   #Call the function to drive to a certain location and perform a fork movement
-    comm_list.append("Dropped off")                                                         #The message is added to the bluetooth communication waiting list for the master conveyor brick
+    drive_to_pos(slot_rack(store_pos), slot_floor(store_pos), "Dropoff", slot_side(store_pos))   #Call the function to drive to a certain location and perform a fork movement
+    queue_put(comm_list, "Dropped off")                                                     #The message is added to the bluetooth communication waiting list for the master conveyor brick
 
 
 def drive_to_pos(rack_nr, height_nr, pos_mode, fork_mode):                                  #This function is used to drive to a certain location and perform a fork movement
@@ -243,6 +253,10 @@ def drive_to_pos(rack_nr, height_nr, pos_mode, fork_mode):
     lift_platform.run_target(max_speed_lift * remote_speed_adjust, lift_angle , then=Stop.HOLD, wait=False) #Send the platform lifting motor run to the target command, don't wait for finishing
 
     while math.fabs(rack_coord[rack_nr] - driving_motor.angle()) > 100 and driving_motor.control.done() != True:    #Wait for the driving motor to be within 100°
+        if drive_abort == True and fork_mode == 0:                                          #If the master aborts a manual drive (parking), stop where the crane is, the next order starts from here
+            driving_motor.run(0)                                                            #Set the driving speed to 0degrees/second (This allows a set deceleration so the stacker crane does not fall over from a hard brake)
+            lift_platform.run(0)                                                            #Set the lifting speed to 0degrees/second
+            return
         if emergency_stop == True:                                                          #If during the driving an Emergency state happens
             driving_motor.run(0)                                                            #Set the driving speed to 0degrees/second (This allows a set deceleration so the stacker crane does not fall over from a hard brake)
             lift_platform.run(0)                                                            #Set the lifting speed to 0degrees/second (This allows a set deceleration so the box does not fall off from a hard brake)
@@ -252,7 +266,7 @@ def drive_to_pos(rack_nr, height_nr, pos_mode, fork_mode):
     if math.fabs(rack_coord[rack_nr] - driving_motor.angle()) > 5:                          #If the crane is already positioned in the correct place do not correct (staying in same row)
         while True:                                                                         #Start a forever loop
             if driving_motor.control.done() == True and error_driving_pos == False:         #Check if the driving is finished and that there is no error
-                comm_list.append("Crane positioning error")                                 #The message is added to the bluetooth communication waiting list for the master conveyor brick
+                queue_put(comm_list, "Crane positioning error")                             #The message is added to the bluetooth communication waiting list for the master conveyor brick
                 error_driving_pos = True                                                    #The driving motor has stopped, but not reached its position yet, set an error
                 while error_driving_pos == True or emergency_stop == True:                  #Start a loop that checks if the error has been reset and that there is no emergency state
                     if emergency_stop == True and lift_platform.control.done() == False:    #If there is an emergency state and the lifting motor has not finished moving yet
@@ -284,8 +298,8 @@ def drive_to_pos(rack_nr, height_nr, pos_mode, fork_mode):
     if fork_mode > 0:                                                                       #Check if the telescopic fork needs to extend or not
         while tele_fork_clr.color() != Color.WHITE or error_homing_fork == True:            #Start a loop while the result color is not white from scanning the underside of the telescopic fork
             if error_homing_fork == False:                                                  #Check if the error has already been set
-                comm_list.append("Clear message")                                           #The message is added to the bluetooth communication waiting list for the master conveyor brick, to be able to resend a same message if needed
-                comm_list.append("Homing fork error")                                       #The message is added to the bluetooth communication waiting list for the master conveyor brick
+                queue_put(comm_list, "Clear message")                                       #The message is added to the bluetooth communication waiting list for the master conveyor brick, to be able to resend a same message if needed
+                queue_put(comm_list, "Homing fork error")                                   #The message is added to the bluetooth communication waiting list for the master conveyor brick
                 error_homing_fork = True                                                    #The telescopic fork was not homed correctly, set an error
             ev3.speaker.say("Fork was not homed correctly!")                                #Let the EV3 brick speaker read out this string of text
         if   fork_mode == 1:                                                                #Check if the telescopic fork needs to extend to the left
@@ -314,8 +328,8 @@ def drive_to_pos(rack_nr, height_nr, pos_mode, fork_mode):
         while tele_fork_clr.color() != Color.WHITE:                                         #Start a loop while the result color is not white
             if timer_timeout.time() > fork_timeout_time / remote_speed_adjust and error_homing_fork == False:   #Check if the time for centering has already passed
                 error_homing_fork = True                                                    #The telescopic fork was not homed correctly, set an error
-                comm_list.append("Clear message")                                           #The message is added to the bluetooth communication waiting list for the master conveyor brick, to be able to resend a same message if needed
-                comm_list.append("Homing fork error")                                       #The message is added to the bluetooth communication waiting list for the master conveyor brick
+                queue_put(comm_list, "Clear message")                                       #The message is added to the bluetooth communication waiting list for the master conveyor brick, to be able to resend a same message if needed
+                queue_put(comm_list, "Homing fork error")                                   #The message is added to the bluetooth communication waiting list for the master conveyor brick
                 tele_fork_motor.stop()                                                      #Stop the telescopic fork motor
                 ev3.speaker.say("Homing fork taking to long, please check mechanical construction") #Let the EV3 brick speaker read out this string of text
                 while error_homing_fork == True: wait(100)                                  #Start a loop while the error has not been reset for the telescopic fork
@@ -337,8 +351,8 @@ def drive_to_pos(rack_nr, height_nr, pos_mode, fork_mode):
             last_homing_left = False                                                        #Set the homing as coming from the right side
         if math.fabs(tele_fork_motor.angle()) > 200:                                        #If the angle difference between before extending, and after is greater than 200degrees, set an error (gearskipping)
             error_homing_fork = True                                                        #The telescopic fork was not homed correctly, set an error
-            comm_list.append("Clear message")                                               #The message is added to the bluetooth communication waiting list for the master conveyor brick, to be able to resend a same message if needed
-            comm_list.append("Homing fork error")                                           #The message is added to the bluetooth communication waiting list for the master conveyor brick
+            queue_put(comm_list, "Clear message")                                           #The message is added to the bluetooth communication waiting list for the master conveyor brick, to be able to resend a same message if needed
+            queue_put(comm_list, "Homing fork error")                                       #The message is added to the bluetooth communication waiting list for the master conveyor brick
             while error_homing_fork == True: wait(100)                                      #Start a loop while the error has not been reset for the telescopic fork
         tele_fork_motor.reset_angle(0)                                                      #Reset the telescopic fork motor to 0degrees
 
@@ -386,9 +400,9 @@ def homing_crane():
             ev3.speaker.say("Sensor should not be pressed right now, check crane failure")  #Let the EV3 brick speaker read out this string of text
             print("Sensor should not be pressed right now, check crane failure")            #Print this feedback line when debugging
             if counter >= 2:                                                                #If there are 2 errors in row
-                comm_list.append("Crane sensor remains pushed error")                       #The message is added to the bluetooth communication waiting list for the master conveyor brick
-                conv_status_to_crane_mbox.wait_new()                                        #Wait for a message that clears the error
-                comm_list.append("Retry")                                                   #The clearing message is added to the bluetooth communication waiting list for the master conveyor brick so a same command can be resend
+                queue_put(comm_list, "Crane sensor remains pushed error")                   #The message is added to the bluetooth communication waiting list for the master conveyor brick
+                link_wait(master_link)                                                      #Wait for a message that clears the error
+                queue_put(comm_list, "Retry")                                               #The clearing message is added to the bluetooth communication waiting list for the master conveyor brick so a same command can be resend
             continue                                                                        #Restart the loop to try again
         break                                                                               #If the sensor in not pressed now, break out of the loop
 
@@ -419,9 +433,9 @@ def homing_crane():
         if timer_timeout.time() > fork_timeout_time:                                        #Check if the time for centering has already passed
             ev3.speaker.say("Homing fork taking to long, please check mechanical construction") #Let the EV3 brick speaker read out this string of text
             error_homing_fork = True                                                        #Set the error for centering taking to long
-            comm_list.append("Homing fork error")                                           #The message is added to the bluetooth communication waiting list for the master conveyor brick
-            conv_status_to_crane_mbox.wait_new()                                            #Wait for a message that clears the error
-            comm_list.append("Retry")                                                       #The clearing message is added to the bluetooth communication waiting list for the master conveyor brick so a same command can be resend
+            queue_put(comm_list, "Homing fork error")                                       #The message is added to the bluetooth communication waiting list for the master conveyor brick
+            link_wait(master_link)                                                          #Wait for a message that clears the error
+            queue_put(comm_list, "Retry")                                                   #The clearing message is added to the bluetooth communication waiting list for the master conveyor brick so a same command can be resend
             tele_fork_motor.run_angle(max_speed_fork,  fork_ext_coord,  then=Stop.HOLD, wait=False) #Extend the telescopic fork again
             timer_timeout.reset()                                                           #Reset the timer back to 0
     tele_fork_motor.run_angle( max_speed_fork, fork_homing_yellow, then=Stop.HOLD, wait=True)   #Move the last degrees after seeing the white jumper brick to center the telescopic fork
@@ -432,7 +446,7 @@ def homing_crane():
         error_homing_fork = False                                                           #Reset the error for centering taking to long
         ascending_coord  = [65]                                                             #Reset the global variable list (In case the loop returns to the beginning this is needed)
         lift_platform.run_target( max_speed_lift,  0, then=Stop.HOLD, wait=True)            #Bring the platform to motor angle 0 (Should already be there, unless the loop returned to the beginning)
-        for x in range(6):                                                                  #Perform 6 times
+        for x in range(rack_floors):                                                        #Perform 6 times (1 for each floor)
             lift_platform.run(300)                                                          #Make the lifting platform go up at constant speed (300degrees/second)
             position_clr = rack_clr.rgb()                                                   #Scan the rack for RGB colors
             while position_clr[0] < 40: position_clr = rack_clr.rgb()                       #Start a loop checking the intensity of the color red scanned, wait for it to be higher than 40 (0-100)
@@ -451,7 +465,7 @@ def homing_crane():
         error_homing_fork = False                                                           #Reset the error for centering taking to long
         descending_coord = [55]                                                             #Reset the global variable list (In case the loop returns to the beginning this is needed)
         lift_platform.run_target(max_speed_lift, ascending_coord[-1] + dropoff_height / 3 * 2)  #Bring the platform above the heighest rack calibration point so it can be scanned
-        for x in range(6):                                                                  #Perform 6 times
+        for x in range(rack_floors):                                                        #Perform 6 times (1 for each floor)
             lift_platform.run(-300)                                                         #Make the lifting platform go down at constant speed (300degrees/second)
             position_clr = rack_clr.rgb()                                                   #Scan the rack for RGB colors
             while position_clr[0] < 40: position_clr = rack_clr.rgb()                       #Start a loop checking the intensity of the color red scanned, wait for it to be lower than 40 (0-100)
@@ -462,7 +476,7 @@ def homing_crane():
                     error_homing_fork = True                                                #If the angle is out of bounds, a possible double scan / non-scan has occured
                     break                                                                   #Break out of the for(6)
             ev3.speaker.beep()                                                              #Make a beep sound everytime a floor has been scanned correctly
-            if x < 5:                                                                       #If the loop is not on the last run
+            if x < rack_floors - 1:                                                         #If the loop is not on the last run
                 lift_platform.run(-300)                                                     #Restart the lifting platform motor to go down at constant speed
                 while position_clr[0] > 30: position_clr = rack_clr.rgb()                   #Start a loop checking the intensity of the color red scanned, wait for it to be lower  than 30 (0-100)
         if error_homing_fork == True: continue                                              #Redo the homing of the rack calibration if an error has been found
@@ -492,17 +506,23 @@ homing_crane()
 ##########~~~~~~~~~~PROGRAM RUNNING THE CRANE~~~~~~~~~~##########
 sub_crane_control.start()                                                                   #This starts the loop thread that controls the stacker crane operations. Non-blocking
 
-comm_list.append("Ready")                                                                   #The message is added to the bluetooth communication waiting list for the master conveyor brick
-comm_list.append("Homing finished")                                                         #The message is added to the bluetooth communication waiting list for the master conveyor brick
+queue_put(comm_list, "Lift calibration ,%s"%",".join([str(x) for x in ascending_coord]))    #Send the calibrated lifting angles to the master conveyor brick, used to estimate the travel time for each location
+queue_put(comm_list, "Ready")                                                               #The message is added to the bluetooth communication waiting list for the master conveyor brick
+queue_put(comm_list, "Homing finished")                                                     #The message is added to the bluetooth communication waiting list for the master conveyor brick
 
 while True:                                                                                 #Start a forever loop
-    conv_status_to_crane_mbox.wait_new()                                                    #Wait for a new message to be received by bluetooth from the Master EV3 brick
-    updated_pos = conv_status_to_crane_mbox.read()                                          #Read the last message received by bluetooth from the Master EV3 brick
+    updated_pos = link_wait(master_link)                                                    #Wait for the next message received by bluetooth from the Master EV3 brick
     print(updated_pos)                                                                      #Print this feedback line when debugging
     if   "Store at"     in updated_pos: crane_task = updated_pos                            #Compare the received message and set a new crane task
+    elif "Store and retrieve" in updated_pos: crane_task = updated_pos                      #Compare the received message and set a new crane task
     elif "Retrieve at"  in updated_pos: crane_task = updated_pos                            #Compare the received message and set a new crane task
     elif "Move between" in updated_pos: crane_task = updated_pos                            #Compare the received message and set a new crane task
     elif "Drive to"     in updated_pos: crane_task = updated_pos                            #Compare the received message and set a new crane task
+    elif updated_pos == "Abort drive":                                                      #Compare the received message, the master has a new order while the crane is parking
+        if "Drive to" in crane_task:                                                        #The drive has not started yet, skip it
+            crane_task = ""
+            queue_put(comm_list, "Ready")                                                   #The message is added to the bluetooth communication waiting list for the master conveyor brick
+        else: drive_abort = True                                                            #Stop the drive that is running
     elif "Startup"      in updated_pos: crane_task = updated_pos                            #Compare the received message and set a new crane task
     elif updated_pos == "Emergency stop pushed":    emergency_stop      = True              #Compare the received message and set the Emergency state
     elif updated_pos == "Emergency stop reset":     emergency_stop      = False             #Compare the received message and reset the Emergency state
@@ -8,6 +8,7 @@ from xpt2046 import xpt2046
 from machine import UART
 from machine import Pin
 from uartremote import *
+from Warehouse_Geometry import *
 import time
 import esp32
 import math
@@ -36,10 +37,8 @@ l=Pin(2,Pin.OUT)
 l.value(1) #1
 
 
-#Warehouse rack configuration
-rows = 5
-levels = 6
-total_wh_positions = rows*levels*2
+#Warehouse rack configuration (rack_length, rack_floors and the location mapping come from Warehouse_Geometry)
+total_wh_positions = total_storage_positions
 rack_nr =[]
 for i in range(total_wh_positions): rack_nr.append(str(i))
 #Pallet locations configuration
@@ -64,6 +63,9 @@ mode_request       = 0                   #Time when last mode change has been re
 robot_homing_start = "Not started"
 uart_started       = False
 selection          = "Debug testing master"
+wms_sequence_nr    = 0                   #Last WMS change number received from the master EV3
+wms_epoch          = 0                   #Epoch of the master EV3 program run that wms_sequence_nr belongs to (0 = none received yet)
+wms_resync         = False               #Set after an UART error, the WMS changes since wms_sequence_nr will be requested again
 
 last_event_modes       = None
 last_event_modes_time  = 0
@@ -127,17 +129,7 @@ top_view_img = lv.img_dsc_t({
 
 ##############################CALCULATE THE POSITION FOR EACH LED CORRESPONDING TO THE WAREHOUSE LOCATION (LED 0-108 VS LOCATION 0-59)##############################
 wh_positions_led  = [] #Define where every LED is on the strip for each storage position
-def calculate_wh_positions_on_led_strip(levels, rows): #Lamps run in a loop from bottom to top, and back down. Left lamp = front rack, middle lamp = backside rack
-    counter = 0                #Counting 1 row (front and back rack = 1)
-    for x in range(100):       #2 Racks per number
-        for y in range(2):     #Lamp left of pilar at 0 (one full row), right side at 1 (One full row, no left at first pilar)
-            for z in range(2): #Front row at 0, back row at 1
-                for i in range(levels):
-                    if x == 0 and y == 0: continue #Skipping first row as there are no lights on the first pillar.
-                    wh_positions_led.append((x * levels * 2 * 3) - 3 + (3 * y) + (- i*3 + y*2*i*3) + (1 * z))
-            counter += 1
-            if counter > rows: return
-calculate_wh_positions_on_led_strip(levels, rows)
+for i in range(total_wh_positions): wh_positions_led.append(slot_led_index(i)) #Lamps run in a loop from bottom to top, and back down. Left lamp = front rack, middle lamp = backside rack
 
 
 def light_tower_check(): #Function to check which light should be turned on completely, and which slightly on the light tower (so each color remains visible)
@@ -197,7 +189,7 @@ def update_storage(loc, state, name):
                 if int(child_pos[0]) == loc:
                     list_request.get_child(i).delete()
                     break
-            cont_storeto.get_child(59-loc).clear_state(lv.STATE.DISABLED | lv.STATE.CHECKED)
+            cont_storeto.get_child(slot_grid_index(loc)).clear_state(lv.STATE.DISABLED | lv.STATE.CHECKED)
             list_remove_wms.get_child(loc).clear_state(lv.STATE.CHECKED)
             list_remove_wms.get_child(loc).add_flag(lv.obj.FLAG.HIDDEN)
         elif state == 1:   #Box has been put in the warehouse racks
@@ -210,7 +202,7 @@ def update_storage(loc, state, name):
                 checkbox_request_wh.set_text(str(loc) + ", " + pallets_dict["location%s"%loc]["name"])
                 checkbox_request_wh.add_event_cb(update_request_list, lv.EVENT.CLICKED, None)
             pallets_dict["location%s"%loc]["box"] = True
-            cont_storeto.get_child(59-loc).add_state(lv.STATE.CHECKED | lv.STATE.DISABLED)
+            cont_storeto.get_child(slot_grid_index(loc)).add_state(lv.STATE.CHECKED | lv.STATE.DISABLED)
             list_remove_wms.get_child(loc).clear_state(lv.STATE.CHECKED)
             list_remove_wms.get_child(loc).set_text(str(pallets_dict["location%s"%loc]["position"]) + ", " + pallets_dict["location%s"%loc]["name"])
             list_remove_wms.get_child(loc).clear_flag(lv.obj.FLAG.HIDDEN)
@@ -257,6 +249,27 @@ def update_storage(loc, state, name):
             list_remove_wms.get_child(loc-110+total_wh_positions+len(conveyors_nr)).clear_flag(lv.obj.FLAG.HIDDEN)
             
 
+#At startup the master EV3 sends many WMS locations in 1 message "loc,state,length,name|loc,state,length,name|..." instead of 1 message per location
+#The name is read by its length, so a "|" or "," in a name does not break the message
+def update_storage_bulk(data):
+    data = data.decode()
+    i = 0
+    while i < len(data):
+        loc, state, length, rest = data[i:].split(",", 3)
+        name = rest[:int(length)]
+        update_storage(int(loc), int(state), name)
+        i += len(loc) + len(state) + len(length) + 3 + int(length) + 1 #3 commas, the name and the "|" behind it
+
+
+#The master EV3 sends until which WMS change number this ESP32 is up to date, after an UART error only the changes after this number are requested
+#The epoch is a new number every time the master EV3 starts, with another epoch the master EV3 sends the full WMS
+def update_sequence(epoch, seq):
+    global wms_epoch
+    global wms_sequence_nr
+    wms_epoch = epoch
+    wms_sequence_nr = seq
+
+
 #When a pallet has been moved from one location to another, the master EV3 will just send start and end location, no names (faster communication without a string)
 def transport_pallet(loc_start, loc_end):
     print("Transport requested from %s to %s."%(loc_start, loc_end))
@@ -304,18 +317,18 @@ def update_request(loc, state):
         else:
             if state == 0:
                 pallets_dict["location%s"%loc]["request"] = False
-                cont_storeto.get_child(59-loc).clear_state(lv.STATE.CHECKED | lv.STATE.DISABLED)
+                cont_storeto.get_child(slot_grid_index(loc)).clear_state(lv.STATE.CHECKED | lv.STATE.DISABLED)
             elif state == 1:
                 pallets_dict["location%s"%loc]["request"] = True
-                cont_storeto.get_child(59-loc).add_state(lv.STATE.CHECKED)
-                cont_storeto.get_child(59-loc).clear_state(lv.STATE.DISABLED)
+                cont_storeto.get_child(slot_grid_index(loc)).add_state(lv.STATE.CHECKED)
+                cont_storeto.get_child(slot_grid_index(loc)).clear_state(lv.STATE.DISABLED)
             elif state == 2:
                 pallets_dict["location%s"%loc]["request"] = False
-                cont_storeto.get_child(59-loc).add_state(lv.STATE.DISABLED)
-                cont_storeto.get_child(59-loc).add_state(lv.STATE.CHECKED)
+                cont_storeto.get_child(slot_grid_index(loc)).add_state(lv.STATE.DISABLED)
+                cont_storeto.get_child(slot_grid_index(loc)).add_state(lv.STATE.CHECKED)
             elif state == 3:
                 pallets_dict["location%s"%loc]["request"] = True
-                cont_storeto.get_child(59-loc).add_state(lv.STATE.CHECKED | lv.STATE.DISABLED)
+                cont_storeto.get_child(slot_grid_index(loc)).add_state(lv.STATE.CHECKED | lv.STATE.DISABLED)
     elif 110 <= loc < 120:
         if robot_dict["location%s"%loc]["box"] == True:
             for i in range(len(robot_floor)):
@@ -410,6 +423,8 @@ def update_mode(state, problem):
 
 #Adding the extra commands to the uartremote
 ur.add_command(update_storage)
+ur.add_command(update_storage_bulk)
+ur.add_command(update_sequence)
 ur.add_command(update_request)
 ur.add_command(transport_pallet)
 ur.add_command(update_mode)
@@ -898,6 +913,13 @@ def add_to_wms(e): #Function to add a box to the WMS, by looking at the slected
         ur.send_command("mod_wms", '2b%ss'%len(name), pos_int, 1, name) #Send the new location as state 1 (box present) and the name of the box
 
 
+def retrieve_from_wms(e): #Function to take out a box by its name, the master EV3 chooses the rack location that holds a box with this name
+    name = ta.get_text()
+    if len(name) > 0: #The name should be longer than 0 characters
+        print("Request to take out a box with name:", name)
+        ur.send_command("request_name", '%ss'%len(name), name) #The master EV3 answers with a request update for the chosen location
+
+
 def remove_from_wms(e): #Function to remove a box from the WMS, first give a warning here by opening a messagebox
     target = e.get_target()
     if "Communication not online" not in machine_errors:
@@ -1376,6 +1398,13 @@ btn_add_wms_floor.set_size(lv.SIZE.CONTENT, lv.SIZE.CONTENT)
 btn_add_wms_floor.align(lv.ALIGN.TOP_LEFT, 33, 154)
 btn_add_wms_floor.add_event_cb(add_to_wms, lv.EVENT.CLICKED, None)
 
+btn_retrieve_wms = lv.btn(cont_add_wms)
+label = lv.label(btn_retrieve_wms)
+label.set_text("Take out this name")
+btn_retrieve_wms.set_size(lv.SIZE.CONTENT, lv.SIZE.CONTENT)
+btn_retrieve_wms.align(lv.ALIGN.TOP_LEFT, 33, 214)
+btn_retrieve_wms.add_event_cb(retrieve_from_wms, lv.EVENT.CLICKED, None)
+
 roller_rack = lv.roller(cont_add_wms)
 roller_rack.set_options("\n".join(rack_nr),lv.roller.MODE.NORMAL)
 roller_rack.set_style_pad_all(3, 0)
@@ -1445,8 +1474,8 @@ for i in pallets_dict:
 list_request.add_flag(lv.obj.FLAG.HIDDEN)
 
 
-col_dsc = [45, 45, 45, 45, 45, lv.GRID_TEMPLATE.LAST]
-row_dsc = [19, 19, 19, 19, 19, 40, 19, 19, 19, 19, 19, 19, lv.GRID_TEMPLATE.LAST]
+col_dsc = [45] * rack_length + [lv.GRID_TEMPLATE.LAST]
+row_dsc = [19] * (rack_floors - 1) + [40] + [19] * rack_floors + [lv.GRID_TEMPLATE.LAST] #Extra space between the back and front rack
 cont_storeto = lv.obj(tab_storeto)
 cont_storeto.set_style_grid_column_dsc_array(col_dsc, 0)
 cont_storeto.set_style_grid_row_dsc_array(row_dsc, 0)
@@ -1454,11 +1483,11 @@ cont_storeto.set_size(lv.pct(95), lv.pct(92))
 cont_storeto.align(lv.ALIGN.TOP_LEFT, 0, 16)
 cont_storeto.set_layout(lv.LAYOUT_GRID.value)
 for i in range(total_wh_positions):
-    col = i // (levels * 2)
-    row = i % (levels * 2)
+    col = i // slots_per_rack
+    row = i % slots_per_rack
     checkbox_storeto_wh = lv.checkbox(cont_storeto)
     checkbox_storeto_wh.set_grid_cell(lv.GRID_ALIGN.STRETCH, col, 1, lv.GRID_ALIGN.STRETCH, row, 1)
-    checkbox_storeto_wh.set_text(str(59-i))
+    checkbox_storeto_wh.set_text(str(slot_grid_index(i)))
     if pallets_dict["location%s"%i]["box"] == True:
         checkbox_storeto_wh.add_state(lv.STATE.CHECKED | lv.STATE.DISABLED)
     checkbox_storeto_wh.add_event_cb(update_storeto_list, lv.EVENT.CLICKED, None)
@@ -1523,8 +1552,13 @@ def update_error_label():
 half_second = False    
 while True:
     try: ur.process_uart()
-    except: print("Some error receiving communication")
+    except:
+        print("Some error receiving communication")
+        wms_resync = True
     ur.flush()
+    if wms_resync == True and uart_started == True:
+        wms_resync = False
+        ur.send_command("wms_changes_since", '2i', wms_epoch, wms_sequence_nr)
     if math.fmod(time.ticks_ms(), 1000) > 500:
         if half_second == False:
             half_second = True